@@ -0,0 +1,79 @@
+"""Time AttendanceAnalytics over a year of data.
+
+Run from the project root (needs pandas/numpy):
+    python -m benchmarks.bench_analytics [employees] [days]
+
+Seeds a temporary database with one session per employee per weekday
+(default 10,000 employees x 365 days) and times load, per-day metrics and
+per-employee metrics separately.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from src.analytics import AttendanceAnalytics, ShiftRules
+from src.database import Database
+
+
+def _seed(db, employees, days, start):
+    db.conn.executemany(
+        "INSERT INTO employees (name, email, fingerprint_id) VALUES (?, ?, ?)",
+        ((f"Employee {i}", f"e{i}@example.com", str(i)) for i in range(employees)))
+    ids = [r[0] for r in db.conn.execute("SELECT id FROM employees ORDER BY id")]
+    rng = random.Random(42)
+
+    def sessions():
+        for d in range(days):
+            day = start + timedelta(days=d)
+            if day.weekday() >= 5:
+                continue
+            for emp in ids:
+                if rng.random() < 0.05:
+                    continue  # absent
+                arrive = 8 * 3600 + rng.randint(0, 7200)
+                leave = arrive + 8 * 3600 + rng.randint(-3600, 3600)
+                yield (emp, day.isoformat(), time.strftime("%H:%M:%S", time.gmtime(arrive)),
+                       time.strftime("%H:%M:%S", time.gmtime(leave)))
+
+    db.conn.executemany(
+        "INSERT INTO attendance (employee_id, date, arrival_time, departure_time) VALUES (?, ?, ?, ?)", sessions())
+    db.conn.commit()
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    employees = int(argv[0]) if len(argv) > 0 else 10_000
+    days = int(argv[1]) if len(argv) > 1 else 365
+    start = date(2023, 1, 1)
+    end = start + timedelta(days=days - 1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(db_name=os.path.join(tmp, "bench.db"))
+        started = time.perf_counter()
+        _seed(db, employees, days, start)
+        rows = db.count_attendance()
+        print(f"seeded {rows:,} sessions in {time.perf_counter() - started:.1f}s")
+
+        analytics = AttendanceAnalytics(db, ShiftRules(grace_minutes=5, rounding_minutes=15, rounding_mode="employer"))
+        timings = []
+        t = time.perf_counter()
+        frame = analytics.load(start.isoformat(), end.isoformat())
+        timings.append(("load", time.perf_counter() - t))
+        t = time.perf_counter()
+        daily = analytics.daily_metrics(frame)
+        timings.append(("daily", time.perf_counter() - t))
+        t = time.perf_counter()
+        per_employee = analytics.employee_metrics(start.isoformat(), end.isoformat(), daily=daily)
+        timings.append(("employee", time.perf_counter() - t))
+        db.close()
+
+    for label, secs in timings:
+        print(f"  {label:<9} {secs:7.2f}s")
+    print(f"  total     {sum(s for _, s in timings):7.2f}s  ({len(daily):,} employee-days, {len(per_employee):,} employees)")
+
+
+if __name__ == "__main__":
+    main()
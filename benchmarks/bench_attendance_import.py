@@ -0,0 +1,66 @@
+"""Measure historical attendance import throughput (rows/second).
+
+Run from the project root:
+    python -m benchmarks.bench_attendance_import [rows] [employees]
+
+Writes a session-layout CSV with `rows` sessions (default 1,000,000) for
+`employees` badge numbers (default 200) and loads it with
+AttendanceImporter (triggers and indexes deferred, summary rebuilt once).
+For comparison, a 20,000-row sample is inserted with plain executemany
+while the per-row triggers stay active.
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from src.attendance_import import AttendanceImporter
+from src.database import Database
+
+
+def _write_csv(path, rows, employees):
+    start = date(2015, 1, 1)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Badge", "Date", "Clock In", "Clock Out"])
+        for n in range(rows):
+            day, emp = divmod(n, employees)
+            writer.writerow([1000 + emp, (start + timedelta(days=day)).isoformat(),
+                             f"08:{emp % 60:02d}:00", f"17:{emp % 60:02d}:00"])
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    rows = int(argv[0]) if len(argv) > 0 else 1_000_000
+    employees = int(argv[1]) if len(argv) > 1 else 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.csv")
+        _write_csv(path, rows, employees)
+
+        db = Database(db_name=os.path.join(tmp, "bench.db"))
+        for i in range(employees):
+            db.add_employee(f"Employee {i}", f"e{i}@example.com", str(1000 + i))
+        report = AttendanceImporter(db).run(path)
+        print(f"  import   {report.summary()}   {report.elapsed_s:6.2f}s   {report.rows_per_s:10,.0f} rows/s")
+        db.close()
+
+        db = Database(db_name=os.path.join(tmp, "legacy.db"))
+        ids = [db.add_employee(f"Employee {i}", f"e{i}@example.com", str(1000 + i)) for i in range(employees)]
+        sample = min(rows, 20_000)
+        start = date(2015, 1, 1)
+        data = [(ids[n % employees], (start + timedelta(days=n // employees)).isoformat(), "08:00:00", "17:00:00")
+                for n in range(sample)]
+        started = time.perf_counter()
+        db.conn.executemany(
+            "INSERT INTO attendance (employee_id, date, arrival_time, departure_time) VALUES (?, ?, ?, ?)", data)
+        db.conn.commit()
+        elapsed = time.perf_counter() - started
+        print(f"  triggers {sample:,} rows with per-row triggers   {elapsed:6.2f}s   {sample / elapsed:10,.0f} rows/s")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Compare a full attendance read with a watermark-based incremental pull.
+
+Run from the project root:
+    python -m benchmarks.bench_attendance_pull [docs] [changed]
+
+Fills a FakeFirestore with `docs` attendance documents (default 20,000),
+mirrors them locally once, then changes `changed` of them (default 50) and
+times the old full stream against `AttendancePuller.pull()`, counting the
+documents each one reads from the server.
+"""
+import os
+import sys
+import tempfile
+import time
+
+from src.attendance_sync import AttendancePuller
+from src.database import Database
+from src.fake_firestore import SERVER_TIMESTAMP, FakeFirestore
+
+
+def _write(client, ids, status):
+    for start in range(0, len(ids), 500):
+        batch = client.batch()
+        for n in ids[start:start + 500]:
+            batch.set(client.collection("attendance").document(f"doc-{n:07d}"),
+                      {"name": "Employee", "status": status, "event_id": n, "updated_at": SERVER_TIMESTAMP})
+        batch.commit()
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    docs = int(argv[0]) if len(argv) > 0 else 20000
+    changed = int(argv[1]) if len(argv) > 1 else 50
+
+    client = FakeFirestore()
+    _write(client, list(range(docs)), "arrival")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(db_name=os.path.join(tmp, "bench.db"))
+        puller = AttendancePuller(db, client)
+        started = time.perf_counter()
+        puller.pull()
+        first_s = time.perf_counter() - started
+
+        _write(client, list(range(0, docs, max(1, docs // changed)))[:changed], "departure")
+
+        started = time.perf_counter()
+        full = {d.id: d.to_dict() for d in client.collection("attendance").stream()}
+        full_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        pulled = puller.pull()
+        pull_s = time.perf_counter() - started
+
+        print(f"  first pull   {docs:>8,} docs  {first_s * 1000:9.1f} ms")
+        print(f"  full stream  {len(full):>8,} docs  {full_s * 1000:9.1f} ms (old get_all_attendance)")
+        print(f"  incremental  {pulled:>8,} docs  {pull_s * 1000:9.1f} ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Measure punch latency while a backup is running.
+
+Run from the project root:
+    python -m benchmarks.bench_backup [rows] [punch_interval_s]
+
+Fills a temporary database with `rows` attendance records (default
+2,000,000), then keeps a writer recording a punch every `punch_interval_s`
+seconds (default 0.25) on its own connection while the database is
+copied, once with a single-step backup (the old Database.backup_to) and
+once with the stepwise BackupJob. Reports the backup time and the worst
+punch latency seen during each.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from src.backup_engine import BackupJob
+from src.database import Database
+
+PUNCH_SQL = "INSERT INTO attendance (employee_id, date, arrival_time, departure_time) VALUES (?, ?, ?, ?)"
+
+
+def _fill(db, rows, employees=200):
+    ids = [db.add_employee(f"Employee {i}", f"e{i}@example.com", str(1000 + i)) for i in range(employees)]
+    start = date(2015, 1, 1)
+    db.conn.executemany(PUNCH_SQL, ((ids[n % employees], (start + timedelta(days=n // employees)).isoformat(),
+                                     "08:00:00", "17:00:00") for n in range(rows)))
+    db.conn.commit()
+    return ids[0]
+
+
+def _measure(db_name, employee_id, backup, interval):
+    latencies = []
+    stop = threading.Event()
+
+    def writer():
+        conn = sqlite3.connect(db_name, timeout=30)
+        while not stop.is_set():
+            started = time.perf_counter()
+            conn.execute(PUNCH_SQL, (employee_id, "2030-01-01", "08:00:00", "09:00:00"))
+            conn.commit()
+            latencies.append(time.perf_counter() - started)
+            time.sleep(interval)
+        conn.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    time.sleep(interval)
+    started = time.perf_counter()
+    backup()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    thread.join()
+    return elapsed, max(latencies) * 1000, len(latencies)
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    rows = int(argv[0]) if len(argv) > 0 else 2_000_000
+    interval = float(argv[1]) if len(argv) > 1 else 0.25
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(db_name=os.path.join(tmp, "bench.db"))
+        employee_id = _fill(db, rows)
+        size_mb = os.path.getsize(db.db_name) / 1e6
+        print(f"  database {rows:,} rows, {size_mb:,.1f} MB")
+
+        def one_shot():
+            src = sqlite3.connect(db.db_name)
+            dest = sqlite3.connect(os.path.join(tmp, "one_shot.db"))
+            src.backup(dest)
+            dest.close()
+            src.close()
+
+        job = BackupJob(db.db_name, os.path.join(tmp, "stepwise.db"))
+        for label, backup in (("one-shot", one_shot), ("stepwise", job.run)):
+            elapsed, worst_ms, punches = _measure(db.db_name, employee_id, backup, interval)
+            print(f"  {label:<9} backup {elapsed:6.2f}s   worst punch {worst_ms:8.1f} ms   {punches} punches")
+        print(f"  stepwise restarts: {job.restarts}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
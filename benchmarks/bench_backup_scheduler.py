@@ -0,0 +1,62 @@
+"""Measure the cost of a scheduled backup check on an idle vs changed database.
+
+Run from the project root:
+    python -m benchmarks.bench_backup_scheduler [rows] [checks]
+
+Fills a temporary database with `rows` attendance records (default
+500,000), takes one snapshot, then runs `checks` scheduler checks (default
+100) with no writes in between (all skipped) and a few checks after a
+single punch each (all taken).
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from src.backup_scheduler import BackupScheduler
+from src.backup_store import BackupStore
+from src.database import Database
+
+PUNCH_SQL = "INSERT INTO attendance (employee_id, date, arrival_time, departure_time) VALUES (?, ?, ?, ?)"
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    rows = int(argv[0]) if len(argv) > 0 else 500_000
+    checks = int(argv[1]) if len(argv) > 1 else 100
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(db_name=os.path.join(tmp, "bench.db"))
+        ids = [db.add_employee(f"Employee {i}", f"e{i}@example.com", str(1000 + i)) for i in range(200)]
+        start = date(2015, 1, 1)
+        db.conn.executemany(PUNCH_SQL, ((ids[n % 200], (start + timedelta(days=n // 200)).isoformat(),
+                                         "08:00:00", "17:00:00") for n in range(rows)))
+        db.conn.commit()
+
+        scheduler = BackupScheduler(db.db_name, BackupStore(os.path.join(tmp, "store")))
+        scheduler.run_once()
+
+        started = time.perf_counter()
+        for _ in range(checks):
+            scheduler.run_once()
+        idle = (time.perf_counter() - started) / checks
+
+        changed_checks = 5
+        started = time.perf_counter()
+        for n in range(changed_checks):
+            db.conn.execute(PUNCH_SQL, (ids[0], f"2030-01-0{n + 1}", "08:00:00", "17:00:00"))
+            db.conn.commit()
+            scheduler.run_once()
+        changed = (time.perf_counter() - started) / changed_checks
+
+        stats = scheduler.stats()
+        print(f"  idle check    {idle * 1000:8.3f} ms")
+        print(f"  changed check {changed * 1000:8.1f} ms")
+        print(f"  taken {stats['taken']}, skipped {stats['skipped']} {stats['skipped_by']}")
+        scheduler.stop()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
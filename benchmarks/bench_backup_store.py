@@ -0,0 +1,57 @@
+"""Measure storage used by repeated snapshots in the chunk store.
+
+Run from the project root:
+    python -m benchmarks.bench_backup_store [rows] [snapshots] [punches]
+
+Fills a temporary database with `rows` attendance records (default
+500,000), then takes `snapshots` backups (default 10) with `punches`
+new punches (default 200) between them. Reports the bytes the store wrote
+per snapshot against the size of the full-copy backups used before.
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from src.backup_store import BackupStore
+from src.database import Database
+
+PUNCH_SQL = "INSERT INTO attendance (employee_id, date, arrival_time, departure_time) VALUES (?, ?, ?, ?)"
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    rows = int(argv[0]) if len(argv) > 0 else 500_000
+    snapshots = int(argv[1]) if len(argv) > 1 else 10
+    punches = int(argv[2]) if len(argv) > 2 else 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(db_name=os.path.join(tmp, "bench.db"))
+        ids = [db.add_employee(f"Employee {i}", f"e{i}@example.com", str(1000 + i)) for i in range(200)]
+        start = date(2015, 1, 1)
+        db.conn.executemany(PUNCH_SQL, ((ids[n % 200], (start + timedelta(days=n // 200)).isoformat(),
+                                         "08:00:00", "17:00:00") for n in range(rows)))
+        db.conn.commit()
+        day = start + timedelta(days=rows // 200 + 1)
+
+        store = BackupStore(os.path.join(tmp, "store"))
+        full_bytes = 0
+        started = time.perf_counter()
+        for n in range(snapshots):
+            report = store.snapshot(db.db_name)
+            full_bytes += report.size
+            print(f"  {report.summary()}   {report.elapsed_s:5.2f}s")
+            db.conn.executemany(PUNCH_SQL, ((ids[i % 200], day.isoformat(), "08:00:00", "17:00:00")
+                                            for i in range(punches)))
+            db.conn.commit()
+            day += timedelta(days=1)
+        elapsed = time.perf_counter() - started
+        stored = store.stored_bytes()
+        print(f"  full copies {full_bytes / 1e6:8.1f} MB   store {stored / 1e6:8.1f} MB   "
+              f"({full_bytes / max(stored, 1):.0f}x smaller)   {elapsed:6.2f}s")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Measure export throughput (rows/second) for CSV and XLSX.
+
+Run from the project root:
+    python -m benchmarks.bench_export [rows] [employees]
+
+Seeds a temporary database with `rows` attendance sessions (default
+1,000,000) and exports them with CsvExportJob and XlsxExportJob
+(sheet per month, with the daily_summary sheet). XLSX is skipped when
+openpyxl is not installed.
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from src.database import Database
+from src.export_engine import CsvExportJob, XlsxExportJob
+
+
+HEADER = ["Date", "Employee Name", "Arrival Time", "Departure Time"]
+
+
+def _seed(db, rows, employees):
+    ids = [db.add_employee(f"Employee {i}", f"e{i}@example.com", str(i)) for i in range(employees)]
+    days = -(-rows // employees)
+    start = date(2000, 1, 1)
+
+    def sessions():
+        n = 0
+        for d in range(days):
+            day = (start + timedelta(days=d)).isoformat()
+            for i, emp in enumerate(ids):
+                if n == rows:
+                    return
+                yield emp, day, f"08:{i % 60:02d}:00", f"17:{i % 60:02d}:00"
+                n += 1
+
+    db.conn.executemany(
+        "INSERT INTO attendance (employee_id, date, arrival_time, departure_time) VALUES (?, ?, ?, ?)", sessions())
+    db.conn.commit()
+
+
+def _time(job):
+    started = time.perf_counter()
+    job.run()
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(job.path) / 1e6
+    return job.rows_written, elapsed, size
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    rows = int(argv[0]) if len(argv) > 0 else 1_000_000
+    employees = int(argv[1]) if len(argv) > 1 else 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(db_name=os.path.join(tmp, "bench.db"))
+        started = time.perf_counter()
+        _seed(db, rows, employees)
+        print(f"seeded {rows:,} rows in {time.perf_counter() - started:.1f}s")
+        total = db.count_attendance()
+
+        sql, params = db.attendance_export_sql(sort='date', descending=False)
+        jobs = [("csv", CsvExportJob(db.db_name, sql, params, os.path.join(tmp, "out.csv"),
+                                     header=HEADER, total=total))]
+        try:
+            import openpyxl  # noqa: F401
+            sql, params = db.attendance_workbook_sql(group_by='month')
+            summary_sql, summary_params = db.daily_summary_export_sql()
+            jobs.append(("xlsx", XlsxExportJob(db.db_name, sql, params, os.path.join(tmp, "out.xlsx"),
+                                               header=HEADER, total=total,
+                                               summary_sql=summary_sql, summary_params=summary_params)))
+        except ImportError:
+            print("  xlsx    skipped (openpyxl not installed)")
+
+        for label, job in jobs:
+            written, elapsed, size = _time(job)
+            print(f"  {label:<7} {written:,} rows in {elapsed:6.2f}s   {written / elapsed:10,.0f} rows/s   {size:7.1f} MB")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Measure bulk employee import throughput (rows/second).
+
+Run from the project root:
+    python -m benchmarks.bench_import [rows] [bad_every]
+
+Writes a CSV of `rows` employees (default 50,000), where every
+`bad_every`-th row (default 100) repeats an earlier email, and imports it
+into a temporary database with EmployeeImporter, first as a dry run and
+then for real. The per-row Database.add_employee path is timed on a small
+sample for comparison.
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+
+from src.database import Database
+from src.employee_import import EmployeeImporter
+
+
+def _write_csv(path, rows, bad_every):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["Full Name", "Email", "Fingerprint ID"])
+        for i in range(rows):
+            n = i - 1 if bad_every and i and i % bad_every == 0 else i
+            writer.writerow([f"Employee {i}", f"employee{n}@example.com", str(i + 1)])
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    rows = int(argv[0]) if len(argv) > 0 else 50_000
+    bad_every = int(argv[1]) if len(argv) > 1 else 100
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "employees.csv")
+        _write_csv(path, rows, bad_every)
+
+        db = Database(db_name=os.path.join(tmp, "bench.db"))
+        importer = EmployeeImporter(db)
+        for dry_run in (True, False):
+            report = importer.run(path, dry_run=dry_run)
+            label = "dry-run" if dry_run else "import"
+            print(f"  {label:<8} {report.summary()}   {report.elapsed_s:6.2f}s   {report.rows_per_s:10,.0f} rows/s")
+        db.close()
+
+        db = Database(db_name=os.path.join(tmp, "legacy.db"))
+        sample = min(rows, 1000)
+        started = time.perf_counter()
+        for i in range(sample):
+            db.add_employee(f"Employee {i}", f"employee{i}@example.com", str(i + 1))
+        elapsed = time.perf_counter() - started
+        print(f"  {'legacy':<8} {sample} add_employee calls   {elapsed:6.2f}s   {sample / elapsed:10,.0f} rows/s")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Compare the legacy multi-query punch path with PunchEngine.
+
+Run from the project root:
+    python -m benchmarks.bench_punch [employees] [punches_per_employee]
+
+Reports average latency and write-lock hold time (first write to the end
+of COMMIT) over punches that wrote; the legacy flow re-reads the day's
+first session, so from the third round on its arrivals are silent no-ops
+and are counted separately. The two paths run in
+alternating rounds. PunchEngine projects sessions in background batches;
+their count is reported alongside.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from src.database import Database
+
+
+def _legacy_punch(db, employee_id):
+    # Pre-PunchEngine flow: get_today_record, then the original mark_arrival /
+    # mark_departure statements (those methods now also log a punch event)
+    rec = db.get_today_record(employee_id)
+    conn, now = db.conn, datetime.now()
+    date_str, time_str = now.strftime("%Y-%m-%d"), now.strftime("%H:%M:%S")
+    if rec is not None and rec.get('arrival_time') and not rec.get('departure_time'):
+        row = conn.execute(
+            """SELECT id FROM attendance WHERE employee_id = ? AND date = ?
+               AND arrival_time IS NOT NULL AND departure_time IS NULL ORDER BY id DESC""",
+            (employee_id, date_str)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE attendance SET departure_time = ? WHERE id = ?", (time_str, row[0]))
+        else:
+            conn.execute("INSERT INTO attendance (employee_id, date, arrival_time, departure_time) "
+                         "VALUES (?, ?, NULL, ?)", (employee_id, date_str, time_str))
+    elif conn.execute("""SELECT id FROM attendance WHERE employee_id = ? AND date = ?
+                         AND arrival_time IS NOT NULL AND departure_time IS NULL""",
+                      (employee_id, date_str)).fetchone() is None:
+        row = conn.execute("SELECT id FROM attendance WHERE employee_id = ? AND date = ? "
+                           "AND arrival_time IS NULL ORDER BY id LIMIT 1", (employee_id, date_str)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE attendance SET arrival_time = ? WHERE id = ?", (time_str, row[0]))
+        else:
+            conn.execute("INSERT INTO attendance (employee_id, date, arrival_time, departure_time) "
+                         "VALUES (?, ?, ?, NULL)", (employee_id, date_str, time_str))
+    conn.commit()
+
+
+WRITES = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def _run(db, punch, employee_ids):
+    """Punch every employee once in random order.
+
+    Returns (latency_s, lock_hold_s, punches, write_transactions), timing only
+    punches that wrote something. The write lock is held from the first write
+    statement (or from BEGIN IMMEDIATE returning) to the end of COMMIT; waiting
+    for the lock is latency, not hold.
+    """
+    statements = []
+
+    def trace(sql):
+        statements.append((time.perf_counter(), sql.lstrip()[:16].upper()))
+
+    db.conn.set_trace_callback(trace)
+    latency = 0.0
+    lock_hold = 0.0
+    writes = 0
+    order = list(employee_ids)
+    random.shuffle(order)
+    try:
+        for emp_id in order:
+            statements.clear()
+            started = time.perf_counter()
+            punch(emp_id)
+            finished = time.perf_counter()
+            for i, (at, sql) in enumerate(statements):
+                if sql.startswith("BEGIN IMMEDIATE") and i + 1 < len(statements):
+                    at = statements[i + 1][0]
+                elif not sql.startswith(WRITES):
+                    continue
+                latency += finished - started
+                lock_hold += finished - at
+                writes += 1
+                break
+    finally:
+        db.conn.set_trace_callback(None)
+    return latency, lock_hold, len(order), writes
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    employees = int(argv[0]) if len(argv) > 0 else 200
+    rounds = int(argv[1]) if len(argv) > 1 else 4
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dbs, punches = {}, {}
+        for label in ("legacy", "engine"):
+            db = Database(db_name=os.path.join(tmp, f"{label}.db"))
+            ids = [db.add_employee(f"Employee {i}", f"e{i}@example.com", str(i)) for i in range(employees)]
+            # Seed history so per-day lookups are not against an empty table
+            db.conn.executemany(
+                "INSERT INTO attendance (employee_id, date, arrival_time, departure_time) VALUES (?, ?, ?, ?)",
+                [(e, f"2020-01-{d:02d}", "08:00:00", "17:00:00") for e in ids for d in range(1, 29)])
+            db.conn.commit()
+            dbs[label] = (db, ids)
+            punches[label] = (lambda e, _db=db: _legacy_punch(_db, e)) if label == "legacy" else db.punch_engine.punch
+
+        # Alternate the paths round by round so disk noise hits both alike
+        totals = {label: [0.0, 0.0, 0, 0] for label in dbs}
+        for n in range(rounds):
+            for label in (("legacy", "engine") if n % 2 == 0 else ("engine", "legacy")):
+                db, ids = dbs[label]
+                for i, value in enumerate(_run(db, punches[label], ids)):
+                    totals[label][i] += value
+
+        engine_db = dbs["engine"][0]
+        started = time.perf_counter()
+        engine_db.punch_engine.flush()
+        catch_up = time.perf_counter() - started
+        projection = engine_db.punch_engine.stats()["projection"]
+        results = {label: (lat * 1000.0 / max(1, writes), hold * 1000.0 / max(1, writes), count - writes)
+                   for label, (lat, hold, count, writes) in totals.items()}
+        for db, _ in dbs.values():
+            db.close()
+
+    print(f"{employees} employees x {rounds} punches")
+    for label, (lat, hold, skipped) in results.items():
+        note = f"   ({skipped} punches wrote nothing)" if skipped else ""
+        print(f"  {label:<7} latency {lat:8.3f} ms/write   lock hold {hold:8.3f} ms/write{note}")
+    print(f"  engine sessions projected in {projection['batches']} background batches "
+          f"(avg {projection['avg_batch_size']:.1f} punches), final catch-up {catch_up * 1000.0:.1f} ms")
+    legacy, engine = results["legacy"], results["engine"]
+    if engine[0] and engine[1]:
+        print(f"  speedup: latency x{legacy[0] / engine[0]:.2f}, lock hold x{legacy[1] / engine[1]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Concurrent punch producers: one transaction per punch vs the group-commit PunchQueue.
+
+Run from the project root:
+    python -m benchmarks.bench_punch_queue [threads] [punches_per_thread]
+
+Each thread stands in for an API request worker. "direct" gives every thread
+its own connection and commits each punch (what a handler would do without
+the queue); "queue" sends the same punches through Database.submit_punch,
+as the /punch endpoint does. Reports throughput and per-punch latency.
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from src.database import Database
+
+
+def _direct(db, employee_id):
+    conn = getattr(_direct.local, "conn", None)
+    if conn is None:
+        conn = _direct.local.conn = sqlite3.connect(db.db_name, timeout=30)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        db.punch_engine.apply(conn, employee_id, datetime.now().replace(microsecond=0), "api")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+_direct.local = threading.local()
+
+
+def _queued(db, employee_id):
+    db.submit_punch(employee_id, source="api").result(timeout=60)
+
+
+def _run(db, punch, employee_ids, threads, per_thread):
+    """Run `threads` producers; return (punches/s, avg latency ms)."""
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(n):
+        own = []
+        for i in range(per_thread):
+            started = time.perf_counter()
+            punch(db, employee_ids[(n * per_thread + i) % len(employee_ids)])
+            own.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(own)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, sum(latencies) * 1000.0 / len(latencies)
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    threads = int(argv[0]) if len(argv) > 0 else 16
+    per_thread = int(argv[1]) if len(argv) > 1 else 50
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for label, punch in (("direct", _direct), ("queue", _queued)):
+            db = Database(db_name=os.path.join(tmp, f"{label}.db"))
+            ids = [db.add_employee(f"Employee {i}", f"e{i}@example.com", str(i)) for i in range(threads * 4)]
+            results[label] = _run(db, punch, ids, threads, per_thread)
+            if label == "queue":
+                stats = db.get_punch_queue().stats()
+            db.close()
+
+    print(f"{threads} threads x {per_thread} punches")
+    for label, (rate, lat) in results.items():
+        print(f"  {label:<6} {rate:9.0f} punches/s   latency {lat:8.3f} ms/punch")
+    print(f"  queue: {stats['batches']} commits, avg batch {stats['avg_batch_size']:.1f}, "
+          f"max batch {stats['max_batch_size']}")
+    direct, queued = results["direct"], results["queue"]
+    print(f"  speedup: throughput x{queued[0] / direct[0]:.2f}")
+
+
+if __name__ == "__main__":
+    main()
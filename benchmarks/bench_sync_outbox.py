@@ -0,0 +1,67 @@
+"""Measure outbox enqueue latency and batched sync throughput.
+
+Run from the project root:
+    python -m benchmarks.bench_sync_outbox [records] [rtt_ms]
+
+Queues `records` attendance uploads (default 5,000) the way the kiosk does,
+one enqueue per punch, then drains them into a FakeFirestore whose commits
+sleep `rtt_ms` (default 50) to stand in for a network round trip. The
+old path, one direct write per punch, is timed on a small sample.
+"""
+import os
+import sys
+import tempfile
+import time
+
+from src.database import Database
+from src.fake_firestore import FakeFirestore
+from src.sync_outbox import SyncWorker, record_doc_id
+
+
+class _SlowFirestore(FakeFirestore):
+    def __init__(self, rtt_s):
+        super().__init__()
+        self.rtt_s = rtt_s
+
+    def _commit(self, writes):
+        time.sleep(self.rtt_s)
+        return super()._commit(writes)
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    records = int(argv[0]) if len(argv) > 0 else 5000
+    rtt_s = (float(argv[1]) if len(argv) > 1 else 50.0) / 1000.0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(db_name=os.path.join(tmp, "bench.db"))
+        origin = db.outbox.origin
+        client = _SlowFirestore(rtt_s)
+
+        started = time.perf_counter()
+        for n in range(records):
+            record = {"name": "Employee", "status": "arrival", "timestamp": "2030-01-01 08:00:00", "event_id": n}
+            db.outbox.enqueue("attendance", record_doc_id(record, origin), record)
+        enqueue_ms = (time.perf_counter() - started) * 1000.0 / records
+
+        worker = SyncWorker(db.db_name, client, server_timestamp=FakeFirestore.SERVER_TIMESTAMP)
+        started = time.perf_counter()
+        sent = worker.drain()
+        drain_s = time.perf_counter() - started
+        worker.stop()
+
+        sample = min(records, 20)
+        started = time.perf_counter()
+        for n in range(sample):
+            client.collection("attendance").document(f"direct-{n}").set({"event_id": n})
+        direct_ms = (time.perf_counter() - started) * 1000.0 / sample
+
+        print(f"  enqueue      {enqueue_ms:8.3f} ms per punch (UI thread)")
+        print(f"  direct write {direct_ms:8.1f} ms per punch (old UI-thread path)")
+        print(f"  sync         {sent:,} docs in {worker.batches} batches, {drain_s:6.2f}s "
+              f"({sent / drain_s:,.0f} docs/s)")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
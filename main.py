@@ -4,7 +4,7 @@ from src.firebase_manager import FirebaseManager
 from src.admin_dashboard import AdminDashboard
 from src.login import LoginScreen
 from src.pages.company_select_page import CompanySelectPage
-from src.api import start_api_server
+from src.api import start_api_server, set_database
 from src.company_manager import CompanyManager
 
 print("🚀 Starting GDC Attendance App...")
@@ -12,13 +12,29 @@ print("🚀 Starting GDC Attendance App...")
 start_api_server()
 
 import os
-firebase = FirebaseManager()   # make sure this connects to real Firebase
+# Connects to Firebase in the background; uploads queue in the outbox until it is ready
+firebase = FirebaseManager()
 
 # Company-aware startup: load active company and use its DB file
 cm = CompanyManager()
 company_name, company_dir, faces_dir = cm.get_active()
 db_path = cm.ensure_db_path(company_dir)
-db = Database(db_name=db_path)
+
+
+def open_database(path):
+    """Open a company database and start its scheduled backups."""
+    database = Database(db_name=path)
+    # Attendance uploads are queued in this database and synced in the background
+    firebase.attach_database(database)
+    # API punches are group-committed through this database's punch queue
+    set_database(database)
+    database.start_backup_scheduler(
+        store_root=firebase.backup_store.root,
+        on_snapshot=lambda report: firebase.upload_snapshot(report.name))
+    return database
+
+
+db = open_database(db_path)
 
 root = ctk.CTk()
 
@@ -42,7 +58,12 @@ def show_company_select():
         # Create company-scoped database
         global db, faces_dir
         faces_dir = fdir
-        db = Database(db_name=path)
+        # Flush queued punches for the previous company before switching
+        try:
+            db.close()
+        except Exception:
+            pass
+        db = open_database(path)
 
         # Show login screen for the selected company
         for w in root.winfo_children():
@@ -79,3 +100,14 @@ def show_company_select():
 # Always show company select first
 show_company_select()
 root.mainloop()
+
+# Flush any queued punches before exit; unsent cloud writes stay in the outbox.
+# Each close gets its own try so a Firebase failure still closes the database.
+try:
+    firebase.close()
+except Exception as e:
+    print(f"⚠️ Failed to stop Firebase sync: {e}")
+try:
+    db.close()
+except Exception as e:
+    print(f"⚠️ Failed to close the database: {e}")
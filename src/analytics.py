@@ -0,0 +1,318 @@
+import sqlite3
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .database import Database
+
+# Typed columns for attendance loads; NULL times (and unscheduled days) become NaN
+ATTENDANCE_DTYPES = {
+    "employee_id": "int32",
+    "work_day": "int32",
+    "arrival_secs": "float64",
+    "departure_secs": "float64",
+    "shift_start_secs": "float64",
+    "shift_end_secs": "float64",
+    "late_after_secs": "float64",
+}
+
+# Per (employee_id, work_day) columns returned by AttendanceAnalytics.load()
+DAY_AGGREGATES = {
+    "sessions": "sum",
+    "first_arrival_secs": "min",
+    "last_departure_secs": "max",
+    "worked_secs": "sum",
+    "shift_start_secs": "first",
+    "shift_end_secs": "first",
+    "late_after_secs": "first",
+}
+
+ROUNDING_MODES = ("nearest", "up", "down", "employer")
+
+
+_secs = Database.time_to_secs
+_day = Database.date_to_day
+
+
+class ShiftRules:
+    """Shift parameters used by AttendanceAnalytics.
+
+    On days with a rostered shift (expected_intervals, see ScheduleEngine)
+    lateness and early leaves are measured against that shift, as in
+    daily_summary. On unscheduled days an arrival is late once it is past
+    shift_start + grace_minutes, and lateness is then counted from
+    shift_start. Worked time is computed from
+    punches rounded to `rounding_minutes` (0 disables rounding). The modes
+    are 'nearest', 'up', 'down', and 'employer' (arrivals round up and
+    departures round down). Overtime is worked time beyond
+    `standard_minutes` per day. `workdays` are weekday numbers (Monday=0)
+    on which attendance is expected.
+    """
+
+    def __init__(self, shift_start='09:00:00', shift_end='17:00:00', grace_minutes=0, rounding_minutes=0,
+                 rounding_mode='nearest', standard_minutes=None, workdays=(0, 1, 2, 3, 4), holidays=()):
+        if rounding_mode not in ROUNDING_MODES:
+            raise ValueError(f"Unknown rounding mode: {rounding_mode}")
+        self.shift_start = _secs(shift_start)
+        self.shift_end = _secs(shift_end)
+        self.grace_secs = int(grace_minutes) * 60
+        self.rounding_secs = int(rounding_minutes) * 60
+        self.rounding_mode = rounding_mode
+        if standard_minutes is None:
+            standard_minutes = max(0, self.shift_end - self.shift_start) // 60
+        self.standard_secs = int(standard_minutes) * 60
+        self.workdays = tuple(sorted({int(d) for d in workdays}))
+        self.holidays = {_day(h) if isinstance(h, str) else int(h) for h in holidays}
+
+    @classmethod
+    def from_settings(cls, db):
+        """Build rules from settings (shift_start falls back to the late_cutoff setting)."""
+        workdays = db.get_setting('workdays', '0,1,2,3,4')
+        return cls(
+            shift_start=db.get_setting('shift_start', db.get_setting('late_cutoff', '09:00:00')),
+            shift_end=db.get_setting('shift_end', '17:00:00'),
+            grace_minutes=db.get_setting_int('late_grace_minutes', 0),
+            rounding_minutes=db.get_setting_int('rounding_minutes', 0),
+            rounding_mode=db.get_setting('rounding_mode', 'nearest'),
+            standard_minutes=db.get_setting_int('standard_day_minutes', 0) or None,
+            workdays=[int(d) for d in str(workdays).split(',') if d.strip().isdigit()],
+        )
+
+    def _round(self, secs, mode):
+        if not self.rounding_secs:
+            return secs
+        step = self.rounding_secs
+        if mode == "up":
+            return np.ceil(secs / step) * step
+        if mode == "down":
+            return np.floor(secs / step) * step
+        return np.round(secs / step) * step
+
+    def round_arrivals(self, secs):
+        return self._round(secs, "up" if self.rounding_mode == "employer" else self.rounding_mode)
+
+    def round_departures(self, secs):
+        return self._round(secs, "down" if self.rounding_mode == "employer" else self.rounding_mode)
+
+
+class AttendanceAnalytics:
+    """Vectorized hours, overtime, lateness and absence metrics over a date range.
+
+    Attendance is read in chunks from the integer epoch columns (no string
+    parsing) into typed NumPy-backed frames, joined with each day's expected
+    interval; every metric is computed with column operations and groupby
+    aggregates rather than Python loops. Each chunk is reduced to
+    per-employee-day rows as it arrives, so memory follows employee-days,
+    not sessions.
+    """
+
+    def __init__(self, db, rules: Optional[ShiftRules] = None, chunk_size: int = 250_000):
+        self.db = db
+        self.rules = rules or ShiftRules.from_settings(db)
+        self.chunk_size = max(1, int(chunk_size))
+
+    def _connect(self):
+        # A plain connection (no sqlite3.Row factory) so pandas gets tuples; safe off the UI thread
+        return sqlite3.connect(self.db.db_name)
+
+    def load(self, start_date: str, end_date: str, employee_id=None) -> pd.DataFrame:
+        """Per (employee_id, work_day) session totals for [start_date, end_date].
+
+        Columns: employee_id, work_day, sessions, first_arrival_secs,
+        last_departure_secs, worked_secs (after rounding), and the day's
+        shift_start_secs, shift_end_secs and late_after_secs (NaN when
+        unscheduled).
+        """
+        params = [_day(start_date), _day(end_date)]
+        conn = self._connect()
+        try:
+            # Closed years live in attendance_<year>.db archives
+            archives = self.db.archives
+            sql = f"""
+                SELECT attendance.employee_id, attendance.work_day, attendance.arrival_secs, attendance.departure_secs,
+                       expected_intervals.start_secs AS shift_start_secs,
+                       expected_intervals.end_secs AS shift_end_secs,
+                       expected_intervals.start_secs + expected_intervals.grace_secs AS late_after_secs
+                FROM {archives.source('attendance', start_date, end_date, conn=conn)}
+                LEFT JOIN {archives.source('expected_intervals', start_date, end_date, conn=conn)}
+                    ON expected_intervals.employee_id = attendance.employee_id
+                   AND expected_intervals.work_day = attendance.work_day
+                WHERE attendance.work_day BETWEEN ? AND ? AND attendance.employee_id IS NOT NULL
+            """
+            if employee_id is not None:
+                sql += " AND attendance.employee_id = ?"
+                params.append(int(employee_id))
+            # Reduce each chunk right away; an employee-day split across chunks
+            # is combined by the final groupby
+            partials = [self._aggregate(chunk) for chunk in pd.read_sql_query(
+                sql, conn, params=params, chunksize=self.chunk_size, dtype=ATTENDANCE_DTYPES)]
+        finally:
+            conn.close()
+        if not partials:
+            return pd.DataFrame({
+                "employee_id": pd.Series(dtype="int32"), "work_day": pd.Series(dtype="int32"),
+                **{c: pd.Series(dtype="int64" if c == "sessions" else "float64") for c in DAY_AGGREGATES}})
+        frame = pd.concat(partials, ignore_index=True)
+        if len(partials) == 1:
+            return frame
+        return frame.groupby(["employee_id", "work_day"], sort=True).agg(DAY_AGGREGATES).reset_index()
+
+    def _aggregate(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """Collapse a chunk of sessions to per-employee-day rows (see load())."""
+        rules = self.rules
+        arrival = chunk["arrival_secs"].to_numpy()
+        departure = chunk["departure_secs"].to_numpy()
+        worked = rules.round_departures(departure) - rules.round_arrivals(arrival)
+        # Open sessions (NaN) and inverted punches count as zero worked time
+        worked = np.where(worked > 0, worked, 0.0)
+
+        sessions = pd.DataFrame({
+            "employee_id": chunk["employee_id"].to_numpy(),
+            "work_day": chunk["work_day"].to_numpy(),
+            "arrival": arrival,
+            "departure": departure,
+            "worked": worked,
+            "shift_start": chunk["shift_start_secs"].to_numpy(),
+            "shift_end": chunk["shift_end_secs"].to_numpy(),
+            "late_after": chunk["late_after_secs"].to_numpy(),
+        })
+        return sessions.groupby(["employee_id", "work_day"], sort=True).agg(
+            sessions=("worked", "size"),
+            first_arrival_secs=("arrival", "min"),
+            last_departure_secs=("departure", "max"),
+            worked_secs=("worked", "sum"),
+            shift_start_secs=("shift_start", "first"),
+            shift_end_secs=("shift_end", "first"),
+            late_after_secs=("late_after", "first"),
+        ).reset_index()
+
+    def daily_metrics(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """Per (employee_id, work_day) metrics from a frame returned by load().
+
+        Columns: employee_id, work_day, date, weekday, sessions, first_arrival_secs,
+        last_departure_secs, worked_secs, overtime_secs, present, late, late_minutes,
+        early_leave, early_leave_minutes.
+        """
+        rules = self.rules
+        daily = frame[["employee_id", "work_day", "sessions", "first_arrival_secs",
+                       "last_departure_secs", "worked_secs"]].copy()
+
+        # The rostered shift where there is one, else the rules' default shift
+        scheduled = frame["late_after_secs"].to_numpy()
+        unscheduled = np.isnan(scheduled)
+        late_after = np.where(unscheduled, rules.shift_start + rules.grace_secs, scheduled)
+        start = np.where(unscheduled, rules.shift_start, frame["shift_start_secs"].to_numpy())
+        end = np.where(unscheduled, rules.shift_end, frame["shift_end_secs"].to_numpy())
+
+        first = daily["first_arrival_secs"].to_numpy()
+        last = daily["last_departure_secs"].to_numpy()
+        late = first > late_after
+        early = last < end
+
+        daily["date"] = pd.to_datetime(daily["work_day"].to_numpy(), unit="D")
+        # 1970-01-01 was a Thursday (weekday 3)
+        daily["weekday"] = ((daily["work_day"].to_numpy() + 3) % 7).astype("int8")
+        daily["overtime_secs"] = np.clip(daily["worked_secs"].to_numpy() - rules.standard_secs, 0, None)
+        daily["present"] = ~np.isnan(first)
+        daily["late"] = late
+        daily["late_minutes"] = np.where(late, (first - start) / 60.0, 0.0)
+        daily["early_leave"] = early
+        daily["early_leave_minutes"] = np.where(early, (end - last) / 60.0, 0.0)
+        return daily
+
+    def expected_days(self, start_date: str, end_date: str) -> np.ndarray:
+        """Work days (epoch day numbers) in the range on which attendance is expected.
+
+        Days after today are excluded so they do not count as absences.
+        """
+        end = min(_day(end_date), _day(datetime.now().strftime("%Y-%m-%d")))
+        days = np.arange(_day(start_date), end + 1, dtype=np.int32)
+        mask = np.isin((days + 3) % 7, self.rules.workdays)
+        if self.rules.holidays:
+            mask &= ~np.isin(days, np.fromiter(self.rules.holidays, dtype=np.int32))
+        return days[mask]
+
+    @staticmethod
+    def absence_streaks(present: np.ndarray):
+        """Return (longest, current) absence run per row of a boolean employees x days matrix."""
+        if present.shape[1] == 0:
+            zeros = np.zeros(present.shape[0], dtype=np.int32)
+            return zeros, zeros
+        absent_total = np.cumsum(~present, axis=1)
+        # Absences counted up to the most recent present day, carried forward
+        at_reset = np.maximum.accumulate(np.where(present, absent_total, 0), axis=1)
+        run = absent_total - at_reset
+        return run.max(axis=1), run[:, -1]
+
+    def employee_metrics(self, start_date: str, end_date: str, employee_id=None,
+                         daily: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """Per-employee totals for the range, including employees with no punches.
+
+        Columns: employee_id, name, days_present, sessions, hours_worked, overtime_hours,
+        late_days, late_minutes, early_leave_days, expected_days, absent_days,
+        longest_absence_streak, current_absence_streak.
+        """
+        if daily is None:
+            daily = self.daily_metrics(self.load(start_date, end_date, employee_id))
+
+        conn = self._connect()
+        try:
+            sql = "SELECT id AS employee_id, name FROM employees"
+            params: list = []
+            if employee_id is not None:
+                sql += " WHERE id = ?"
+                params.append(int(employee_id))
+            employees = pd.read_sql_query(sql + " ORDER BY id", conn, params=params)
+        finally:
+            conn.close()
+
+        totals = daily.groupby("employee_id").agg(
+            days_present=("present", "sum"),
+            sessions=("sessions", "sum"),
+            worked_secs=("worked_secs", "sum"),
+            overtime_secs=("overtime_secs", "sum"),
+            late_days=("late", "sum"),
+            late_minutes=("late_minutes", "sum"),
+            early_leave_days=("early_leave", "sum"),
+        )
+        totals.index = totals.index.astype("int64")
+        result = employees.join(totals, on="employee_id")
+        count_cols = ["days_present", "sessions", "late_days", "early_leave_days"]
+        result[count_cols] = result[count_cols].fillna(0).astype("int64")
+        result["hours_worked"] = result.pop("worked_secs").fillna(0.0) / 3600.0
+        result["overtime_hours"] = result.pop("overtime_secs").fillna(0.0) / 3600.0
+        result["late_minutes"] = result["late_minutes"].fillna(0.0)
+
+        # Absences: scatter present days into an employees x expected-days matrix
+        expected = self.expected_days(start_date, end_date)
+        matrix = np.zeros((len(employees), len(expected)), dtype=bool)
+        if len(expected):
+            attended = daily[daily["present"]]
+            rows = pd.Index(employees["employee_id"]).get_indexer(attended["employee_id"])
+            days = attended["work_day"].to_numpy()
+            cols = np.searchsorted(expected, days)
+            valid = (rows >= 0) & (cols < len(expected))
+            valid[valid] = expected[cols[valid]] == days[valid]
+            matrix[rows[valid], cols[valid]] = True
+        longest, current = self.absence_streaks(matrix)
+        result["expected_days"] = len(expected)
+        result["absent_days"] = len(expected) - matrix.sum(axis=1)
+        result["longest_absence_streak"] = longest
+        result["current_absence_streak"] = current
+        return result
+
+    def per_day_totals(self, daily: pd.DataFrame) -> pd.DataFrame:
+        """Company-wide totals per day: present, late, early leaves, hours and overtime."""
+        per_day = daily.groupby("work_day").agg(
+            present=("present", "sum"),
+            late=("late", "sum"),
+            early_leave=("early_leave", "sum"),
+            worked_secs=("worked_secs", "sum"),
+            overtime_secs=("overtime_secs", "sum"),
+        ).reset_index()
+        per_day["date"] = pd.to_datetime(per_day["work_day"].to_numpy(), unit="D")
+        per_day["hours_worked"] = per_day.pop("worked_secs") / 3600.0
+        per_day["overtime_hours"] = per_day.pop("overtime_secs") / 3600.0
+        return per_day
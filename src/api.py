@@ -1,4 +1,5 @@
 import logging
+import sqlite3
 from flask import Flask, request
 
 app = Flask(__name__)
@@ -7,11 +8,56 @@ app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Database the punch endpoint writes to; main.py sets it for the active company
+_db = None
+
+
+def set_database(db):
+    """Route API punches to `db` (called again after a company switch)."""
+    global _db
+    _db = db
+
+
+def _employee_exists(employee_id) -> bool:
+    # The database's own connection (and its employee directory) belongs to the
+    # UI thread; requests run on server threads, so look up on a plain one
+    conn = sqlite3.connect(_db.db_name)
+    try:
+        return conn.execute("SELECT 1 FROM employees WHERE id = ?", (employee_id,)).fetchone() is not None
+    finally:
+        conn.close()
+
+
 @app.route('/welcome')
 def welcome():
     logger.info(f"Request received: {request.method} {request.path}")
     return {'message': 'Welcome to the GDC Attendance System API!'}
 
+
+@app.route('/punch', methods=['POST'])
+def punch():
+    """Record a punch for {"employee_id": ...}.
+
+    Requests run on the server's worker threads; each one is queued on the
+    database's PunchQueue, so concurrent punches share one commit, and the
+    response is sent once its batch is durable.
+    """
+    logger.info(f"Request received: {request.method} {request.path}")
+    if _db is None:
+        return {'error': 'No database is open'}, 503
+    data = request.get_json(silent=True) or {}
+    try:
+        employee_id = int(data['employee_id'])
+    except (KeyError, TypeError, ValueError):
+        return {'error': 'employee_id is required'}, 400
+    try:
+        if not _employee_exists(employee_id):
+            return {'error': f'Unknown employee {employee_id}'}, 404
+        return _db.submit_punch(employee_id, source='api').result(timeout=30)
+    except Exception as e:
+        logger.error(f"Punch failed for employee {employee_id}: {e}")
+        return {'error': str(e)}, 500
+
 def start_api_server():
     from threading import Thread
     def run_app():
@@ -0,0 +1,400 @@
+import os
+import re
+import sqlite3
+import sys
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from .attendance_import import deferred_attendance_schema, table_columns
+from .daily_summary import DAILY_SUMMARY_SQL
+from .punch_events import PUNCH_EVENTS_SQL
+from .schedule_engine import EXPECTED_INTERVALS_SQL
+
+# Tables moved per year by work_day (punch_events moves by its ts, see archive_year)
+ARCHIVED_TABLES = ("attendance", "daily_summary", "expected_intervals")
+
+# Archive copies of the hot attendance indexes, so each arm of a paged
+# query (see Database.query_attendance) is an index walk
+ARCHIVE_INDEXES = (
+    ("ix_attendance_day", "work_day"),
+    ("ix_attendance_employee_day", "employee_id, work_day"),
+    ("ix_attendance_arrival", "arrival_secs"),
+    ("ix_attendance_departure", "departure_secs"),
+    ("ix_attendance_employee", "employee_id"),
+)
+
+_ARCHIVE_NAME = re.compile(r"^attendance_(\d{4})\.db$")
+
+ARCHIVE_META_SQL = """
+CREATE TABLE IF NOT EXISTS {schema}.archive_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+)
+"""
+
+
+def _alias(year: int) -> str:
+    return f"archive_{int(year)}"
+
+
+def _year_days(year: int) -> Tuple[int, int]:
+    epoch = date(1970, 1, 1).toordinal()
+    return date(year, 1, 1).toordinal() - epoch, date(year, 12, 31).toordinal() - epoch
+
+
+def _year_ts(year: int) -> Tuple[int, int]:
+    """[start, end) of a local calendar year in punch_events.ts seconds."""
+    return int(datetime(year, 1, 1).timestamp()), int(datetime(year + 1, 1, 1).timestamp())
+
+
+class ArchiveManager:
+    """Yearly archives of attendance history next to the company database.
+
+    A closed year's attendance, daily_summary, expected_intervals and
+    punch_events rows are moved into `attendance_<year>.db` in one transaction spanning both
+    files, so the hot database only keeps recent data. Employees stay in
+    the hot database; archives keep employee ids only.
+
+    Range reports call `source()`, which ATTACHes the archives overlapping
+    the range on demand and returns a UNION ALL of the hot and archived
+    tables under the original table name, so the surrounding SQL is
+    unchanged. Paged queries use `tables()` instead and run per file, since
+    a filter or ORDER BY over the UNION cannot use the tables' indexes; past
+    SQLite's attach limit they go through `year_batches()` one group of
+    archives at a time. `restore_year()` merges an archive back into the hot
+    database; archiving a year that already has an archive merges first, so
+    late imports for a closed year end up in the same file.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    # --- files ---
+    @property
+    def directory(self) -> str:
+        return os.path.dirname(os.path.abspath(self.db.db_name))
+
+    def path_for(self, year: int) -> str:
+        return os.path.join(self.directory, f"attendance_{int(year)}.db")
+
+    def archives(self) -> Dict[int, str]:
+        """Return {year: path} of the archive files next to the database."""
+        found = {}
+        try:
+            for name in os.listdir(self.directory):
+                match = _ARCHIVE_NAME.match(name)
+                if match:
+                    found[int(match.group(1))] = os.path.join(self.directory, name)
+        except OSError:
+            pass
+        return dict(sorted(found.items()))
+
+    # --- attaching ---
+    def _attached(self, conn) -> Dict[str, str]:
+        return {row[1]: row[2] for row in conn.execute("PRAGMA database_list")}
+
+    def _make_room(self, conn, needed: int, keep=()):
+        """Detach archives not in `keep` until `needed` more fit under SQLite's attach limit."""
+        attached = [a for a in self._attached(conn) if a not in ("main", "temp")]
+        limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        for alias in [a for a in attached if a.startswith("archive_") and a not in keep]:
+            if len(attached) + needed <= limit:
+                break
+            conn.execute(f"DETACH DATABASE {alias}")
+            attached.remove(alias)
+
+    def attach(self, conn, years) -> List[str]:
+        """ATTACH the archives for `years` on conn (if not already) and return their aliases.
+
+        Archives no longer needed are detached when SQLite's attach limit
+        (10 by default) would be exceeded.
+        """
+        years = sorted(set(years))
+        limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+        if len(years) > limit:
+            raise ValueError(f"The range spans {len(years)} archived years; at most {limit} can be attached")
+        archives = self.archives()
+        attached = self._attached(conn)
+        missing = [y for y in years if _alias(y) not in attached]
+        if missing:
+            if conn.in_transaction:
+                conn.commit()  # ATTACH/DETACH are not allowed inside a transaction
+            self._make_room(conn, len(missing), keep={_alias(y) for y in years})
+            for year in missing:
+                conn.execute(f"ATTACH DATABASE ? AS {_alias(year)}", (archives[year],))
+                try:
+                    # Archives written before an index was added get it on first use
+                    self._create_indexes(conn, _alias(year))
+                    conn.commit()
+                except sqlite3.Error:
+                    pass
+        return [_alias(y) for y in years]
+
+    def tables(self, table: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+               conn=None) -> List[str]:
+        """Qualified names of `table` in the hot database and each archive overlapping the range.
+
+        Returns [table] when no archive overlaps. Callers that page or count
+        run their query once per table, so each arm uses that file's indexes.
+        """
+        return self.batch_tables(table, self.years_for(start_date, end_date), conn=conn)
+
+    def year_batches(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                     conn=None) -> List[List[int]]:
+        """Archived years overlapping the range, in groups that can be attached together.
+
+        Always returns at least one group ([[]] when no archive overlaps). Pass
+        each group to batch_tables() in turn; the first one includes the hot table.
+        """
+        conn = conn or self.db.conn
+        years = self.years_for(start_date, end_date)
+        others = [a for a in self._attached(conn) if a not in ("main", "temp") and not a.startswith("archive_")]
+        size = max(1, conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) - len(others))
+        return [years[i:i + size] for i in range(0, len(years), size)] or [[]]
+
+    def batch_tables(self, table: str, years, hot: bool = True, conn=None) -> List[str]:
+        """Attach one group from year_batches() and return the qualified names of `table`.
+
+        hot=False leaves out the hot table (for every group after the first).
+        """
+        if not years:
+            return [table] if hot else []
+        aliases = self.attach(conn or self.db.conn, years)
+        return ([f"main.{table}"] if hot else []) + [f"{alias}.{table}" for alias in aliases]
+
+    def detach(self, conn, year: int):
+        if _alias(year) in self._attached(conn):
+            if conn.in_transaction:
+                conn.commit()
+            conn.execute(f"DETACH DATABASE {_alias(year)}")
+
+    def years_for(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[int]:
+        """Archived years overlapping [start_date, end_date] (None = unbounded)."""
+        first = int(start_date[:4]) if start_date else None
+        last = int(end_date[:4]) if end_date else None
+        return [y for y in self.archives()
+                if (first is None or y >= first) and (last is None or y <= last)]
+
+    def _columns(self, conn, schema: str, table: str, writable: bool = False) -> List[str]:
+        return table_columns(conn, schema, table, writable)
+
+    def source(self, table: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+               conn=None) -> str:
+        """FROM-clause text for `table` covering the date range.
+
+        Returns the bare table name when no archive overlaps the range, or a
+        UNION ALL subquery aliased to the table name after attaching the
+        archives on conn (default: the Database connection).
+        """
+        years = self.years_for(start_date, end_date)
+        if not years:
+            return table
+        conn = conn or self.db.conn
+        aliases = self.attach(conn, years)
+        columns = set(self._columns(conn, "main", table))
+        for alias in aliases:
+            columns &= set(self._columns(conn, alias, table))
+        cols = ", ".join(c for c in self._columns(conn, "main", table) if c in columns)
+        parts = [f"SELECT {cols} FROM main.{table}"] + [f"SELECT {cols} FROM {a}.{table}" for a in aliases]
+        return "(" + " UNION ALL ".join(parts) + f") AS {table}"
+
+    def attach_map(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> Dict[str, str]:
+        """{alias: path} a separate connection must ATTACH to run SQL built by source()."""
+        archives = self.archives()
+        return {_alias(y): archives[y] for y in self.years_for(start_date, end_date)}
+
+    # --- archiving ---
+    @staticmethod
+    def _create_indexes(conn, alias: str):
+        for name, columns in ARCHIVE_INDEXES:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {alias}.{name} ON attendance ({columns})")
+
+    def _create_schema(self, conn, alias: str):
+        # Archives store the generated epoch columns as plain values (they are never updated)
+        main_cols = [r[:6] for r in conn.execute("PRAGMA main.table_xinfo(attendance)") if r[6] in (0, 2, 3)]
+        cols = []
+        for _, name, col_type, _, _, pk in main_cols:
+            cols.append(f"{name} INTEGER PRIMARY KEY" if pk else f"{name} {col_type}".strip())
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {alias}.attendance ({', '.join(cols)})")
+        existing = set(self._columns(conn, alias, "attendance"))
+        for _, name, col_type, _, _, pk in main_cols:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {alias}.attendance ADD COLUMN {name} {col_type}")
+        self._create_indexes(conn, alias)
+        conn.execute(DAILY_SUMMARY_SQL.replace("EXISTS daily_summary", f"EXISTS {alias}.daily_summary", 1))
+        conn.execute(EXPECTED_INTERVALS_SQL.replace("EXISTS expected_intervals",
+                                                    f"EXISTS {alias}.expected_intervals", 1))
+        conn.execute(PUNCH_EVENTS_SQL.replace("EXISTS punch_events", f"EXISTS {alias}.punch_events", 1))
+        conn.execute(ARCHIVE_META_SQL.format(schema=alias))
+
+    def closed_years(self, keep_years: Optional[int] = None) -> List[int]:
+        """Years with attendance in the hot database that are old enough to archive.
+
+        keep_years (default: the 'archive_keep_years' setting, 1) counts the
+        current year, so 1 archives everything before this year.
+        """
+        if keep_years is None:
+            keep_years = self.db.get_setting_int('archive_keep_years', 1)
+        before = datetime.now().year - max(1, int(keep_years)) + 1
+        row = self.db.conn.execute("SELECT MIN(work_day) FROM main.attendance").fetchone()
+        if row[0] is None:
+            return []
+        first = self.db.day_to_date(row[0])[:4]
+        years = []
+        for year in range(int(first), before):
+            start, end = _year_days(year)
+            if self.db.conn.execute("SELECT 1 FROM main.attendance WHERE work_day BETWEEN ? AND ? LIMIT 1",
+                                    (start, end)).fetchone():
+                years.append(year)
+        return years
+
+    def archive_closed_years(self, keep_years: Optional[int] = None) -> Dict[int, int]:
+        """Archive every closed year. Returns {year: attendance rows moved}."""
+        return {year: self.archive_year(year) for year in self.closed_years(keep_years)}
+
+    def archive_year(self, year: int) -> int:
+        """Move one closed year out of the hot database. Returns attendance rows moved."""
+        year = int(year)
+        if year >= datetime.now().year:
+            raise ValueError(f"{year} is not a closed year")
+        if year in self.archives():
+            self.restore_year(year)
+        self.db.punch_engine.flush()
+        conn = self.db.conn
+        start, end = _year_days(year)
+        alias = _alias(year)
+        if conn.in_transaction:
+            conn.commit()
+        self._make_room(conn, 1)
+        conn.execute(f"ATTACH DATABASE ? AS {alias}", (self.path_for(year),))
+        try:
+            self._create_schema(conn, alias)
+            conn.commit()
+            deferred = [d for d in deferred_attendance_schema(conn) if d[0] == 'trigger']
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                moved = 0
+                for table in ARCHIVED_TABLES:
+                    cols = ", ".join(c for c in self._columns(conn, "main", table)
+                                     if c in set(self._columns(conn, alias, table)))
+                    cursor = conn.execute(
+                        f"INSERT OR REPLACE INTO {alias}.{table} ({cols}) "
+                        f"SELECT {cols} FROM main.{table} WHERE work_day BETWEEN ? AND ?", (start, end))
+                    if table == "attendance":
+                        moved = cursor.rowcount
+                # Raw events of the year, once projected. The newest event stays so
+                # INTEGER PRIMARY KEY never hands out an archived id again.
+                event_filter = ("ts >= ? AND ts < ? AND id <= ? "
+                                "AND id < (SELECT MAX(id) FROM main.punch_events)")
+                event_params = _year_ts(year) + (self.db.punch_engine.projector.watermark(conn),)
+                cols = ", ".join(self._columns(conn, alias, "punch_events"))
+                conn.execute(f"INSERT OR REPLACE INTO {alias}.punch_events ({cols}) "
+                             f"SELECT {cols} FROM main.punch_events WHERE {event_filter}", event_params)
+                conn.execute(f"DELETE FROM main.punch_events WHERE {event_filter}", event_params)
+                # The summary rows move with the year, so skip the per-row delete triggers
+                for kind, name, _ in deferred:
+                    conn.execute(f"DROP TRIGGER IF EXISTS main.{name}")
+                for table in ARCHIVED_TABLES:
+                    conn.execute(f"DELETE FROM main.{table} WHERE work_day BETWEEN ? AND ?", (start, end))
+                for _, _, sql in deferred:
+                    conn.execute(sql)
+                conn.executemany(
+                    f"INSERT INTO {alias}.archive_meta (key, value) VALUES (?, ?) "
+                    f"ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                    [('year', str(year)), ('archived_at', datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
+                     ('rows', str(conn.execute(f"SELECT COUNT(*) FROM {alias}.attendance").fetchone()[0]))])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        finally:
+            self.detach(conn, year)
+        print(f"📦 Archived {moved} attendance rows from {year} to {self.path_for(year)}")
+        return moved
+
+    def restore_year(self, year: int) -> int:
+        """Merge an archive back into the hot database and remove it. Returns rows merged.
+
+        Rows whose id already exists in the hot database are left out; the
+        archive is then kept as attendance_<year>.db.unmerged for inspection.
+        """
+        year = int(year)
+        path = self.archives().get(year)
+        if path is None:
+            return 0
+        conn = self.db.conn
+        alias = _alias(year)
+        self.attach(conn, [year])
+        try:
+            deferred = deferred_attendance_schema(conn)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for kind, name, _ in deferred:
+                    conn.execute(f"DROP {kind.upper()} IF EXISTS main.{name}")
+                merged = total = 0
+                for table in ("attendance", "expected_intervals", "punch_events"):
+                    cols = ", ".join(c for c in self._columns(conn, "main", table, writable=True)
+                                     if c in set(self._columns(conn, alias, table)))
+                    if not cols:
+                        continue  # archived before the table was archived
+                    cursor = conn.execute(f"INSERT OR IGNORE INTO main.{table} ({cols}) "
+                                          f"SELECT {cols} FROM {alias}.{table}")
+                    if table == "attendance":
+                        merged = cursor.rowcount
+                        total = conn.execute(f"SELECT COUNT(*) FROM {alias}.attendance").fetchone()[0]
+                for _, _, sql in deferred:
+                    conn.execute(sql)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+        finally:
+            self.detach(conn, year)
+
+        # Summaries are recomputed so they cover hot and merged rows together
+        self.db.daily_summary.rebuild(*_year_days(year))
+        if merged == total:
+            os.remove(path)
+        else:
+            os.replace(path, path + ".unmerged")
+            print(f"⚠️ {total - merged} archived rows from {year} conflicted with existing ids; "
+                  f"kept {path}.unmerged")
+        print(f"📦 Restored {merged} attendance rows from {year}")
+        return merged
+
+
+def main(argv=None):
+    """Command line:
+    python -m src.archive_manager [--db attendance.db] list | archive [YEAR ...] | restore YEAR ..."""
+    from .database import Database
+
+    argv = list(argv if argv is not None else sys.argv[1:])
+    db_name = "attendance.db"
+    if "--db" in argv:
+        i = argv.index("--db")
+        db_name = argv[i + 1]
+        del argv[i:i + 2]
+    if not argv or argv[0] not in ("list", "archive", "restore") or (argv[0] == "restore" and len(argv) < 2):
+        print(main.__doc__)
+        return 2
+
+    db = Database(db_name=db_name)
+    try:
+        manager = db.archives
+        command, years = argv[0], [int(y) for y in argv[1:]]
+        if command == "list":
+            for year, path in manager.archives().items():
+                print(f"  {year}  {os.path.getsize(path) / 1e6:8.1f} MB  {path}")
+        elif command == "archive":
+            for year in years or manager.closed_years():
+                manager.archive_year(year)
+        else:
+            for year in years:
+                manager.restore_year(year)
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
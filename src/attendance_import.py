@@ -0,0 +1,488 @@
+import csv
+import sys
+import time
+from collections import Counter
+from datetime import date, datetime, time as dtime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .employee_import import EmployeeImporter, ImportReport, _cell, _normalize_header
+from .schedule_engine import classify_sql
+
+# Header spellings accepted for each field (compared after normalizing)
+COLUMN_ALIASES = {
+    "employee_key": "key", "employee": "key", "employee_id": "key", "emp": "key", "emp_id": "key", "user_id": "key",
+    "badge": "key", "badge_id": "key", "badge_number": "key", "enroll_number": "key",
+    "fingerprint_id": "key", "email": "key", "key": "key",
+    "date": "date", "work_date": "date", "day": "date",
+    "arrival_time": "arrival", "arrival": "arrival", "time_in": "arrival", "clock_in": "arrival",
+    "check_in": "arrival", "in": "arrival",
+    "departure_time": "departure", "departure": "departure", "time_out": "departure", "clock_out": "departure",
+    "check_out": "departure", "out": "departure",
+    "timestamp": "timestamp", "datetime": "timestamp", "punch_time": "timestamp", "time": "time",
+    "direction": "direction", "punch_type": "direction", "type": "direction", "in_out": "direction",
+    "state": "direction",
+}
+
+DIRECTIONS = {
+    "in": "in", "i": "in", "arrival": "in", "entry": "in", "check_in": "in", "clock_in": "in",
+    "out": "out", "o": "out", "departure": "out", "exit": "out", "check_out": "out", "clock_out": "out",
+}
+
+KEY_FIELDS = ("fingerprint_id", "email", "id", "name")
+
+# The epoch columns are generated by SQLite; only old versions store them (see
+# Database._migrate_epoch_columns), and then the import fills them itself
+INSERT_SQL = """
+INSERT INTO attendance (employee_id, date, arrival_time, departure_time)
+VALUES (?, ?, ?, ?)
+"""
+
+INSERT_WITH_EPOCH_SQL = """
+INSERT INTO attendance (employee_id, date, arrival_time, departure_time, work_day, arrival_secs, departure_secs)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+STAGE_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS import_punches (
+    employee_id INTEGER NOT NULL,
+    work_day INTEGER NOT NULL,
+    secs INTEGER NOT NULL,
+    direction TEXT
+)
+"""
+
+# Pair staged punches into sessions per employee-day. Without a direction
+# column punches alternate arrival/departure; with one, every 'in' opens a
+# session and its last 'out' closes it (outs before the first in get
+# session 0 and are dropped as orphans).
+PAIR_SQL = """
+WITH numbered AS (
+    SELECT employee_id, work_day, secs, direction,
+           CASE WHEN :directed THEN SUM(direction = 'in') OVER w
+                ELSE (ROW_NUMBER() OVER w + 1) / 2 END AS session,
+           CASE WHEN :directed THEN direction = 'in'
+                ELSE ROW_NUMBER() OVER w % 2 = 1 END AS is_arrival
+    FROM temp.import_punches
+    WINDOW w AS (PARTITION BY employee_id, work_day ORDER BY secs ROWS UNBOUNDED PRECEDING)
+)
+SELECT employee_id, work_day,
+       MIN(CASE WHEN is_arrival THEN secs END) AS arrival_secs,
+       MAX(CASE WHEN NOT is_arrival THEN secs END) AS departure_secs,
+       COUNT(*) AS punches
+FROM numbered
+GROUP BY employee_id, work_day, session
+ORDER BY work_day, employee_id, session
+"""
+
+# Log imported sessions as already-projected punch events: an arrival and,
+# if closed, a departure per session, in time order. The 'utc' modifier
+# reads date + time as local time, like datetime.timestamp().
+IMPORT_EVENTS_SQL = """
+INSERT INTO punch_events (employee_id, ts, source, action)
+SELECT employee_id, ts, 'import', action FROM (
+    SELECT employee_id, CAST(strftime('%s', date || ' ' || arrival_time, 'utc') AS INTEGER) AS ts,
+           'arrival' AS action, id, 0 AS step
+    FROM attendance WHERE id >= :first_id AND arrival_time IS NOT NULL
+    UNION ALL
+    SELECT employee_id, CAST(strftime('%s', date || ' ' || departure_time, 'utc') AS INTEGER),
+           'departure', id, 1
+    FROM attendance WHERE id >= :first_id AND departure_time IS NOT NULL
+)
+ORDER BY ts, id, step
+"""
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+# Exports repeat the same dates and clock times on every row, so text parsing is memoized
+@lru_cache(maxsize=65536)
+def _parse_day(text: str, date_format: Optional[str]) -> int:
+    parsed = datetime.strptime(text, date_format).date() if date_format else date.fromisoformat(text[:10])
+    return parsed.toordinal() - _EPOCH_ORDINAL
+
+
+@lru_cache(maxsize=131072)
+def _parse_secs(text: str) -> int:
+    parts = text.split(':')
+    if len(parts) not in (2, 3):
+        raise ValueError(f"invalid time '{text}'")
+    h, m, s = int(parts[0]), int(parts[1]), int(float(parts[2])) if len(parts) == 3 else 0
+    if not (0 <= h < 24 and 0 <= m < 60 and 0 <= s < 60):
+        raise ValueError(f"invalid time '{text}'")
+    return h * 3600 + m * 60 + s
+
+
+def _to_day(value, date_format: Optional[str]) -> int:
+    """Date cell -> work_day."""
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.toordinal() - _EPOCH_ORDINAL
+    return _parse_day(_cell(value), date_format)
+
+
+def _to_secs(value) -> Optional[int]:
+    """Time cell -> seconds since midnight (None for an empty cell)."""
+    if isinstance(value, datetime):
+        value = value.time()
+    if isinstance(value, dtime):
+        return value.hour * 3600 + value.minute * 60 + value.second
+    text = _cell(value)
+    return _parse_secs(text) if text else None
+
+
+def _to_timestamp(value, date_format: Optional[str]) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    text = _cell(value)
+    if date_format:
+        return datetime.strptime(text, date_format)
+    return datetime.fromisoformat(text)
+
+
+@lru_cache(maxsize=None)
+def _fmt_secs(secs: Optional[int]) -> Optional[str]:
+    if secs is None:
+        return None
+    return f"{secs // 3600:02d}:{secs % 3600 // 60:02d}:{secs % 60:02d}"
+
+
+def table_columns(conn, schema: str, table: str, writable: bool = False) -> List[str]:
+    """Column names including generated ones, which PRAGMA table_info leaves out.
+
+    writable=True drops generated columns, for INSERT column lists.
+    """
+    hidden_ok = (0,) if writable else (0, 2, 3)
+    return [r[1] for r in conn.execute(f"PRAGMA {schema}.table_xinfo({table})") if r[6] in hidden_ok]
+
+
+def deferred_attendance_schema(conn) -> List[Tuple[str, str, str]]:
+    """(type, name, CREATE sql) of every trigger and non-unique index on attendance.
+
+    Bulk writers drop these inside their transaction and re-run the SQL at
+    the end; unique indexes stay live because they enforce invariants.
+    """
+    unique = {r[1] for r in conn.execute("PRAGMA main.index_list(attendance)") if r[2]}
+    rows = conn.execute(
+        "SELECT type, name, sql FROM main.sqlite_master WHERE tbl_name = 'attendance' "
+        "AND type IN ('index', 'trigger') AND sql IS NOT NULL").fetchall()
+    return [(kind, name, sql) for kind, name, sql in rows if name not in unique]
+
+
+class AttendanceImportReport(ImportReport):
+    def __init__(self):
+        super().__init__(dry_run=False)
+        self.duplicates = 0
+        self.unknown_keys: Counter = Counter()
+        self.start_day: Optional[int] = None
+        self.end_day: Optional[int] = None
+
+    def summary(self) -> str:
+        text = f"{self.inserted} sessions imported from {self.total} rows"
+        if self.duplicates:
+            text += f", {self.duplicates} already present"
+        if self.errors:
+            text += f", {len(self.errors)} problems"
+        return text
+
+
+class AttendanceImporter:
+    """Load historical attendance from another clocking system's CSV/XLSX export.
+
+    Two layouts are understood: one row per session (key, date, arrival,
+    departure) or one row per punch (key, timestamp or date + time, and an
+    optional in/out direction). Punches are staged in a TEMP table and
+    paired into sessions per employee-day with window functions.
+
+    External employee keys are resolved through an in-memory dict built from
+    `employees.<key_field>`, plus an explicit `key_map` for keys that differ.
+    Rows are inserted with executemany in one transaction, with every trigger and non-unique index on
+    attendance dropped for the load and recreated afterwards (DDL is
+    transactional, so a failed import leaves the table as it was). Sessions
+    already present (same employee, day and arrival) are removed, punches
+    are classified, and the schedule and daily_summary are rebuilt once for
+    the imported date range. Imported sessions are also logged in
+    punch_events (source 'import') as events the projector has already
+    applied; pending punches are projected first so the log stays in order.
+    """
+
+    def __init__(self, db, key_field: str = "fingerprint_id", key_map: Optional[Dict[str, Any]] = None,
+                 date_format: Optional[str] = None, batch_size: int = 10000):
+        if key_field not in KEY_FIELDS:
+            raise ValueError(f"key_field must be one of {', '.join(KEY_FIELDS)}")
+        self.db = db
+        self.key_field = key_field
+        self.key_map = {str(k).strip().lower(): int(v) for k, v in (key_map or {}).items()}
+        self.date_format = date_format
+        self.batch_size = max(1, int(batch_size))
+
+    # --- setup ---
+    def _employee_keys(self) -> Dict[str, int]:
+        keys: Dict[str, int] = {}
+        for emp_id, value in self.db.conn.execute(f"SELECT id, {self.key_field} FROM employees ORDER BY id DESC"):
+            if value is not None and str(value).strip():
+                # Lowest id wins on duplicates, like EmployeeDirectory
+                keys[str(value).strip().lower()] = emp_id
+        keys.update(self.key_map)
+        return keys
+
+    @staticmethod
+    def _columns(header) -> Dict[str, int]:
+        columns: Dict[str, int] = {}
+        for index, value in enumerate(header):
+            field = COLUMN_ALIASES.get(_normalize_header(value))
+            if field and field not in columns:
+                columns[field] = index
+        if "key" not in columns:
+            raise ValueError("Missing an employee key column (e.g. employee_key, badge, email)")
+        if not ("timestamp" in columns or "date" in columns):
+            raise ValueError("Missing a date or timestamp column")
+        if not ("arrival" in columns or "timestamp" in columns or "time" in columns):
+            raise ValueError("Missing arrival/departure or punch time columns")
+        return columns
+
+    # --- reading ---
+    def _sessions(self, rows: Iterator[List[Any]], columns: Dict[str, int], keys: Dict[str, int],
+                  report: AttendanceImportReport, progress) -> Iterator[Tuple[int, int, Optional[int], Optional[int]]]:
+        """Yield (employee_id, work_day, arrival_secs, departure_secs) from a session-layout file."""
+        width = max(columns.values()) + 1
+        key_col, date_col = columns["key"], columns["date"]
+        arr_col, dep_col = columns["arrival"], columns.get("departure")
+        for row_no, raw in enumerate(rows, start=2):
+            if len(raw) < width:
+                raw = list(raw) + [None] * (width - len(raw))
+            key = _cell(raw[key_col]).lower()
+            if not key:
+                continue
+            report.total += 1
+            if progress and report.total % self.batch_size == 0:
+                progress(report.total)
+            emp_id = keys.get(key)
+            if emp_id is None:
+                report.unknown_keys[key] += 1
+                continue
+            try:
+                work_day = _to_day(raw[date_col], self.date_format)
+                arrival = _to_secs(raw[arr_col])
+                departure = _to_secs(raw[dep_col]) if dep_col is not None else None
+            except (TypeError, ValueError) as e:
+                report.errors.append((row_no, f"cannot parse date/time: {e}"))
+                continue
+            if arrival is None:
+                report.errors.append((row_no, "missing arrival time"))
+                continue
+            yield emp_id, work_day, arrival, departure
+
+    def _stage_punches(self, rows: Iterator[List[Any]], columns: Dict[str, int], keys: Dict[str, int],
+                       report: AttendanceImportReport, progress) -> bool:
+        """Copy a punch-layout file into temp.import_punches. Returns True if it has directions."""
+        conn = self.db.conn
+        conn.execute(STAGE_SQL)
+        conn.execute("DELETE FROM temp.import_punches")
+        width = max(columns.values()) + 1
+        key_col, dir_col = columns["key"], columns.get("direction")
+        ts_col, date_col, time_col = columns.get("timestamp"), columns.get("date"), columns.get("time")
+        batch: List[Tuple[int, int, int, Optional[str]]] = []
+        for row_no, raw in enumerate(rows, start=2):
+            if len(raw) < width:
+                raw = list(raw) + [None] * (width - len(raw))
+            key = _cell(raw[key_col]).lower()
+            if not key:
+                continue
+            report.total += 1
+            emp_id = keys.get(key)
+            if emp_id is None:
+                report.unknown_keys[key] += 1
+                continue
+            try:
+                if ts_col is not None:
+                    ts = _to_timestamp(raw[ts_col], self.date_format)
+                    work_day, secs = ts.toordinal() - _EPOCH_ORDINAL, ts.hour * 3600 + ts.minute * 60 + ts.second
+                else:
+                    work_day = _to_day(raw[date_col], self.date_format)
+                    secs = _to_secs(raw[time_col])
+                    if secs is None:
+                        raise ValueError("empty time")
+            except (TypeError, ValueError) as e:
+                report.errors.append((row_no, f"cannot parse date/time: {e}"))
+                continue
+            direction = None
+            if dir_col is not None:
+                direction = DIRECTIONS.get(_normalize_header(_cell(raw[dir_col])))
+                if direction is None:
+                    report.errors.append((row_no, f"unknown direction '{_cell(raw[dir_col])}'"))
+                    continue
+            batch.append((emp_id, work_day, secs, direction))
+            if len(batch) >= self.batch_size:
+                conn.executemany("INSERT INTO temp.import_punches VALUES (?, ?, ?, ?)", batch)
+                batch = []
+                if progress:
+                    progress(report.total)
+        if batch:
+            conn.executemany("INSERT INTO temp.import_punches VALUES (?, ?, ?, ?)", batch)
+        return dir_col is not None
+
+    def _paired_sessions(self, directed: bool, report: AttendanceImportReport):
+        cursor = self.db.conn.execute(PAIR_SQL, {"directed": int(directed)})
+        while True:
+            rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                return
+            for emp_id, work_day, arrival, departure, punches in rows:
+                if arrival is None:
+                    report.errors.append((0, f"{punches} 'out' punch(es) without an 'in' for employee "
+                                             f"{emp_id} on {self.db.day_to_date(work_day)}"))
+                    continue
+                yield emp_id, work_day, arrival, departure
+
+    # --- import ---
+    def run(self, path: str, progress: Optional[Callable[[int], None]] = None) -> AttendanceImportReport:
+        """Import `path` and return a report. `progress(rows_read)` is called per batch."""
+        started = time.perf_counter()
+        report = AttendanceImportReport()
+        conn = self.db.conn
+
+        rows = EmployeeImporter.read_rows(path)
+        header = next(rows, None)
+        if header is None:
+            raise ValueError("The file is empty")
+        columns = self._columns(header)
+        keys = self._employee_keys()
+        deferred = deferred_attendance_schema(conn)
+
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            projector = self.db.punch_engine.projector
+            projected = projector.project_pending(conn)
+            for kind, name, _ in deferred:
+                conn.execute(f"DROP {kind.upper()} IF EXISTS main.{name}")
+            first_id = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM sqlite_sequence WHERE name = 'attendance'").fetchone()[0]
+            first_id = max(first_id, conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM attendance").fetchone()[0])
+
+            if "arrival" in columns:
+                sessions: Iterable = self._sessions(rows, columns, keys, report, progress)
+            else:
+                sessions = self._paired_sessions(self._stage_punches(rows, columns, keys, report, progress), report)
+            self._insert(sessions, report)
+
+            for _, _, sql in deferred:
+                if sql.lstrip().upper().startswith("CREATE INDEX"):
+                    conn.execute(sql)
+            if report.inserted:
+                # Re-imports: keep the oldest copy of each (employee, day, arrival) session
+                report.duplicates = conn.execute("""
+                    DELETE FROM attendance WHERE id >= ? AND EXISTS (
+                        SELECT 1 FROM attendance AS older
+                        WHERE older.employee_id = attendance.employee_id AND older.work_day = attendance.work_day
+                          AND older.arrival_secs IS attendance.arrival_secs AND older.id < attendance.id)
+                """, (first_id,)).rowcount
+                report.inserted -= report.duplicates
+                conn.execute(f"UPDATE attendance SET {classify_sql('attendance')} WHERE id >= ?", (first_id,))
+                if conn.execute(IMPORT_EVENTS_SQL, {"first_id": first_id}).rowcount:
+                    projector.advance(conn, conn.execute("SELECT MAX(id) FROM punch_events").fetchone()[0])
+            for _, _, sql in deferred:
+                if not sql.lstrip().upper().startswith("CREATE INDEX"):
+                    conn.execute(sql)
+            conn.execute("DROP TABLE IF EXISTS temp.import_punches")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        self.db.punch_engine.publish(projected.values())
+        if progress:
+            progress(report.total)
+
+        for key, count in report.unknown_keys.most_common():
+            report.errors.append((0, f"unknown employee key '{key}' ({count} rows)"))
+        if report.inserted:
+            self._rebuild_derived(report)
+        report.elapsed_s = time.perf_counter() - started
+        return report
+
+    def _insert(self, sessions, report: AttendanceImportReport):
+        """Batch-insert sessions, keeping at most one open session per employee-day."""
+        conn = self.db.conn
+        store_epoch = "work_day" in table_columns(conn, "main", "attendance", writable=True)
+        insert_sql, width = (INSERT_WITH_EPOCH_SQL, 7) if store_epoch else (INSERT_SQL, 4)
+        dates: Dict[int, str] = {}
+        open_sessions = {(r[0], r[1]) for r in conn.execute(
+            "SELECT employee_id, date FROM attendance WHERE arrival_time IS NOT NULL AND departure_time IS NULL")}
+        batch = []
+        for emp_id, work_day, arrival, departure in sessions:
+            date_str = dates.get(work_day)
+            if date_str is None:
+                date_str = dates[work_day] = self.db.day_to_date(work_day)
+            if departure is None:
+                if (emp_id, date_str) in open_sessions:
+                    report.errors.append((0, f"second open session for employee {emp_id} on {date_str} skipped"))
+                    continue
+                open_sessions.add((emp_id, date_str))
+            batch.append((emp_id, date_str, _fmt_secs(arrival), _fmt_secs(departure), work_day, arrival, departure)[:width])
+            report.start_day = work_day if report.start_day is None else min(report.start_day, work_day)
+            report.end_day = work_day if report.end_day is None else max(report.end_day, work_day)
+            if len(batch) >= self.batch_size:
+                conn.executemany(insert_sql, batch)
+                report.inserted += len(batch)
+                batch = []
+        if batch:
+            conn.executemany(insert_sql, batch)
+            report.inserted += len(batch)
+
+    def _rebuild_derived(self, report: AttendanceImportReport):
+        """Classify against the schedule and rebuild daily_summary for the imported range, once."""
+        if self.db.conn.execute("SELECT 1 FROM roster_patterns LIMIT 1").fetchone() is not None:
+            # Re-materializes expected intervals, re-classifies and rebuilds the summary
+            self.db.schedule.materialize_days(report.start_day, report.end_day)
+        else:
+            self.db.daily_summary.rebuild(report.start_day, report.end_day)
+
+
+def load_key_map(path: str) -> Dict[str, int]:
+    """Read a two-column CSV (external key, employee id); a non-numeric id row is a header."""
+    key_map: Dict[str, int] = {}
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.reader(f):
+            if len(row) >= 2 and row[1].strip().isdigit():
+                key_map[row[0].strip()] = int(row[1])
+    return key_map
+
+
+def main(argv=None):
+    """Command line:
+    python -m src.attendance_import FILE [--key fingerprint_id|email|id|name] [--map keys.csv]
+                                         [--date-format FMT] [--db attendance.db]"""
+    from .database import Database
+
+    argv = list(argv if argv is not None else sys.argv[1:])
+    options = {"--key": "fingerprint_id", "--map": None, "--date-format": None, "--db": "attendance.db"}
+    for flag in list(options):
+        if flag in argv:
+            i = argv.index(flag)
+            options[flag] = argv[i + 1]
+            del argv[i:i + 2]
+    if len(argv) != 1:
+        print(main.__doc__)
+        return 2
+
+    db = Database(db_name=options["--db"])
+    try:
+        key_map = load_key_map(options["--map"]) if options["--map"] else None
+        importer = AttendanceImporter(db, key_field=options["--key"], key_map=key_map,
+                                      date_format=options["--date-format"])
+        report = importer.run(argv[0], progress=lambda n: print(f"  {n:,} rows read", end="\r"))
+    finally:
+        db.close()
+    for row_no, message in report.errors[:50]:
+        print(f"  row {row_no}: {message}" if row_no else f"  {message}")
+    if len(report.errors) > 50:
+        print(f"  ... and {len(report.errors) - 50} more")
+    print(f"📦 {report.summary()} in {report.elapsed_s:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
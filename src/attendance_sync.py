@@ -0,0 +1,206 @@
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# Firestore's field path for the document id (FieldPath.document_id())
+DOCUMENT_ID = "__name__"
+
+# Local mirror of the cloud `attendance` collection, keyed by document id
+CLOUD_ATTENDANCE_SQL = """
+CREATE TABLE IF NOT EXISTS cloud_attendance (
+    doc_id TEXT PRIMARY KEY,
+    employee_id INTEGER,
+    name TEXT,
+    status TEXT,
+    timestamp TEXT,
+    source TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+)
+"""
+
+# Pull cursors: (updated_at, doc_id) of the last document merged, per stream
+SYNC_STATE_SQL = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    name TEXT PRIMARY KEY,
+    updated_at TEXT,
+    doc_id TEXT
+)
+"""
+
+UPSERT_SQL = """
+INSERT INTO cloud_attendance (doc_id, employee_id, name, status, timestamp, source, updated_at, data)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (doc_id) DO UPDATE SET
+    employee_id = excluded.employee_id,
+    name = excluded.name,
+    status = excluded.status,
+    timestamp = excluded.timestamp,
+    source = excluded.source,
+    updated_at = excluded.updated_at,
+    data = excluded.data
+"""
+
+STATE_SQL = """
+INSERT INTO sync_state (name, updated_at, doc_id) VALUES (?, ?, ?)
+ON CONFLICT (name) DO UPDATE SET updated_at = excluded.updated_at, doc_id = excluded.doc_id
+"""
+
+PULL = "attendance_pull"
+RESYNC = "attendance_resync"
+
+
+def _ts_text(value: Any) -> Optional[str]:
+    return value.isoformat() if isinstance(value, datetime) else (str(value) if value is not None else None)
+
+
+def _ts_value(text: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(text) if text else None
+
+
+class AttendancePuller:
+    """Incremental pull of the cloud `attendance` collection into `cloud_attendance`.
+
+    `pull()` keeps a watermark in `sync_state` (the `updated_at` and doc id of
+    the last merged document) and asks Firestore only for documents ordered
+    after it, `page_size` at a time. Each page is upserted with executemany
+    and the watermark advanced in the same transaction, so an interrupted
+    pull resumes where it stopped.
+
+    Documents without `updated_at` (written before the sync worker stamped
+    it) are invisible to that query; `resync()` walks the whole collection
+    by document id instead. It is explicit and resumable: its cursor is
+    saved after every page, and on completion the pull watermark is set
+    to the newest `updated_at` seen when the resync started, so updates made
+    during the resync are still picked up by the next pull.
+    """
+
+    def __init__(self, db, client, collection: str = "attendance"):
+        self.db = db
+        self.client = client
+        self.collection = collection
+        self.pulled = 0
+        self.pages = 0
+
+    @staticmethod
+    def ensure_schema(conn):
+        conn.execute(CLOUD_ATTENDANCE_SQL)
+        conn.execute(SYNC_STATE_SQL)
+        conn.commit()
+
+    # --- cursors ---
+    def _state(self, name: str) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        row = self.db.conn.execute("SELECT updated_at, doc_id FROM sync_state WHERE name = ?", (name,)).fetchone()
+        return (row[0], row[1]) if row is not None else None
+
+    @property
+    def watermark(self) -> Optional[Tuple[Optional[str], Optional[str]]]:
+        """(updated_at ISO text, doc_id) of the last document pulled, or None."""
+        return self._state(PULL)
+
+    @property
+    def resync_pending(self) -> bool:
+        return self._state(RESYNC) is not None
+
+    # --- merging ---
+    def _merge_page(self, docs: List[Any], state: Optional[Tuple[str, Optional[str], Optional[str]]]) -> int:
+        """Upsert one page and move a cursor (name, updated_at, doc_id) in one transaction."""
+        rows = []
+        for doc in docs:
+            data = doc.to_dict() or {}
+            rows.append((doc.id, data.get("employee_id"), data.get("name"), data.get("status"),
+                         data.get("timestamp"), data.get("source"), _ts_text(data.get("updated_at")),
+                         json.dumps(data, sort_keys=True, default=_ts_text)))
+        conn = self.db.conn
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(UPSERT_SQL, rows)
+            if state is not None:
+                conn.execute(STATE_SQL, state)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        self.pulled += len(rows)
+        self.pages += 1
+        return len(rows)
+
+    # --- incremental pull ---
+    def pull(self, page_size: int = 500, max_pages: Optional[int] = None) -> int:
+        """Merge documents updated since the watermark. Returns the number merged."""
+        total = 0
+        pages = 0
+        base = self.client.collection(self.collection).order_by("updated_at").order_by(DOCUMENT_ID)
+        while max_pages is None or pages < max_pages:
+            query = base
+            mark = self.watermark
+            if mark is not None and mark[0]:
+                query = query.start_after({"updated_at": _ts_value(mark[0]), DOCUMENT_ID: mark[1]})
+            docs = list(query.limit(page_size).stream())
+            if not docs:
+                break
+            last = docs[-1]
+            total += self._merge_page(docs, (PULL, _ts_text(last.get("updated_at")), last.id))
+            pages += 1
+            if len(docs) < page_size:
+                break
+        return total
+
+    # --- full resync ---
+    def _newest_updated_at(self) -> Optional[str]:
+        query = self.client.collection(self.collection).order_by("updated_at", direction="DESCENDING").limit(1)
+        for doc in query.stream():
+            return _ts_text(doc.get("updated_at"))
+        return None
+
+    def resync(self, page_size: int = 500, max_pages: Optional[int] = None, restart: bool = False) -> bool:
+        """Walk the whole collection by document id, resuming a previous run.
+
+        Returns True when the resync finished, False if it stopped after
+        `max_pages` pages (call again to continue).
+        """
+        state = None if restart else self._state(RESYNC)
+        if state is None:
+            # Remember where incremental pulls must pick up afterwards
+            state = (self._newest_updated_at(), None)
+            self.db.conn.execute(STATE_SQL, (RESYNC, state[0], None))
+            self.db.conn.commit()
+        resume_at, after_id = state
+
+        pages = 0
+        base = self.client.collection(self.collection).order_by(DOCUMENT_ID)
+        while max_pages is None or pages < max_pages:
+            query = base.start_after({DOCUMENT_ID: after_id}) if after_id else base
+            docs = list(query.limit(page_size).stream())
+            if docs:
+                after_id = docs[-1].id
+                self._merge_page(docs, (RESYNC, resume_at, after_id))
+                pages += 1
+            if len(docs) < page_size:
+                self._finish_resync(resume_at)
+                return True
+        return False
+
+    def _finish_resync(self, resume_at: Optional[str]):
+        conn = self.db.conn
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM sync_state WHERE name = ?", (RESYNC,))
+            mark = self.watermark
+            # Never move the pull watermark backwards
+            if resume_at and (mark is None or not mark[0] or mark[0] < resume_at):
+                conn.execute(STATE_SQL, (PULL, resume_at, ""))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    # --- reading ---
+    def records(self) -> Dict[str, Dict[str, Any]]:
+        """All mirrored documents as {doc_id: data}."""
+        cursor = self.db.conn.execute("SELECT doc_id, data FROM cloud_attendance ORDER BY doc_id")
+        return {doc_id: json.loads(data) for doc_id, data in cursor}
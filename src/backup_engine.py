@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+
+
+class BackupCancelled(Exception):
+    """Raised inside a backup worker when cancel() was requested."""
+
+
+class _TooManyRestarts(Exception):
+    """Concurrent writes keep invalidating a stepwise copy."""
+
+
+class BackupJob:
+    """Online backup of a SQLite database on a background thread.
+
+    The worker opens its own connection and copies `pages_per_step` pages
+    at a time with the SQLite backup API, sleeping `sleep_s` between steps.
+    Each step holds the source read lock only for its own pages, so kiosk
+    punches on other connections are never held up by a long copy.
+
+    The result is always a consistent snapshot: if another connection
+    writes while a stepwise copy is in progress, SQLite restarts the copy.
+    After a restart the job stops sleeping between steps, so the copy
+    window is as short as possible, and after `max_restarts` restarts it
+    finishes in a single step (a read lock held for one full copy) so it
+    cannot starve under a steady stream of writes. For databases in WAL
+    mode, the worker keeps one read transaction open for the whole copy,
+    so it reads a fixed snapshot while writers carry on and never restarts.
+
+    Output goes to `<path>.part` and is renamed into place on success.
+    Progress is exposed as attributes (`pages_total`, `pages_remaining`,
+    `progress`, `restarts`, `done`, `error`, `cancelled`) for the UI to poll.
+    """
+
+    def __init__(self, db_name: str, path: str, pages_per_step: int = 256, sleep_s: float = 0.02,
+                 max_restarts: int = 5):
+        self.db_name = db_name
+        self.path = path
+        self.pages_per_step = max(1, int(pages_per_step))
+        self.sleep_s = max(0.0, float(sleep_s))
+        self.max_restarts = max(0, int(max_restarts))
+
+        self.pages_total = 0
+        self.pages_remaining = 0
+        self.restarts = 0
+        self.steps = 0
+        self.done = False
+        self.cancelled = False
+        self.error: Optional[BaseException] = None
+        self.elapsed_s = 0.0
+        self._stepwise = True
+        self._pause = self.sleep_s
+        self._cancel = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.on_done: Optional[Callable[["BackupJob"], None]] = None
+
+    # --- control ---
+    def start(self) -> "BackupJob":
+        self._thread = threading.Thread(target=self._run, name="backup", daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self) -> "BackupJob":
+        """Run the backup on the calling thread (scripts and scheduled jobs)."""
+        self._run()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.done
+
+    @property
+    def progress(self) -> Optional[float]:
+        """Fraction completed in [0, 1], or None before the first step."""
+        if not self.pages_total:
+            return None
+        return min(1.0, (self.pages_total - self.pages_remaining) / self.pages_total)
+
+    # --- worker ---
+    def _step(self, status, remaining, total):
+        """Backup progress callback: track restarts, honour cancel() and pace the copy."""
+        if self.steps and remaining > self.pages_remaining:
+            self.restarts += 1
+            self._pause = 0.0
+            if self._stepwise and self.restarts > self.max_restarts:
+                raise _TooManyRestarts()
+        self.steps += 1
+        self.pages_total, self.pages_remaining = total, remaining
+        if self._cancel.is_set():
+            raise BackupCancelled()
+        if remaining and self._pause:
+            time.sleep(self._pause)
+
+    def _copy(self, source, tmp_path: str, pages: int):
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        dest = sqlite3.connect(tmp_path)
+        try:
+            source.backup(dest, pages=pages, progress=self._step)
+        finally:
+            dest.close()
+
+    def _run(self):
+        started = time.perf_counter()
+        tmp_path = f"{self.path}.part"
+        source = None
+        try:
+            source = sqlite3.connect(self.db_name, isolation_level=None)
+            if source.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+                # Pin one snapshot; WAL writers are not blocked by readers
+                source.execute("BEGIN")
+                source.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            self._stepwise = True
+            try:
+                self._copy(source, tmp_path, self.pages_per_step)
+            except _TooManyRestarts:
+                print(f"⚠️ Backup restarted {self.restarts} times under concurrent writes; "
+                      f"finishing in one step")
+                self._stepwise = False
+                self._copy(source, tmp_path, -1)
+            if self._cancel.is_set():
+                raise BackupCancelled()
+            os.replace(tmp_path, self.path)
+        except BackupCancelled:
+            self.cancelled = True
+        except Exception as e:
+            self.error = e
+            print(f"🔥 Backup to {self.path} failed: {e}")
+        finally:
+            if source is not None:
+                source.close()
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            self.elapsed_s = time.perf_counter() - started
+            self.done = True
+            if self.on_done is not None:
+                try:
+                    self.on_done(self)
+                except Exception:
+                    pass
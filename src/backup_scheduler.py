@@ -0,0 +1,197 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .backup_engine import BackupJob
+from .backup_store import BackupStore, SnapshotReport
+
+
+def file_signature(db_name: str) -> Dict[str, int]:
+    """Cheap on-disk change signature of a SQLite database.
+
+    Uses the header's file change counter (bumped by every commit in
+    rollback-journal mode), the WAL frame count (WAL mode commits append
+    frames without touching the main file), and the size and last-write
+    time of both files. No pages beyond the 100-byte header are read.
+    """
+    stat = os.stat(db_name)
+    with open(db_name, "rb") as f:
+        header = f.read(100)
+    page_size = int.from_bytes(header[16:18], "big") if len(header) >= 100 else 0
+    page_size = 65536 if page_size == 1 else page_size
+    signature = {
+        "change_counter": int.from_bytes(header[24:28], "big") if len(header) >= 28 else 0,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "wal_frames": 0,
+        "wal_mtime_ns": 0,
+    }
+    try:
+        wal = os.stat(f"{db_name}-wal")
+        if page_size:
+            signature["wal_frames"] = max(0, (wal.st_size - 32) // (page_size + 24))
+        signature["wal_mtime_ns"] = wal.st_mtime_ns
+    except OSError:
+        pass
+    return signature
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BackupScheduler:
+    """Periodic snapshots into a BackupStore that skip when nothing changed.
+
+    Every `interval_s` the scheduler checks, cheapest first:
+
+    1. `PRAGMA data_version` on its own long-lived connection; it only moves
+       when another connection commits, so an idle database costs one pragma.
+    2. The on-disk `file_signature()` (change counter, WAL frames, mtimes),
+       compared with the one stored in the newest snapshot's manifest, so
+       the first check after a restart is cheap too.
+    3. The SHA-256 of a fresh online copy against the last snapshot's hash,
+       for writes that changed the file but not its contents.
+
+    Only when all three differ is a snapshot added to the store (and handed
+    to `on_snapshot`, e.g. for upload). `taken`, `skipped` and `stats()`
+    report how many checks took or skipped a backup.
+    """
+
+    def __init__(self, db_name: str, store: BackupStore, interval_s: float = 3600,
+                 keep: int = 0, on_snapshot: Optional[Callable[[SnapshotReport], Any]] = None):
+        self.db_name = db_name
+        self.path = os.path.abspath(db_name)
+        self.store = store
+        self.interval_s = max(1.0, float(interval_s))
+        self.keep = max(0, int(keep))
+        self.on_snapshot = on_snapshot
+
+        self.taken = 0
+        self.skipped = 0
+        self.skipped_by = {"data_version": 0, "signature": 0, "checksum": 0}
+        self.errors = 0
+        self.last_check_at: Optional[float] = None
+        self.last_backup_at: Optional[float] = None
+        self.last_report: Optional[SnapshotReport] = None
+
+        self._conn: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._signature, self._sha256 = self._last_snapshot_state()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _last_snapshot_state(self):
+        """(signature, sha256) recorded by the newest snapshot of this database."""
+        for name in reversed(self.store.manifests()):
+            try:
+                manifest = self.store.load_manifest(name)
+            except (OSError, ValueError):
+                continue
+            meta = manifest.get("meta") or {}
+            if meta.get("path") == self.path:
+                return meta.get("signature"), manifest.get("sha256")
+        return None, None
+
+    # --- checks ---
+    def _read_data_version(self) -> int:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_name, check_same_thread=False)
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _skip(self, reason: str):
+        self.skipped += 1
+        self.skipped_by[reason] += 1
+        return None
+
+    def run_once(self, force: bool = False) -> Optional[SnapshotReport]:
+        """Check for changes and snapshot if needed. Returns the report, or None if skipped."""
+        with self._lock:
+            self.last_check_at = time.time()
+            # Read both before copying: a write during the copy then shows up next time
+            data_version = self._read_data_version()
+            if not force and self._data_version is not None and data_version == self._data_version:
+                return self._skip("data_version")
+            signature = file_signature(self.db_name)
+            if not force and signature == self._signature:
+                self._data_version = data_version
+                return self._skip("signature")
+
+            name = self.store.new_name()
+            tmp_path = os.path.join(self.store.root, f"{name}.snapshot")
+            try:
+                BackupJob(self.db_name, tmp_path).run()
+                sha256 = _file_sha256(tmp_path)
+                if not force and sha256 == self._sha256:
+                    self._signature, self._data_version = signature, data_version
+                    return self._skip("checksum")
+                report = self.store.put_file(tmp_path, name, meta={
+                    "source": os.path.basename(self.db_name),
+                    "path": self.path,
+                    "signature": signature,
+                })
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            self._signature, self._sha256, self._data_version = signature, sha256, data_version
+            self.taken += 1
+            self.last_backup_at = time.time()
+            self.last_report = report
+            print(f"📦 Scheduled backup: {report.summary()}")
+            if self.keep:
+                # Only this database's snapshots: the store is shared by all companies
+                self.store.prune(self.keep, self.path)
+        if self.on_snapshot is not None:
+            try:
+                self.on_snapshot(report)
+            except Exception as e:
+                print(f"⚠️ Backup snapshot hook failed: {e}")
+        return report
+
+    # --- background thread ---
+    def start(self) -> "BackupScheduler":
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="backup-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = 10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️ Scheduled backup failed: {e}")
+            if self._stop.wait(self.interval_s):
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "taken": self.taken,
+            "skipped": self.skipped,
+            "skipped_by": dict(self.skipped_by),
+            "errors": self.errors,
+            "interval_s": self.interval_s,
+            "last_check_at": self.last_check_at,
+            "last_backup_at": self.last_backup_at,
+        }
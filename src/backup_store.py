@@ -0,0 +1,312 @@
+import hashlib
+import json
+import lzma
+import os
+import sys
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .backup_engine import BackupJob
+from .file_copy import fsync_dir
+
+# Chunk codecs by file extension; chunk files are self-describing so a store
+# can switch codec without rewriting what it already holds
+CODECS = {
+    "z": (lambda data: zlib.compress(data, 6), zlib.decompress),
+    "xz": (lambda data: lzma.compress(data, preset=6), lzma.decompress),
+}
+COMPRESSION = {"zlib": "z", "lzma": "xz"}
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+MANIFEST_VERSION = 1
+
+
+def sqlite_page_size(path: str) -> int:
+    """Page size from a SQLite file header, or 0 if the file is not a database."""
+    with open(path, "rb") as f:
+        header = f.read(100)
+    if len(header) < 100 or not header.startswith(b"SQLite format 3\x00"):
+        return 0
+    size = int.from_bytes(header[16:18], "big")
+    return 65536 if size == 1 else size
+
+
+class SnapshotReport:
+    """Outcome of one snapshot: how much of it was new to the store."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.size = 0
+        self.chunks = 0
+        self.new_chunks = 0
+        self.new_bytes = 0  # compressed bytes written to the store
+        self.elapsed_s = 0.0
+
+    def summary(self) -> str:
+        return (f"{self.name}: {self.size / 1e6:.1f} MB in {self.chunks} chunks, "
+                f"{self.new_chunks} new ({self.new_bytes / 1e6:.2f} MB stored)")
+
+
+class BackupStore:
+    """Content-addressed, deduplicated store of database snapshots.
+
+    A snapshot is cut into fixed-size chunks aligned to the SQLite page size,
+    so an update only changes the chunks holding the pages it touched. Each
+    chunk is compressed and stored once under its SHA-256 in
+    `chunks/<aa>/<hash>.<ext>`; a JSON manifest in `manifests/<name>.json`
+    lists the chunk hashes in order plus the size and hash of the whole file.
+    Taking a snapshot only writes chunks the store does not already have,
+    and any manifest can be restored on its own. `gc()` removes chunks no
+    manifest refers to.
+    """
+
+    def __init__(self, root: str, chunk_size: int = DEFAULT_CHUNK_SIZE, compression: str = "zlib"):
+        if compression not in COMPRESSION:
+            raise ValueError(f"Unknown compression: {compression}")
+        self.root = root
+        self.chunk_size = int(chunk_size)
+        self.ext = COMPRESSION[compression]
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        os.makedirs(self.manifests_dir, exist_ok=True)
+
+    @classmethod
+    def for_manifest(cls, manifest_path: str) -> Tuple["BackupStore", str]:
+        """Open the store holding `manifest_path`, returning (store, snapshot name)."""
+        manifest_path = os.path.abspath(manifest_path)
+        root = os.path.dirname(os.path.dirname(manifest_path))
+        return cls(root), os.path.splitext(os.path.basename(manifest_path))[0]
+
+    # --- layout ---
+    @property
+    def chunks_dir(self) -> str:
+        return os.path.join(self.root, "chunks")
+
+    @property
+    def manifests_dir(self) -> str:
+        return os.path.join(self.root, "manifests")
+
+    def chunk_path(self, digest: str, ext: Optional[str] = None) -> str:
+        return os.path.join(self.chunks_dir, digest[:2], f"{digest}.{ext or self.ext}")
+
+    def find_chunk(self, digest: str) -> Optional[str]:
+        """Path of the stored chunk with this hash, whatever its codec."""
+        for ext in CODECS:
+            path = self.chunk_path(digest, ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def manifest_path(self, name: str) -> str:
+        return os.path.join(self.manifests_dir, f"{name}.json")
+
+    # --- chunks ---
+    def _write_atomic(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.part"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def put_chunk(self, data: bytes) -> Tuple[str, int]:
+        """Store one chunk if new. Returns (hash, compressed bytes written or 0)."""
+        digest = hashlib.sha256(data).hexdigest()
+        if self.find_chunk(digest):
+            return digest, 0
+        packed = CODECS[self.ext][0](data)
+        self._write_atomic(self.chunk_path(digest), packed)
+        return digest, len(packed)
+
+    def read_chunk(self, digest: str) -> bytes:
+        path = self.find_chunk(digest)
+        if path is None:
+            raise FileNotFoundError(f"Missing backup chunk {digest}")
+        with open(path, "rb") as f:
+            data = CODECS[path.rsplit(".", 1)[1]][1](f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Corrupt backup chunk {digest}")
+        return data
+
+    # --- snapshots ---
+    def put_file(self, path: str, name: Optional[str] = None, meta: Optional[Dict[str, Any]] = None) -> SnapshotReport:
+        """Chunk an existing database file into the store and write its manifest."""
+        started = time.perf_counter()
+        name = name or self.new_name()
+        report = SnapshotReport(name)
+        page_size = sqlite_page_size(path)
+        # Align chunks to pages so changed pages map to changed chunks
+        chunk_size = self.chunk_size
+        if page_size:
+            chunk_size = max(page_size, chunk_size - chunk_size % page_size)
+
+        whole = hashlib.sha256()
+        chunks: List[str] = []
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                whole.update(data)
+                digest, written = self.put_chunk(data)
+                chunks.append(digest)
+                report.size += len(data)
+                if written:
+                    report.new_chunks += 1
+                    report.new_bytes += written
+        report.chunks = len(chunks)
+
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "name": name,
+            "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "size": report.size,
+            "sha256": whole.hexdigest(),
+            "page_size": page_size,
+            "chunk_size": chunk_size,
+            "chunks": chunks,
+        }
+        if meta:
+            manifest["meta"] = meta
+        self._write_atomic(self.manifest_path(name), json.dumps(manifest, indent=1).encode("utf-8"))
+        report.elapsed_s = time.perf_counter() - started
+        return report
+
+    def snapshot(self, db_name: str, name: Optional[str] = None, **job_kwargs) -> SnapshotReport:
+        """Take an online backup of `db_name` and add it to the store."""
+        name = name or self.new_name()
+        tmp_path = os.path.join(self.root, f"{name}.snapshot")
+        try:
+            BackupJob(db_name, tmp_path, **job_kwargs).run()
+            return self.put_file(tmp_path, name, meta={"source": os.path.basename(db_name),
+                                                       "path": os.path.abspath(db_name)})
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def new_name(self) -> str:
+        """Timestamped snapshot name not yet used in this store."""
+        base = datetime.now().strftime("backup_%Y%m%d_%H%M%S")
+        name, n = base, 1
+        while os.path.exists(self.manifest_path(name)):
+            n += 1
+            name = f"{base}_{n}"
+        return name
+
+    def manifests(self) -> List[str]:
+        """Snapshot names, oldest first."""
+        try:
+            names = [f[:-5] for f in os.listdir(self.manifests_dir) if f.endswith(".json")]
+        except OSError:
+            return []
+        return sorted(names, key=lambda n: (os.path.getmtime(self.manifest_path(n)), n))
+
+    def load_manifest(self, name: str) -> Dict[str, Any]:
+        with open(self.manifest_path(name), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def missing_chunks(self, name: str) -> List[str]:
+        """Chunk hashes the manifest needs that are not in the store."""
+        return sorted({d for d in self.load_manifest(name)["chunks"] if not self.find_chunk(d)})
+
+    def restore(self, name: str, dest_path: str) -> str:
+        """Rebuild snapshot `name` at dest_path, verifying its size and hash."""
+        manifest = self.load_manifest(name)
+        tmp_path = f"{dest_path}.part"
+        whole = hashlib.sha256()
+        try:
+            with open(tmp_path, "wb") as f:
+                for digest in manifest["chunks"]:
+                    data = self.read_chunk(digest)
+                    whole.update(data)
+                    f.write(data)
+                size = f.tell()
+                f.flush()
+                os.fsync(f.fileno())
+            if size != manifest["size"] or whole.hexdigest() != manifest["sha256"]:
+                raise ValueError(f"Snapshot {name} did not restore to the recorded size and hash")
+            os.replace(tmp_path, dest_path)
+            fsync_dir(os.path.dirname(os.path.abspath(dest_path)))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return dest_path
+
+    def delete(self, name: str):
+        """Remove a manifest; its chunks go on the next gc()."""
+        os.remove(self.manifest_path(name))
+
+    def prune(self, keep: int, path: Optional[str] = None) -> List[str]:
+        """Delete all but the newest `keep` snapshots and collect their chunks.
+
+        With `path`, only snapshots of that database file count, so one
+        company's retention never drops another company's snapshots.
+        """
+        names = self.manifests()
+        if path is not None:
+            path = os.path.abspath(path)
+            names = [n for n in names if self.load_manifest(n).get("meta", {}).get("path") == path]
+        dropped = names[:max(0, len(names) - max(0, int(keep)))]
+        for name in dropped:
+            self.delete(name)
+        if dropped:
+            self.gc()
+        return dropped
+
+    def gc(self) -> int:
+        """Delete chunks that no manifest refers to. Returns the number removed."""
+        live = set()
+        for name in self.manifests():
+            live.update(self.load_manifest(name)["chunks"])
+        removed = 0
+        for dirpath, _, files in os.walk(self.chunks_dir):
+            for fname in files:
+                digest = fname.split(".", 1)[0]
+                if digest not in live:
+                    os.remove(os.path.join(dirpath, fname))
+                    removed += 1
+        return removed
+
+    def stored_bytes(self) -> int:
+        total = 0
+        for dirpath, _, files in os.walk(self.chunks_dir):
+            total += sum(os.path.getsize(os.path.join(dirpath, f)) for f in files)
+        return total
+
+
+def main(argv=None):
+    """Command line:
+    python -m src.backup_store [--store backups/store] snapshot [DB] | list | restore NAME DEST | prune KEEP [DB] | gc"""
+    argv = list(argv if argv is not None else sys.argv[1:])
+    root = os.path.join("backups", "store")
+    if "--store" in argv:
+        i = argv.index("--store")
+        root = argv[i + 1]
+        del argv[i:i + 2]
+    usage = {"snapshot": 0, "list": 0, "restore": 2, "prune": 1, "gc": 0}
+    if not argv or argv[0] not in usage or len(argv) - 1 < usage[argv[0]]:
+        print(main.__doc__)
+        return 2
+
+    store = BackupStore(root)
+    command = argv[0]
+    if command == "snapshot":
+        report = store.snapshot(argv[1] if len(argv) > 1 else "attendance.db")
+        print(f"📦 {report.summary()}")
+    elif command == "list":
+        for name in store.manifests():
+            manifest = store.load_manifest(name)
+            print(f"  {name}  {manifest['created']}  {manifest['size'] / 1e6:8.1f} MB")
+        print(f"  stored: {store.stored_bytes() / 1e6:.1f} MB")
+    elif command == "restore":
+        print(f"⬇️ Restored {argv[1]} to {store.restore(argv[1], argv[2])}")
+    elif command == "prune":
+        dropped = store.prune(int(argv[1]), argv[2] if len(argv) > 2 else None)
+        print(f"🗑️ Pruned {len(dropped)} snapshots")
+    else:
+        print(f"🗑️ Removed {store.gc()} unreferenced chunks")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+import sys
+from typing import Optional
+
+
+# One row per employee per day, derived from attendance. Times use the same
+# integer encoding as the attendance epoch columns (work_day = days since
+# 1970-01-01, *_secs = seconds since midnight).
+DAILY_SUMMARY_SQL = """
+CREATE TABLE IF NOT EXISTS daily_summary (
+    work_day INTEGER NOT NULL,
+    employee_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    first_arrival_secs INTEGER,
+    last_departure_secs INTEGER,
+    worked_secs INTEGER NOT NULL DEFAULT 0,
+    sessions INTEGER NOT NULL DEFAULT 0,
+    present INTEGER NOT NULL DEFAULT 0,
+    late INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (work_day, employee_id)
+) WITHOUT ROWID
+"""
+
+# Late cutoff in seconds, read from settings so triggers and rebuilds agree
+LATE_CUTOFF_SQL = (
+    "CAST(strftime('%s', '1970-01-01 ' || COALESCE("
+    "(SELECT value FROM settings WHERE key = 'late_cutoff'), '09:00:00')) AS INTEGER)"
+)
+
+
+def late_threshold_sql(row: str) -> str:
+    """Latest on-time arrival for `row`'s employee-day: the scheduled shift start plus
+    grace (see ScheduleEngine), or the late_cutoff setting on unscheduled days."""
+    return (f"COALESCE((SELECT start_secs + grace_secs FROM expected_intervals "
+            f"WHERE expected_intervals.employee_id = {row}.employee_id "
+            f"AND expected_intervals.work_day = {row}.work_day), {LATE_CUTOFF_SQL})")
+
+# Aggregate attendance rows into summary rows; callers append WHERE/GROUP BY
+SUMMARY_SELECT_SQL = f"""
+SELECT work_day, employee_id, MIN(date),
+       MIN(arrival_secs), MAX(departure_secs),
+       COALESCE(SUM(CASE WHEN departure_secs >= arrival_secs THEN departure_secs - arrival_secs END), 0),
+       COUNT(*),
+       MAX(arrival_secs IS NOT NULL),
+       COALESCE(MIN(arrival_secs) > {late_threshold_sql('attendance')}, 0)
+FROM attendance
+"""
+
+SUMMARY_COLUMNS = ("work_day, employee_id, date, first_arrival_secs, last_departure_secs, "
+                   "worked_secs, sessions, present, late")
+
+
+def _refresh_sql(emp: str, day: str) -> str:
+    """Statements recomputing one (employee, day) summary row from attendance."""
+    return f"""
+        DELETE FROM daily_summary WHERE work_day = {day} AND employee_id = {emp};
+        INSERT INTO daily_summary ({SUMMARY_COLUMNS})
+        {SUMMARY_SELECT_SQL}
+        WHERE employee_id = {emp} AND work_day = {day}
+        GROUP BY work_day, employee_id;
+    """
+
+
+# Columns whose change moves a row between, or changes, employee-day summaries.
+# The epoch columns are generated from the TEXT ones (an UPDATE OF list does not
+# see generated columns change); on old SQLite they are written by triggers, so
+# both are watched. Each refresh touches one employee-day through
+# ix_attendance_employee_day.
+WATCHED_COLUMNS = "employee_id, date, arrival_time, departure_time, work_day, arrival_secs, departure_secs"
+
+TRIGGERS_SQL = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_daily_summary_insert
+    AFTER INSERT ON attendance
+    BEGIN
+        {_refresh_sql('NEW.employee_id', 'NEW.work_day')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_daily_summary_update
+    AFTER UPDATE OF {WATCHED_COLUMNS} ON attendance
+    BEGIN
+        {_refresh_sql('OLD.employee_id', 'OLD.work_day')}
+        {_refresh_sql('NEW.employee_id', 'NEW.work_day')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_daily_summary_delete
+    AFTER DELETE ON attendance
+    BEGIN
+        {_refresh_sql('OLD.employee_id', 'OLD.work_day')}
+    END
+    """,
+)
+
+
+class DailySummary:
+    """Per-employee, per-day attendance rollup kept in the `daily_summary` table.
+
+    Triggers on `attendance` recompute the affected employee-day on every
+    write (punches, manual edits, imports), so dashboard and report queries
+    read one row per employee-day instead of scanning sessions. `rebuild()`
+    regenerates the table from raw attendance, e.g. after a bulk load with
+    triggers disabled or after the late cutoff changes.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    @staticmethod
+    def ensure_schema(conn) -> bool:
+        """Create the table and triggers. Returns True if the table was newly created."""
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_summary'").fetchone()
+        conn.execute(DAILY_SUMMARY_SQL)
+        # Recreate the triggers so their SQL follows code changes
+        conn.execute("DROP TRIGGER IF EXISTS trg_daily_summary_insert")
+        conn.execute("DROP TRIGGER IF EXISTS trg_daily_summary_update")
+        conn.execute("DROP TRIGGER IF EXISTS trg_daily_summary_delete")
+        for sql in TRIGGERS_SQL:
+            conn.execute(sql)
+        conn.commit()
+        return exists is None
+
+    def rebuild(self, start_day: Optional[int] = None, end_day: Optional[int] = None, conn=None,
+                employee_id=None, weekdays=None) -> int:
+        """Regenerate summary rows (optionally for a work_day range / one employee /
+        some weekdays, Monday=0) in one transaction.
+
+        Returns the number of summary rows written.
+        """
+        conn = conn or self.db.conn
+        where, params = [], []
+        if start_day is not None:
+            where.append("work_day >= ?")
+            params.append(int(start_day))
+        if end_day is not None:
+            where.append("work_day <= ?")
+            params.append(int(end_day))
+        if employee_id is not None:
+            where.append("employee_id = ?")
+            params.append(int(employee_id))
+        if weekdays is not None:
+            days = sorted({int(w) % 7 for w in weekdays})
+            where.append(f"(work_day + 3) % 7 IN ({', '.join('?' * len(days))})")
+            params.extend(days)
+        clause = " WHERE " + " AND ".join(where) if where else ""
+        source_where = " WHERE " + " AND ".join(["work_day IS NOT NULL"] + where)
+
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM daily_summary" + clause, params)
+            cursor = conn.execute(
+                f"INSERT INTO daily_summary ({SUMMARY_COLUMNS}) {SUMMARY_SELECT_SQL}{source_where} "
+                "GROUP BY work_day, employee_id", params)
+            written = cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return written
+
+    def refresh_late_flags(self, conn=None) -> int:
+        """Recompute `late` for every row from the schedule and current late_cutoff setting."""
+        conn = conn or self.db.conn
+        cursor = conn.execute(
+            f"UPDATE daily_summary SET late = COALESCE(first_arrival_secs > {late_threshold_sql('daily_summary')}, 0)")
+        conn.commit()
+        return cursor.rowcount
+
+
+def main(argv=None):
+    """Rebuild daily_summary: python -m src.daily_summary [db_path]"""
+    argv = argv if argv is not None else sys.argv[1:]
+    db_path = argv[0] if argv else "attendance.db"
+    # Database runs the schema migrations the summary depends on
+    from .database import Database
+    db = Database(db_name=db_path)
+    try:
+        written = db.daily_summary.rebuild()
+        print(f"📦 Rebuilt daily_summary in {db_path}: {written} rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,29 @@
+import heapq
+import os
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
+
+from .archive_manager import ArchiveManager
+from .attendance_sync import AttendancePuller
+from .backup_engine import BackupJob
+from .backup_scheduler import BackupScheduler
+from .backup_store import BackupStore
+from .daily_summary import DailySummary
+from .employee_directory import EmployeeDirectory
+from .event_bus import EMPLOYEES_CHANGED, PUNCH, EventBus
+from .file_copy import copy_file, quick_check
+from .punch_engine import PunchEngine
+from .punch_queue import PunchQueue
+from .schedule_engine import ScheduleEngine, classify_sql
+from .sync_outbox import SyncOutbox
+
+# Integer day/time columns on attendance and the expressions deriving them;
+# {row} is '' for generated columns or 'NEW.' inside the fallback triggers
+EPOCH_COLUMNS = {
+    'work_day': "CAST(julianday({row}date) - 2440587.5 AS INTEGER)",
+    'arrival_secs': "CAST(strftime('%s', '1970-01-01 ' || {row}arrival_time) AS INTEGER)",
+    'departure_secs': "CAST(strftime('%s', '1970-01-01 ' || {row}departure_time) AS INTEGER)",
+}
 
 class Database:
     def __init__(self, db_name="attendance.db"):
@@ -7,7 +31,30 @@ class Database:
         self.conn = sqlite3.connect(db_name)
         # enable row access by name
         self.conn.row_factory = sqlite3.Row
+        # In-memory settings cache, loaded lazily and kept coherent by set_setting.
+        # External writers are detected through PRAGMA data_version.
+        self._settings_cache = None
+        self._settings_data_version = None
+        # In-process notifications (punches, employee changes) for live views
+        self.event_bus = EventBus()
+        # Indexed employee lookups (id, fingerprint_id, email, name prefix)
+        self.employee_directory = EmployeeDirectory(self)
+        # Per-employee, per-day rollup maintained by triggers on attendance
+        self.daily_summary = DailySummary(self)
+        # Shifts/rosters expanded into expected_intervals for punch classification
+        self.schedule = ScheduleEngine(self)
+        # Closed years moved to attendance_<year>.db, attached on demand for range reports
+        self.archives = ArchiveManager(self)
+        # Durable queue of Firestore writes, drained by FirebaseManager's SyncWorker
+        self.outbox = SyncOutbox(self)
         self.create_tables()
+        # Atomic arrival/departure recording (needs the attendance table)
+        self.punch_engine = PunchEngine(self)
+        # Group-commit queue for concurrent punch producers, started on first use
+        self._punch_queue = None
+        # Change-aware periodic snapshots, started by start_backup_scheduler()
+        self.backup_scheduler = None
+        self._backup_args = (None, None)
 
     def create_tables(self):
         query_employee = """
@@ -149,6 +196,117 @@ class Database:
         except Exception:
             pass
 
+        # Migration: integer time columns derived from the TEXT date/time columns
+        try:
+            self._migrate_epoch_columns(cursor)
+        except Exception as e:
+            print(f"⚠️ Failed to migrate attendance epoch columns: {e}")
+
+        # Name sort for query_attendance: walk employees by name, then each one's rows by id
+        try:
+            cursor.execute("CREATE INDEX IF NOT EXISTS ix_employees_name ON employees (name)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS ix_attendance_employee ON attendance (employee_id)")
+            self.conn.commit()
+        except Exception as e:
+            print(f"⚠️ Failed to create attendance sort indexes: {e}")
+
+        # Schedules and punch classification (needs the epoch columns)
+        try:
+            if ScheduleEngine.ensure_schema(self.conn):
+                self.conn.execute(f"UPDATE attendance SET {classify_sql('attendance')} WHERE work_day IS NOT NULL")
+                self.conn.commit()
+        except Exception as e:
+            print(f"⚠️ Failed to set up schedules: {e}")
+
+        # Daily summary (needs the epoch columns and expected_intervals); backfill it the first time
+        try:
+            if DailySummary.ensure_schema(self.conn):
+                rows = self.daily_summary.rebuild()
+                if rows:
+                    print(f"📦 Built daily_summary: {rows} rows")
+        except Exception as e:
+            print(f"⚠️ Failed to set up daily_summary: {e}")
+
+        # Outbox for cloud sync
+        try:
+            SyncOutbox.ensure_schema(self.conn)
+        except Exception as e:
+            print(f"⚠️ Failed to set up sync_outbox: {e}")
+
+        # Local mirror of cloud attendance and its pull watermarks
+        try:
+            AttendancePuller.ensure_schema(self.conn)
+        except Exception as e:
+            print(f"⚠️ Failed to set up cloud_attendance: {e}")
+
+        # Keep the rostered schedule materialized ahead of today
+        try:
+            self.schedule.ensure_horizon()
+        except Exception as e:
+            print(f"⚠️ Failed to extend the schedule: {e}")
+
+    def _migrate_epoch_columns(self, cursor):
+        """Add integer time columns on attendance.
+
+        work_day is days since 1970-01-01; arrival_secs/departure_secs are seconds
+        since midnight, so range, lateness and duration queries can run as indexed SQL.
+        They are VIRTUAL generated columns computed from date/arrival_time/departure_time,
+        so writing a session does not also write them. (The row is still written again by
+        the classify trigger, and daily_summary by its own triggers; SessionProjector does
+        both off the punch's write lock.) SQLite older than 3.35 (no DROP COLUMN to convert
+        earlier plain columns) keeps plain columns filled by triggers instead.
+        """
+        cursor.execute("PRAGMA table_xinfo(attendance)")
+        hidden = {r[1]: r[6] for r in cursor.fetchall()}
+        if sqlite3.sqlite_version_info >= (3, 35, 0):
+            plain = [col for col in EPOCH_COLUMNS if hidden.get(col) == 0]
+            if plain:
+                # Written by the old epoch triggers: drop them and everything that refers to
+                # them. The summary and classify triggers are recreated by their ensure_schema.
+                cursor.execute("""
+                    SELECT type, name, sql FROM sqlite_master
+                    WHERE tbl_name = 'attendance' AND type IN ('index', 'trigger') AND sql IS NOT NULL
+                """)
+                for kind, name, sql in cursor.fetchall():
+                    if kind == 'trigger' or any(col in sql for col in EPOCH_COLUMNS):
+                        cursor.execute(f"DROP {kind.upper()} IF EXISTS {name}")
+                for col in plain:
+                    cursor.execute(f"ALTER TABLE attendance DROP COLUMN {col}")
+                    hidden.pop(col)
+            for col, expr in EPOCH_COLUMNS.items():
+                if col not in hidden:
+                    cursor.execute(f"ALTER TABLE attendance ADD COLUMN {col} INTEGER "
+                                   f"GENERATED ALWAYS AS ({expr.format(row='')}) VIRTUAL")
+        else:
+            for col in EPOCH_COLUMNS:
+                if col not in hidden:
+                    cursor.execute(f"ALTER TABLE attendance ADD COLUMN {col} INTEGER")
+            derive = ", ".join(f"{col} = {expr.format(row='NEW.')}" for col, expr in EPOCH_COLUMNS.items())
+            cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_attendance_epoch_insert AFTER INSERT ON attendance
+            BEGIN
+                UPDATE attendance SET {derive} WHERE id = NEW.id;
+            END;
+            """)
+            cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_attendance_epoch_update
+            AFTER UPDATE OF date, arrival_time, departure_time ON attendance
+            BEGIN
+                UPDATE attendance SET {derive} WHERE id = NEW.id;
+            END;
+            """)
+            # Backfill rows written before the columns existed
+            cursor.execute(f"""
+                UPDATE attendance SET {", ".join(f"{col} = {expr.format(row='')}" for col, expr in EPOCH_COLUMNS.items())}
+                WHERE work_day IS NULL AND date IS NOT NULL
+            """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_attendance_day ON attendance (work_day)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_attendance_employee_day ON attendance (employee_id, work_day)")
+        # Orders for query_attendance's arrival/departure sorts; the rowid (id) is the implicit last key
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_attendance_arrival ON attendance (arrival_secs)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_attendance_departure ON attendance (departure_secs)")
+        self.conn.commit()
+
     def reset_admin(self):
         """Ensure a default admin user exists with username 'admin' and password 'admin123'.
 
@@ -170,23 +328,83 @@ class Database:
             return False
 
     # --- App Settings helpers ---
+    def _data_version(self):
+        """Return PRAGMA data_version; it changes when another connection commits."""
+        try:
+            return self.conn.execute("PRAGMA data_version").fetchone()[0]
+        except Exception:
+            return None
+
+    def _load_settings(self):
+        """Load the whole settings table into the in-memory cache."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT key, value FROM settings")
+        self._settings_cache = {r[0]: r[1] for r in cursor.fetchall()}
+        self._settings_data_version = self._data_version()
+        return self._settings_cache
+
+    def _settings(self):
+        """Return the settings cache, reloading it if another connection wrote to the DB."""
+        if self._settings_cache is None or self._data_version() != self._settings_data_version:
+            return self._load_settings()
+        return self._settings_cache
+
+    def invalidate_settings_cache(self):
+        """Drop cached settings so the next lookup reloads them from the database."""
+        self._settings_cache = None
+        self._settings_data_version = None
+
     def get_setting(self, key, default=None):
         """Get a setting value by key. Returns default if missing."""
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
-            row = cursor.fetchone()
-            return row[0] if row and row[0] is not None else default
+            value = self._settings().get(key)
+            return value if value is not None else default
         except Exception:
             return default
 
+    def get_setting_int(self, key, default=0):
+        """Get a setting parsed as int. Returns default if missing or malformed."""
+        value = self.get_setting(key, None)
+        if value is None:
+            return default
+        text = str(value).strip()
+        try:
+            return int(text)
+        except ValueError:
+            try:
+                # Tolerate values like '15.0' written by older settings pages
+                return int(float(text))
+            except ValueError:
+                return default
+
+    def get_setting_float(self, key, default=0.0):
+        """Get a setting parsed as float. Returns default if missing or malformed."""
+        value = self.get_setting(key, None)
+        if value is None:
+            return default
+        try:
+            return float(str(value).strip())
+        except ValueError:
+            return default
+
+    def get_setting_bool(self, key, default=False):
+        """Get a setting parsed as bool ('true'/'1'/'yes'/'on' are truthy)."""
+        value = self.get_setting(key, None)
+        if value is None:
+            return default
+        text = str(value).strip().lower()
+        if text in ('true', '1', 'yes', 'on'):
+            return True
+        if text in ('false', '0', 'no', 'off', ''):
+            return False
+        return default
+
     def set_setting(self, key, value):
-        """Upsert a setting value."""
+        """Upsert a setting value and write it through to the settings cache."""
         try:
             cursor = self.conn.cursor()
             cursor.execute("INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, str(value)))
             self.conn.commit()
-            return True
         except Exception:
             try:
                 # Fallback for older SQLite without upsert syntax
@@ -195,16 +413,31 @@ class Database:
                 if cursor.rowcount == 0:
                     cursor.execute("INSERT INTO settings (key, value) VALUES (?, ?)", (key, str(value)))
                 self.conn.commit()
-                return True
             except Exception:
+                self.invalidate_settings_cache()
                 return False
+        if self._settings_cache is not None:
+            self._settings_cache[key] = str(value)
+        if key == 'late_cutoff':
+            try:
+                self.daily_summary.refresh_late_flags()
+            except Exception as e:
+                print(f"⚠️ Failed to refresh late flags: {e}")
+        return True
 
     def add_employee(self, name, email, fingerprint_id, fingerprint_template=None):
         cursor = self.conn.cursor()
         cursor.execute("INSERT INTO employees (name, email, fingerprint_id, fingerprint_template) VALUES (?, ?, ?, ?)",
                        (name, email, fingerprint_id, fingerprint_template))
         self.conn.commit()
-        return cursor.lastrowid  # Return the employee ID for reference
+        self.employee_directory.invalidate()
+        employee_id = cursor.lastrowid
+        try:
+            self.schedule.materialize_employee(employee_id)
+        except Exception as e:
+            print(f"⚠️ Failed to schedule employee {employee_id}: {e}")
+        self.event_bus.publish(EMPLOYEES_CHANGED, employee_id=employee_id)
+        return employee_id  # Return the employee ID for reference
 
     def update_employee(self, employee_id, name=None, email=None, fingerprint_id=None, fingerprint_template=None):
         """Update an existing employee's details. Only updates provided non-None values."""
@@ -229,6 +462,8 @@ class Database:
         params.append(employee_id)
         cursor.execute(query, params)
         self.conn.commit()
+        self.employee_directory.invalidate()
+        self.event_bus.publish(EMPLOYEES_CHANGED, employee_id=employee_id)
         return cursor.rowcount > 0
 
     # --- Attendance helpers: arrival/departure per day ---
@@ -239,6 +474,7 @@ class Database:
         return datetime.now().strftime("%H:%M:%S")
 
     def get_today_record(self, employee_id):
+        self.punch_engine.flush()
         cursor = self.conn.cursor()
         date_str = self._today_date()
         cursor.execute("SELECT * FROM attendance WHERE employee_id = ? AND date = ?", (employee_id, date_str))
@@ -246,63 +482,81 @@ class Database:
         return dict(row) if row else None
 
     def mark_arrival(self, employee_id):
-        cursor = self.conn.cursor()
-        date_str = self._today_date()
-        time_str = self._current_time()
-        # check existing record for today
-        cursor.execute("SELECT id, arrival_time, departure_time FROM attendance WHERE employee_id = ? AND date = ?",
-                       (employee_id, date_str))
-        row = cursor.fetchone()
-        if row is None:
-            cursor.execute("INSERT INTO attendance (employee_id, date, arrival_time, departure_time) VALUES (?, ?, ?, ?)",
-                           (employee_id, date_str, time_str, None))
-        else:
-            # if arrival_time missing, set it; if both present, create new entry
-            if row['arrival_time'] is None:
-                cursor.execute("UPDATE attendance SET arrival_time = ? WHERE id = ?", (time_str, row['id']))
-            elif row['arrival_time'] and row['departure_time'] is not None:
-                cursor.execute("INSERT INTO attendance (employee_id, date, arrival_time, departure_time) VALUES (?, ?, ?, ?)",
-                               (employee_id, date_str, time_str, None))
-            else:
-                # arrival already set and departure missing; treat as duplicate arrival, leave as-is
-                pass
-        self.conn.commit()
-        return {"action": "arrival", "time": time_str, "date": date_str}
+        """Record an arrival now (a no-op while a session is open). Logged as a 'legacy' punch event."""
+        return self.punch_engine.record(employee_id, "arrival")
 
     def mark_departure(self, employee_id):
-        cursor = self.conn.cursor()
-        date_str = self._today_date()
-        time_str = self._current_time()
-        # find today's row with arrival but no departure
-        cursor.execute("SELECT id, arrival_time, departure_time FROM attendance WHERE employee_id = ? AND date = ? ORDER BY id DESC", (employee_id, date_str))
-        rows = cursor.fetchall()
-        target = None
-        for r in rows:
-            if r['arrival_time'] is not None and r['departure_time'] is None:
-                target = r
-                break
-        if target:
-            cursor.execute("UPDATE attendance SET departure_time = ? WHERE id = ?", (time_str, target['id']))
-        else:
-            # no matching arrival; create a record with only departure_time
-            cursor.execute("INSERT INTO attendance (employee_id, date, arrival_time, departure_time) VALUES (?, ?, ?, ?)",
-                           (employee_id, date_str, None, time_str))
-        self.conn.commit()
-        return {"action": "departure", "time": time_str, "date": date_str}
+        """Close today's open session now, or store a departure-only row. Logged as a 'legacy' punch event."""
+        return self.punch_engine.record(employee_id, "departure")
 
-    def mark_arrival_or_departure(self, employee_id):
+    def mark_arrival_or_departure(self, employee_id, source='manual'):
         """Decide whether to mark arrival or departure for the given employee for today.
 
-        Returns a dict with keys: action ('arrival'|'departure'), time, date
+        The raw scan is appended to punch_events with its source ('face',
+        'fingerprint', 'manual' or 'api'). An open session today is then closed
+        (departure); otherwise a new session is opened (arrival). Everything
+        happens in one transaction, see PunchEngine.
+
+        Returns a dict with keys: action ('arrival'|'departure'), time, date, id, event_id, source
+        """
+        return self.punch_engine.punch(employee_id, source=source)
+
+    def get_punch_queue(self):
+        """Return the group-commit punch queue for this database, creating it on first use."""
+        if self._punch_queue is None:
+            self._punch_queue = PunchQueue(self.db_name, self.punch_engine)
+        return self._punch_queue
+
+    def submit_punch(self, employee_id, when=None, source='api'):
+        """Queue a punch for group commit. Returns a Future resolving after the batch commits."""
+        return self.get_punch_queue().submit(employee_id, when, source)
+
+    def start_backup_scheduler(self, store_root=None, on_snapshot=None):
+        """Start change-aware periodic snapshots into the backup store.
+
+        Runs every 'backup_interval' seconds (default 3600, 0 disables) and
+        keeps the newest 'backup_retention' snapshots (0 keeps all). Called
+        again without arguments, it reuses the store and hook of the last call.
         """
-        rec = self.get_today_record(employee_id)
-        if rec is None:
-            return self.mark_arrival(employee_id)
-        # if arrival exists and departure missing -> mark departure
-        if rec.get('arrival_time') and not rec.get('departure_time'):
-            return self.mark_departure(employee_id)
-        # otherwise, create new arrival
-        return self.mark_arrival(employee_id)
+        if store_root is None and on_snapshot is None:
+            store_root, on_snapshot = self._backup_args
+        self._backup_args = (store_root, on_snapshot)
+        interval = self.get_setting_int('backup_interval', 3600)
+        if interval <= 0 or self.db_name == ":memory:":
+            return None
+        if self.backup_scheduler is None:
+            store = BackupStore(store_root or os.path.join(os.getcwd(), "backups", "store"))
+            self.backup_scheduler = BackupScheduler(
+                self.db_name, store, interval_s=interval,
+                keep=self.get_setting_int('backup_retention', 0), on_snapshot=on_snapshot).start()
+        return self.backup_scheduler
+
+    def stop_backup_scheduler(self):
+        """Stop scheduled backups; start_backup_scheduler() resumes them."""
+        if self.backup_scheduler is not None:
+            try:
+                self.backup_scheduler.stop()
+            except Exception:
+                pass
+            self.backup_scheduler = None
+
+    def close(self):
+        """Flush queued punches and projections, stop scheduled backups and close the connection."""
+        self.stop_backup_scheduler()
+        if self._punch_queue is not None:
+            try:
+                self._punch_queue.close()
+            except Exception:
+                pass
+            self._punch_queue = None
+        try:
+            self.punch_engine.close()
+        except Exception:
+            pass
+        try:
+            self.conn.close()
+        except Exception:
+            pass
 
     def mark_attendance(self, employee_id):
         # Backwards-compatible wrapper: mark an arrival timestamp
@@ -314,6 +568,7 @@ class Database:
         return cursor.fetchall()
 
     def get_attendance_records(self):
+        self.punch_engine.flush()
         cursor = self.conn.cursor()
         cursor.execute("""
             SELECT attendance.date, employees.name, attendance.arrival_time, attendance.departure_time
@@ -323,7 +578,467 @@ class Database:
         """)
         return cursor.fetchall()
     
+    # --- Integer time helpers (see _migrate_epoch_columns) ---
+    @staticmethod
+    def date_to_day(date_str):
+        """Convert 'YYYY-MM-DD' to days since 1970-01-01 (the work_day column)."""
+        return (datetime.strptime(date_str, "%Y-%m-%d").date() - datetime(1970, 1, 1).date()).days
+
+    @staticmethod
+    def day_to_date(day):
+        """Convert a work_day back to 'YYYY-MM-DD'."""
+        return (datetime(1970, 1, 1) + timedelta(days=int(day))).strftime("%Y-%m-%d")
+
+    @staticmethod
+    def time_to_secs(time_str):
+        """Convert 'HH:MM[:SS]' to seconds since midnight (the *_secs columns)."""
+        parts = [int(p) for p in str(time_str).split(':')]
+        while len(parts) < 3:
+            parts.append(0)
+        return parts[0] * 3600 + parts[1] * 60 + parts[2]
+
+    # Sort keys for query_attendance: (nullable leading key or None, non-null keys...).
+    # attendance.id is always the final tiebreaker so keyset cursors are unique.
+    # Each order is an index walk: ix_attendance_day/arrival/departure (which end
+    # in the rowid), or ix_employees_name then ix_attendance_employee for names.
+    ATTENDANCE_SORT_KEYS = {
+        'date': ('attendance.work_day', ()),
+        'arrival': ('attendance.arrival_secs', ()),
+        'departure': ('attendance.departure_secs', ()),
+        'name': (None, ('employees.name', 'employees.id')),
+    }
+
+    # Result column holding each sort key (employees.id is selected as employee_id)
+    @staticmethod
+    def _key_column(key):
+        return 'employee_id' if key == 'employees.id' else key.split('.')[-1]
+
+    @staticmethod
+    def _sort_key(row, columns):
+        # SQLite's order for one direction: NULL sorts below every value
+        return tuple((row[c] is not None, row[c]) for c in columns)
+
+    def _attendance_from(self, start_date=None, end_date=None):
+        """FROM clause shared by the attendance queries: rows with an existing employee."""
+        return (f"{self.archives.source('attendance', start_date, end_date)} "
+                f"JOIN employees ON attendance.employee_id = employees.id")
+
+    def _attendance_filters(self, start_date=None, end_date=None, employee_id=None, employee_name=None,
+                            status=None, late_cutoff=None):
+        """Build WHERE terms and params shared by the attendance query helpers."""
+        where, params = [], []
+        if start_date:
+            where.append("attendance.work_day >= ?")
+            params.append(self.date_to_day(start_date))
+        if end_date:
+            where.append("attendance.work_day <= ?")
+            params.append(self.date_to_day(end_date))
+        if employee_id is not None:
+            where.append("attendance.employee_id = ?")
+            params.append(int(employee_id))
+        if employee_name:
+            where.append("employees.name = ?")
+            params.append(employee_name)
+        if status == 'Present':
+            where.append("COALESCE(attendance.arrival_time, '') != ''")
+        elif status == 'Absent':
+            where.append("COALESCE(attendance.arrival_time, '') = ''")
+        elif status == 'Late':
+            if late_cutoff is None:
+                # Classified against the schedule at write time; unscheduled days use the setting
+                where.append("(attendance.arrival_status = 'late' OR (attendance.arrival_status = 'unscheduled'"
+                             " AND attendance.arrival_secs > ?))")
+                params.append(self.time_to_secs(self.get_setting('late_cutoff', '09:00:00')))
+            else:
+                where.append("attendance.arrival_secs > ?")
+                params.append(self.time_to_secs(late_cutoff))
+        return where, params
+
+    def get_attendance_range(self, start_date=None, end_date=None, employee_name=None,
+                             status=None, late_cutoff='09:00:00'):
+        """Return attendance rows filtered in SQL by date range, employee and status.
+
+        status is one of None/'All', 'Present', 'Absent' or 'Late' (arrival after late_cutoff).
+        Rows have the same columns as get_attendance_records().
+        """
+        self.punch_engine.flush()
+        where, params = self._attendance_filters(start_date, end_date, employee_name=employee_name,
+                                                 status=status, late_cutoff=late_cutoff)
+        sql = f"""
+            SELECT attendance.date, employees.name, attendance.arrival_time, attendance.departure_time
+            FROM {self._attendance_from(start_date, end_date)}
+        """
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY attendance.work_day DESC, employees.name ASC"
+        cursor = self.conn.cursor()
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+    def query_attendance(self, start_date=None, end_date=None, employee_id=None, status=None,
+                         late_cutoff=None, sort='date', descending=True, cursor=None, limit=100, offset=0):
+        """Return one page of attendance rows with filtering, sorting and paging done in SQL.
+
+        Filters: date range ('YYYY-MM-DD'), employee_id, status ('Present', 'Absent',
+        'Late'; Late uses late_cutoff or the 'late_cutoff' setting).
+        sort is 'date', 'name', 'arrival' or 'departure'. Paging is keyset based:
+        pass the returned cursor back to get the next page. To jump to a position,
+        pass a cursor from attendance_anchors(); without a cursor, offset jumps
+        there with an OFFSET scan.
+
+        Returns (rows, next_cursor); next_cursor is None on the last page. Rows have
+        id, employee_id, date, name, arrival_time, departure_time and the sort keys.
+        """
+        self.punch_engine.flush()
+        if sort not in self.ATTENDANCE_SORT_KEYS:
+            raise ValueError(f"Unknown sort column: {sort}")
+        nullable_key, keys = self.ATTENDANCE_SORT_KEYS[sort]
+        keys = keys + ('attendance.id',)
+        where, params = self._attendance_filters(start_date, end_date, employee_id=employee_id,
+                                                 status=status, late_cutoff=late_cutoff)
+        direction = "DESC" if descending else "ASC"
+        cmp = "<" if descending else ">"
+        base = """
+            SELECT attendance.id, attendance.employee_id, attendance.date, employees.name,
+                   attendance.arrival_time, attendance.departure_time,
+                   attendance.work_day, attendance.arrival_secs, attendance.departure_secs
+            FROM {table} AS attendance JOIN employees ON attendance.employee_id = employees.id
+        """
+        # The hot table plus any archives in range, each queried on its own indexes,
+        # in groups that fit SQLite's attach limit
+        batches = self.archives.year_batches(start_date, end_date)
+        cur = self.conn.cursor()
+
+        def fetch(extra_where, extra_params, order_keys, n, skip=0):
+            if len(batches) == 1:
+                return fetch_tables(self.archives.batch_tables('attendance', batches[0]),
+                                    extra_where, extra_params, order_keys, n, skip)
+            # Each group returns its first n + skip rows; merge them here
+            rows = []
+            for i, years in enumerate(batches):
+                rows += fetch_tables(self.archives.batch_tables('attendance', years, hot=i == 0),
+                                     extra_where, extra_params, order_keys, n + skip)
+            columns = [self._key_column(k) for k in order_keys]
+            rows.sort(key=lambda row: self._sort_key(row, columns), reverse=descending)
+            return rows[skip:skip + n]
+
+        def fetch_tables(tables, extra_where, extra_params, order_keys, n, skip=0):
+            terms = where + extra_where
+            filters = " WHERE " + " AND ".join(terms) if terms else ""
+            order = ", ".join(f"{k} {direction}" for k in order_keys)
+            if len(tables) == 1:
+                cur.execute(base.format(table=tables[0]) + filters + f" ORDER BY {order} LIMIT ? OFFSET ?",
+                            params + extra_params + [n, skip])
+                return cur.fetchall()
+            # Each arm seeks its first n + skip rows; only those are merged and sorted
+            arms = [f"SELECT * FROM ({base.format(table=t)}{filters} ORDER BY {order} LIMIT ?)" for t in tables]
+            merged = ", ".join(f"{self._key_column(k)} {direction}" for k in order_keys)
+            cur.execute(" UNION ALL ".join(arms) + f" ORDER BY {merged} LIMIT ? OFFSET ?",
+                        (params + extra_params + [n + skip]) * len(tables) + [n, skip])
+            return cur.fetchall()
+
+        def row_value(names):
+            return "(" + ", ".join(names) + ")"
+
+        if cursor is None and offset:
+            # Absolute position: SQLite's own NULL ordering (first ASC, last DESC)
+            # matches the two-phase keyset order below, so cursors stay compatible.
+            order_keys = ((nullable_key,) if nullable_key else ()) + keys
+            rows = fetch([], [], order_keys, limit, int(offset))
+        elif nullable_key is None:
+            # All keys non-null: a single row-value keyset predicate
+            extra, extra_params = [], []
+            if cursor is not None:
+                extra.append(f"{row_value(keys)} {cmp} ({', '.join('?' * len(keys))})")
+                extra_params.extend(cursor)
+            rows = fetch(extra, extra_params, keys, limit)
+        else:
+            # The leading key is nullable. SQLite sorts NULLs first ascending and last
+            # descending; page the non-null segment and the NULL segment separately
+            # so each phase stays an index range seek instead of an OR scan.
+            non_null_keys = (nullable_key,) + keys
+            in_null_segment = cursor is not None and cursor[0] is None
+
+            def non_null_phase(n, after):
+                extra = [f"{nullable_key} IS NOT NULL"]
+                extra_params = []
+                if after is not None:
+                    extra.append(f"{row_value(non_null_keys)} {cmp} ({', '.join('?' * len(non_null_keys))})")
+                    extra_params.extend(after)
+                return fetch(extra, extra_params, non_null_keys, n)
+
+            def null_phase(n, after_id):
+                extra = [f"{nullable_key} IS NULL"]
+                extra_params = []
+                if after_id is not None:
+                    extra.append(f"attendance.id {cmp} ?")
+                    extra_params.append(after_id)
+                return fetch(extra, extra_params, ('attendance.id',), n)
+
+            if descending:
+                rows = [] if in_null_segment else non_null_phase(limit, cursor)
+                if len(rows) < limit:
+                    rows += null_phase(limit - len(rows), cursor[-1] if in_null_segment else None)
+            else:
+                rows = []
+                if cursor is None or in_null_segment:
+                    rows = null_phase(limit, cursor[-1] if in_null_segment else None)
+                if len(rows) < limit:
+                    rows += non_null_phase(limit - len(rows), None if in_null_segment or cursor is None else cursor)
+
+        next_cursor = None
+        if len(rows) == limit and rows:
+            last = rows[-1]
+            key_names = ((nullable_key,) if nullable_key else ()) + keys
+            next_cursor = tuple(last[self._key_column(k)] for k in key_names)
+        return rows, next_cursor
+
+    def attendance_anchors(self, every, start_date=None, end_date=None, employee_id=None, status=None,
+                           late_cutoff=None, sort='date', descending=True):
+        """Return keyset cursors for jumping into query_attendance's order.
+
+        anchors[i] is the cursor that makes query_attendance start at row
+        i * every (anchors[0] is None). One pass over the sort keys (an index
+        walk with ROW_NUMBER) replaces an OFFSET scan per jump.
+        """
+        self.punch_engine.flush()
+        if sort not in self.ATTENDANCE_SORT_KEYS:
+            raise ValueError(f"Unknown sort column: {sort}")
+        nullable_key, keys = self.ATTENDANCE_SORT_KEYS[sort]
+        key_names = ((nullable_key,) if nullable_key else ()) + keys + ('attendance.id',)
+        where, params = self._attendance_filters(start_date, end_date, employee_id=employee_id,
+                                                 status=status, late_cutoff=late_cutoff)
+        filters = " WHERE " + " AND ".join(where) if where else ""
+        direction = "DESC" if descending else "ASC"
+        columns = [self._key_column(k) for k in key_names]
+        select = ", ".join(f"{k} AS {c}" for k, c in zip(key_names, columns))
+        order = ", ".join(f"{c} {direction}" for c in columns)
+        cursor = self.conn.cursor()
+
+        def arms(tables):
+            return [f"SELECT {select} FROM {t} AS attendance JOIN employees ON attendance.employee_id = employees.id"
+                    f"{filters}" for t in tables]
+
+        batches = self.archives.year_batches(start_date, end_date)
+        if len(batches) > 1:
+            # More archives than can be attached at once: collect each group's
+            # keys in order and merge them here
+            runs = []
+            for i, years in enumerate(batches):
+                tables = self.archives.batch_tables('attendance', years, hot=i == 0)
+                cursor.execute(f"SELECT * FROM ({' UNION ALL '.join(arms(tables))}) ORDER BY {order}",
+                               params * len(tables))
+                runs.append(cursor.fetchall())
+            merged = heapq.merge(*runs, key=lambda row: self._sort_key(row, columns), reverse=descending)
+            return [None] + [tuple(row) for position, row in enumerate(merged, 1) if position % int(every) == 0]
+
+        tables = self.archives.batch_tables('attendance', batches[0])
+        cursor.execute(f"""
+            SELECT * FROM (
+                SELECT {", ".join(columns)}, ROW_NUMBER() OVER (ORDER BY {order}) AS position
+                FROM ({" UNION ALL ".join(arms(tables))})
+            ) WHERE position % ? = 0
+        """, params * len(tables) + [int(every)])
+        return [None] + [tuple(row[:-1]) for row in cursor.fetchall()]
+
+    def attendance_export_sql(self, start_date=None, end_date=None, employee_id=None, status=None,
+                              late_cutoff=None, sort='date', descending=True):
+        """Return (sql, params) selecting date, name, arrival and departure for export.
+
+        Uses the query_attendance filters and row order, without paging, so an
+        export can stream the whole result from one cursor.
+        """
+        self.punch_engine.flush()
+        if sort not in self.ATTENDANCE_SORT_KEYS:
+            raise ValueError(f"Unknown sort column: {sort}")
+        nullable_key, keys = self.ATTENDANCE_SORT_KEYS[sort]
+        order_keys = ((nullable_key,) if nullable_key else ()) + keys + ('attendance.id',)
+        where, params = self._attendance_filters(start_date, end_date, employee_id=employee_id,
+                                                 status=status, late_cutoff=late_cutoff)
+        direction = "DESC" if descending else "ASC"
+        sql = f"""
+            SELECT attendance.date, employees.name, attendance.arrival_time, attendance.departure_time
+            FROM {self._attendance_from(start_date, end_date)}
+        """
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY " + ", ".join(f"{k} {direction}" for k in order_keys)
+        return sql, params
+
+    def attendance_workbook_sql(self, group_by='month', start_date=None, end_date=None, employee_id=None,
+                                status=None, late_cutoff=None):
+        """Return (sql, params) for a workbook export grouped into sheets.
+
+        Rows are (sheet key, date, name, arrival_time, departure_time), ordered by
+        sheet key so each sheet is written in one pass. group_by is 'month'
+        (key 'YYYY-MM') or 'employee' (key 'Name (#id)').
+        """
+        self.punch_engine.flush()
+        if group_by == 'month':
+            key, order = "substr(attendance.date, 1, 7)", "attendance.work_day, employees.name, attendance.id"
+        elif group_by == 'employee':
+            key = "employees.name || ' (#' || attendance.employee_id || ')'"
+            order = "employees.name, employees.id, attendance.work_day, attendance.id"
+        else:
+            raise ValueError(f"Unknown workbook grouping: {group_by}")
+        where, params = self._attendance_filters(start_date, end_date, employee_id=employee_id,
+                                                 status=status, late_cutoff=late_cutoff)
+        sql = f"""
+            SELECT {key}, attendance.date, employees.name, attendance.arrival_time, attendance.departure_time
+            FROM {self._attendance_from(start_date, end_date)}
+        """
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY " + order
+        return sql, params
+
+    def daily_summary_export_sql(self, start_date=None, end_date=None, employee_id=None):
+        """Return (sql, params) for per-employee, per-month totals from daily_summary.
+
+        Rows are (sheet key, name, month, days_present, late_days, sessions,
+        worked_hours), ordered by employee; the key is 'Name (#id)' as in
+        attendance_workbook_sql, so XlsxExportJob writes one sheet per employee.
+        """
+        self.punch_engine.flush()
+        where, params = [], []
+        if start_date:
+            where.append("daily_summary.work_day >= ?")
+            params.append(self.date_to_day(start_date))
+        if end_date:
+            where.append("daily_summary.work_day <= ?")
+            params.append(self.date_to_day(end_date))
+        if employee_id is not None:
+            where.append("daily_summary.employee_id = ?")
+            params.append(int(employee_id))
+        sql = f"""
+            SELECT employees.name || ' (#' || employees.id || ')', employees.name,
+                   substr(daily_summary.date, 1, 7) AS month,
+                   SUM(daily_summary.present), SUM(daily_summary.late), SUM(daily_summary.sessions),
+                   ROUND(SUM(daily_summary.worked_secs) / 3600.0, 2)
+            FROM {self.archives.source('daily_summary', start_date, end_date)}
+            JOIN employees ON daily_summary.employee_id = employees.id
+        """
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " GROUP BY daily_summary.employee_id, month ORDER BY employees.name, daily_summary.employee_id, month"
+        return sql, params
+
+    def count_attendance(self, start_date=None, end_date=None, employee_id=None, status=None, late_cutoff=None):
+        """Return the number of attendance rows matching the query_attendance filters."""
+        self.punch_engine.flush()
+        where, params = self._attendance_filters(start_date, end_date, employee_id=employee_id,
+                                                 status=status, late_cutoff=late_cutoff)
+        filters = " WHERE " + " AND ".join(where) if where else ""
+        total = 0
+        cursor = self.conn.cursor()
+        # One count per file, like query_attendance, so each uses its own indexes
+        for i, years in enumerate(self.archives.year_batches(start_date, end_date)):
+            for table in self.archives.batch_tables('attendance', years, hot=i == 0):
+                cursor.execute(f"SELECT COUNT(*) FROM {table} AS attendance "
+                               f"JOIN employees ON attendance.employee_id = employees.id{filters}", params)
+                total += cursor.fetchone()[0]
+        return total
+
+    # --- Daily summary reads (one row per employee-day, see DailySummary) ---
+    def get_daily_summary(self, start_date, end_date, employee_id=None):
+        """Return daily_summary rows with employee names for a date range, oldest day first."""
+        self.punch_engine.flush()
+        params = [self.date_to_day(start_date), self.date_to_day(end_date)]
+        employee_clause = ""
+        if employee_id is not None:
+            employee_clause = " AND daily_summary.employee_id = ?"
+            params.append(int(employee_id))
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT daily_summary.*, employees.name
+            FROM {self.archives.source('daily_summary', start_date, end_date)}
+            JOIN employees ON daily_summary.employee_id = employees.id
+            WHERE daily_summary.work_day BETWEEN ? AND ?{employee_clause}
+            ORDER BY daily_summary.work_day, employees.name
+        """, params)
+        return cursor.fetchall()
+
+    def get_day_stats(self, date_str=None):
+        """Return total/present/late/absent employee counts for one day (default today)."""
+        self.punch_engine.flush()
+        day = self.date_to_day(date_str or self._today_date())
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT COALESCE(SUM(present), 0), COALESCE(SUM(late), 0)
+            FROM daily_summary WHERE work_day = ?
+        """, (day,))
+        present, late = cursor.fetchone()
+        total = self.employee_directory.count()
+        return {
+            "total": total,
+            "present": present,
+            "late": late,
+            "absent": max(0, total - present),
+        }
+
+    def get_late_arrivals(self, start_date, end_date, late_cutoff=None):
+        """Return (employee_id, name, late_days, late_minutes) by first arrival of each day.
+
+        Without late_cutoff the stored late flags are used, with lateness measured
+        from the scheduled shift start (or the 'late_cutoff' setting on unscheduled days).
+        """
+        self.punch_engine.flush()
+        cursor = self.conn.cursor()
+        days = (self.date_to_day(start_date), self.date_to_day(end_date))
+        summary = self.archives.source('daily_summary', start_date, end_date)
+        if late_cutoff is None:
+            cutoff = self.time_to_secs(self.get_setting('late_cutoff', '09:00:00'))
+            cursor.execute(f"""
+                SELECT daily_summary.employee_id, employees.name,
+                       COUNT(*) AS late_days,
+                       SUM(daily_summary.first_arrival_secs - COALESCE(expected_intervals.start_secs, ?)) / 60
+                           AS late_minutes
+                FROM {summary}
+                JOIN employees ON daily_summary.employee_id = employees.id
+                LEFT JOIN {self.archives.source('expected_intervals', start_date, end_date)} ON expected_intervals.employee_id = daily_summary.employee_id
+                                            AND expected_intervals.work_day = daily_summary.work_day
+                WHERE daily_summary.work_day BETWEEN ? AND ? AND daily_summary.late = 1
+                GROUP BY daily_summary.employee_id
+                ORDER BY late_minutes DESC
+            """, (cutoff,) + days)
+            return cursor.fetchall()
+        cutoff = self.time_to_secs(late_cutoff)
+        cursor.execute(f"""
+            SELECT daily_summary.employee_id, employees.name,
+                   COUNT(*) AS late_days,
+                   SUM(daily_summary.first_arrival_secs - ?) / 60 AS late_minutes
+            FROM {summary}
+            JOIN employees ON daily_summary.employee_id = employees.id
+            WHERE daily_summary.work_day BETWEEN ? AND ? AND daily_summary.first_arrival_secs > ?
+            GROUP BY daily_summary.employee_id
+            ORDER BY late_minutes DESC
+        """, (cutoff,) + days + (cutoff,))
+        return cursor.fetchall()
+
+    def get_hours_worked(self, start_date, end_date, employee_id=None):
+        """Return (employee_id, name, days_present, sessions, worked_seconds) for the range."""
+        self.punch_engine.flush()
+        params = [self.date_to_day(start_date), self.date_to_day(end_date)]
+        employee_clause = ""
+        if employee_id is not None:
+            employee_clause = " AND daily_summary.employee_id = ?"
+            params.append(employee_id)
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            SELECT daily_summary.employee_id, employees.name,
+                   SUM(daily_summary.present) AS days_present,
+                   SUM(daily_summary.sessions) AS sessions,
+                   SUM(daily_summary.worked_secs) AS worked_seconds
+            FROM {self.archives.source('daily_summary', start_date, end_date)}
+            JOIN employees ON daily_summary.employee_id = employees.id
+            WHERE daily_summary.work_day BETWEEN ? AND ?{employee_clause}
+            GROUP BY daily_summary.employee_id
+            ORDER BY employees.name
+        """, params)
+        return cursor.fetchall()
+
     def get_today_attendance_records(self):
+        self.punch_engine.flush()
         cursor = self.conn.cursor()
         date_str = self._today_date()
         cursor.execute("""
@@ -336,11 +1051,50 @@ class Database:
         return cursor.fetchall()
     
     def get_today_attendance_count(self):
+        self.punch_engine.flush()
         cursor = self.conn.cursor()
         date_str = self._today_date()
         cursor.execute("SELECT COUNT(*) FROM attendance WHERE date = ?", (date_str,))
         row = cursor.fetchone()
         return row[0] if row else 0
+
+    def get_present_employee_ids(self, date_str=None):
+        """Return the set of employee ids marked present on a day (default today)."""
+        self.punch_engine.flush()
+        day = self.date_to_day(date_str or self._today_date())
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT employee_id FROM daily_summary WHERE work_day = ? AND present = 1", (day,))
+        return {r[0] for r in cursor.fetchall()}
+
+    def get_recent_activity(self, limit=5, date_str=None):
+        """Return a day's sessions (default today), most recently punched first."""
+        self.punch_engine.flush()
+        day = self.date_to_day(date_str or self._today_date())
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT attendance.id, attendance.employee_id, attendance.date, employees.name,
+                   attendance.arrival_time, attendance.departure_time
+            FROM attendance
+            JOIN employees ON attendance.employee_id = employees.id
+            WHERE attendance.work_day = ?
+            ORDER BY MAX(COALESCE(attendance.arrival_secs, -1), COALESCE(attendance.departure_secs, -1)) DESC,
+                     attendance.id DESC
+            LIMIT ?
+        """, (day, int(limit)))
+        return cursor.fetchall()
+
+    def get_attendance_entry(self, record_id):
+        """Return one attendance row with the employee name, or None."""
+        self.punch_engine.flush()
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT attendance.id, attendance.employee_id, attendance.date, employees.name,
+                   attendance.arrival_time, attendance.departure_time
+            FROM attendance
+            JOIN employees ON attendance.employee_id = employees.id
+            WHERE attendance.id = ?
+        """, (record_id,))
+        return cursor.fetchone()
         
     # --- User Management ---
     def authenticate_user(self, username, password):
@@ -385,7 +1139,38 @@ class Database:
             ORDER BY users.username
         """)
         return cursor.fetchall()
-    
+
+    def count_users(self):
+        """Count users shown in user management (everyone except admin)."""
+        row = self.conn.execute("SELECT COUNT(*) FROM users WHERE username != 'admin'").fetchone()
+        return row[0] if row else 0
+
+    def get_users_page(self, offset=0, limit=100, cursor=None):
+        """Return (rows, next_cursor) for one page of get_all_users, ordered by username.
+
+        `cursor` is the last username of the previous page (keyset on the
+        unique username index); without it the page starts at `offset`.
+        """
+        sql = """
+            SELECT users.id, users.username, users.role, users.first_login,
+                   employees.name as employee_name
+            FROM users
+            LEFT JOIN employees ON users.employee_id = employees.id
+            WHERE users.username != 'admin'
+        """
+        params = []
+        if cursor is not None:
+            sql += " AND users.username > ?"
+            params.append(cursor)
+        sql += " ORDER BY users.username LIMIT ? OFFSET ?"
+        params.extend([int(limit) + 1, 0 if cursor is not None else max(0, int(offset))])
+        rows = self.conn.execute(sql, params).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1]['username']
+        return rows, next_cursor
+
     def delete_user(self, user_id):
         """Delete a user account."""
         cursor = self.conn.cursor()
@@ -394,44 +1179,78 @@ class Database:
         return cursor.rowcount > 0
 
     def get_all_settings(self):
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT key, value FROM settings")
-        return {r[0]: r[1] for r in cursor.fetchall()}
+        return dict(self._settings())
 
     # --- Backup/Restore helpers ---
+    def backup_job(self, backup_path: str, **kwargs) -> BackupJob:
+        """Return an unstarted BackupJob copying this database to backup_path.
+
+        Call .start() to run it on a worker thread (UI) or .run() to block.
+        """
+        return BackupJob(self.db_name, backup_path, **kwargs)
+
     def backup_to(self, backup_path: str) -> bool:
         """Create a SQLite backup to the given file path."""
         try:
-            dest = sqlite3.connect(backup_path)
-            with dest:
-                self.conn.backup(dest)
-            dest.close()
+            if self.db_name == ":memory:":
+                dest = sqlite3.connect(backup_path)
+                with dest:
+                    self.conn.backup(dest)
+                dest.close()
+                return True
+            self.backup_job(backup_path).run()
             return True
         except Exception:
             return False
 
     def restore_from(self, source_path: str) -> bool:
-        """Restore the database from the given file path. Replaces current DB file."""
+        """Restore the database from the given file path. Replaces current DB file.
+
+        The source is streamed to `<db>.restore` and checked with PRAGMA
+        quick_check first, so a damaged or non-SQLite file leaves the current
+        database untouched. The verified copy then replaces the contents in
+        one SQLite backup transaction, which other open connections see
+        atomically.
+        """
+        staged = f"{self.db_name}.restore"
         try:
-            # Close current connection
+            copy_file(source_path, staged)
+            problem = quick_check(staged)
+            if problem is not None:
+                print(f"⚠️ Restore source failed quick_check: {problem}")
+                return False
+            # Flush queued punches, then close current connection
+            if self._punch_queue is not None:
+                self._punch_queue.close()
+                self._punch_queue = None
+            self.punch_engine.close()
             try:
                 self.conn.close()
             except Exception:
                 pass
-            # Copy source into our db_name (fallback to backup API if needed)
             try:
-                src = sqlite3.connect(source_path)
-                dest = sqlite3.connect(self.db_name)
-                with dest:
-                    src.backup(dest)
-                src.close()
-                dest.close()
-            except Exception:
-                # Fallback: open source and recreate
-                pass
-            # Reopen main connection
-            self.conn = sqlite3.connect(self.db_name)
-            self.conn.row_factory = sqlite3.Row
+                src = sqlite3.connect(staged)
+                try:
+                    dest = sqlite3.connect(self.db_name)
+                    try:
+                        src.backup(dest)
+                    finally:
+                        dest.close()
+                finally:
+                    src.close()
+            finally:
+                # Reopen main connection even if the copy failed
+                self.conn = sqlite3.connect(self.db_name)
+                self.conn.row_factory = sqlite3.Row
+                self.invalidate_settings_cache()
+                self.employee_directory.invalidate()
+            # Older backups may predate the epoch columns or daily_summary
+            self.create_tables()
+            self.punch_engine.use_upsert = PunchEngine.ensure_schema(self.conn)
             return True
-        except Exception:
+        except Exception as e:
+            print(f"⚠️ Restore from {source_path} failed: {e}")
             return False
+        finally:
+            if os.path.exists(staged):
+                os.remove(staged)
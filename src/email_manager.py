@@ -8,13 +8,13 @@ class EmailManager:
         self.db = db
 
     def _config(self):
-        enabled = str(self.db.get_setting('email_notifications', 'false')).lower() == 'true'
+        enabled = self.db.get_setting_bool('email_notifications', False)
         server = self.db.get_setting('smtp_server', '')
-        port = int(str(self.db.get_setting('smtp_port', '587') or '587'))
+        port = self.db.get_setting_int('smtp_port', 587) or 587
         user = self.db.get_setting('smtp_user', '')
         password = self.db.get_setting('smtp_password', '')
-        use_tls = str(self.db.get_setting('smtp_use_tls', 'true')).lower() == 'true'
-        use_ssl = str(self.db.get_setting('smtp_use_ssl', 'false')).lower() == 'true'
+        use_tls = self.db.get_setting_bool('smtp_use_tls', True)
+        use_ssl = self.db.get_setting_bool('smtp_use_ssl', False)
         return {
             'enabled': enabled,
             'server': server,
@@ -0,0 +1,111 @@
+import bisect
+from typing import Dict, List, Optional, Tuple
+
+
+class EmployeeDirectory:
+    """In-memory employee lookup service backed by the `employees` table.
+
+    Rows are loaded once (without the `fingerprint_template` BLOB) and indexed
+    by id, fingerprint_id and email, with a sorted name list for prefix search.
+    The directory is invalidated by `Database.add_employee`/`update_employee`
+    and reloads on its own when another connection commits (PRAGMA data_version).
+
+    Returned rows are `sqlite3.Row` objects with columns
+    (id, name, email, fingerprint_id), so `emp[0]`/`emp['name']` both work.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._by_id: Optional[Dict[int, object]] = None
+        self._by_fingerprint: Dict[str, object] = {}
+        self._by_email: Dict[str, object] = {}
+        # Sorted (lowercased name, id) pairs for bisect-based prefix lookups
+        self._names: List[Tuple[str, int]] = []
+        self._data_version = None
+
+    # --- cache maintenance ---
+    def invalidate(self):
+        """Drop all indexes; the next lookup reloads them."""
+        self._by_id = None
+        self._by_fingerprint = {}
+        self._by_email = {}
+        self._names = []
+        self._data_version = None
+
+    def _load(self):
+        cursor = self.db.conn.cursor()
+        cursor.execute("SELECT id, name, email, fingerprint_id FROM employees ORDER BY id")
+        rows = cursor.fetchall()
+        by_id, by_fp, by_email, names = {}, {}, {}, []
+        for row in rows:
+            emp_id = int(row['id'])
+            by_id[emp_id] = row
+            # Keep the lowest id on duplicates, matching the old linear scans
+            if row['fingerprint_id']:
+                by_fp.setdefault(str(row['fingerprint_id']).strip(), row)
+            if row['email']:
+                by_email.setdefault(str(row['email']).strip().lower(), row)
+            names.append(((row['name'] or '').lower(), emp_id))
+        names.sort()
+        self._by_id = by_id
+        self._by_fingerprint = by_fp
+        self._by_email = by_email
+        self._names = names
+        self._data_version = self.db._data_version()
+
+    def _index(self) -> Dict[int, object]:
+        if self._by_id is None or self.db._data_version() != self._data_version:
+            self._load()
+        return self._by_id  # type: ignore[return-value]
+
+    # --- lookups ---
+    def get(self, employee_id):
+        """Return the employee row for an id, or None."""
+        try:
+            return self._index().get(int(employee_id))
+        except (TypeError, ValueError):
+            return None
+
+    def get_name(self, employee_id, default=None):
+        row = self.get(employee_id)
+        return row['name'] if row else default
+
+    def by_fingerprint(self, fingerprint_id):
+        """Return the employee enrolled at a scanner position / fingerprint id, or None."""
+        if fingerprint_id is None:
+            return None
+        self._index()
+        return self._by_fingerprint.get(str(fingerprint_id).strip())
+
+    def by_email(self, email):
+        """Return the employee with the given email (case-insensitive), or None."""
+        if not email:
+            return None
+        self._index()
+        return self._by_email.get(str(email).strip().lower())
+
+    def search_name(self, prefix: str, limit: int = 20) -> list:
+        """Return employees whose name starts with `prefix` (case-insensitive), by name."""
+        by_id = self._index()
+        key = (prefix or '').lower()
+        start = bisect.bisect_left(self._names, (key, -1))
+        results = []
+        for name, emp_id in self._names[start:]:
+            if not name.startswith(key) or len(results) >= limit:
+                break
+            results.append(by_id[emp_id])
+        return results
+
+    def all(self) -> list:
+        """Return all employees ordered by id (without fingerprint templates)."""
+        return list(self._index().values())
+
+    def count(self) -> int:
+        return len(self._index())
+
+    def get_template(self, employee_id):
+        """Load the fingerprint template BLOB for one employee on demand."""
+        cursor = self.db.conn.cursor()
+        cursor.execute("SELECT fingerprint_template FROM employees WHERE id = ?", (employee_id,))
+        row = cursor.fetchone()
+        return row[0] if row else None
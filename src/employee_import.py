@@ -0,0 +1,259 @@
+import csv
+import os
+import re
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .event_bus import EMPLOYEES_CHANGED
+
+# Header spellings accepted for each employee field (compared after normalizing)
+COLUMN_ALIASES = {
+    "name": "name", "full_name": "name", "employee_name": "name",
+    "email": "email", "e_mail": "email", "email_address": "email",
+    "fingerprint_id": "fingerprint_id", "fingerprint": "fingerprint_id", "fp_id": "fingerprint_id",
+    "photo": "photo", "photo_path": "photo", "image": "photo", "picture": "photo",
+}
+
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+INSERT_SQL = "INSERT INTO employees (name, email, fingerprint_id) VALUES (?, ?, ?)"
+
+
+def _normalize_header(value) -> str:
+    return re.sub(r"[\s\-]+", "_", str(value or "").strip().lower())
+
+
+def _cell(value) -> str:
+    """Spreadsheet cell to text (12.0 -> '12', None -> '')."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+class ImportReport:
+    """Outcome of one import: counts, per-row errors and timing."""
+
+    def __init__(self, dry_run: bool):
+        self.dry_run = dry_run
+        self.total = 0
+        self.inserted = 0
+        self.photos_enrolled = 0
+        self.errors: List[Tuple[int, str]] = []  # (spreadsheet row number, message)
+        self.first_id: Optional[int] = None
+        self.elapsed_s = 0.0
+
+    @property
+    def rejected(self) -> int:
+        return len({row for row, _ in self.errors if row})
+
+    @property
+    def rows_per_s(self) -> float:
+        return self.total / self.elapsed_s if self.elapsed_s else 0.0
+
+    def summary(self) -> str:
+        verb = "would be imported" if self.dry_run else "imported"
+        text = f"{self.inserted} of {self.total} employees {verb}, {self.rejected} rejected"
+        if self.photos_enrolled:
+            text += f", {self.photos_enrolled} faces enrolled"
+        return text
+
+
+class EmployeeImporter:
+    """Bulk-load employees from a CSV or XLSX file.
+
+    Rows are streamed (csv.reader / openpyxl read-only mode), validated and
+    de-duplicated by email against both the file and the existing table, then
+    inserted with executemany in `batch_size` batches inside one transaction,
+    so a failed import leaves the table untouched. The first row is the
+    header; a `name` and `email` column are required, `fingerprint_id` and
+    `photo` are optional. Invalid rows are skipped and reported by row number.
+
+    With a face manager, photos (paths relative to `photos_dir`, default the
+    file's folder) are enrolled after the commit; failures there are reported
+    but do not undo the import. `dry_run=True` validates without writing.
+    """
+
+    def __init__(self, db, face_mgr=None, batch_size: int = 1000):
+        self.db = db
+        self.face_mgr = face_mgr
+        self.batch_size = max(1, int(batch_size))
+
+    # --- reading ---
+    @staticmethod
+    def read_rows(path: str) -> Iterator[List[Any]]:
+        """Yield raw rows (header first) from a .csv or .xlsx file."""
+        ext = os.path.splitext(path)[1].lower()
+        if ext in (".xlsx", ".xlsm"):
+            try:
+                from openpyxl import load_workbook
+            except ImportError:
+                raise RuntimeError("Excel import requires openpyxl (pip install openpyxl)")
+            wb = load_workbook(path, read_only=True, data_only=True)
+            try:
+                for row in wb.active.iter_rows(values_only=True):
+                    yield list(row)
+            finally:
+                wb.close()
+        else:
+            with open(path, newline='', encoding='utf-8-sig') as f:
+                yield from csv.reader(f)
+
+    @staticmethod
+    def _columns(header) -> Dict[str, int]:
+        columns: Dict[str, int] = {}
+        for index, value in enumerate(header):
+            field = COLUMN_ALIASES.get(_normalize_header(value))
+            if field and field not in columns:
+                columns[field] = index
+        missing = [f for f in ("name", "email") if f not in columns]
+        if missing:
+            raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+        return columns
+
+    # --- import ---
+    def run(self, path: str, dry_run: bool = False, photos_dir: Optional[str] = None,
+            progress: Optional[Callable[[int], None]] = None) -> ImportReport:
+        """Import `path` and return an ImportReport. `progress(rows_read)` is called per batch."""
+        started = time.perf_counter()
+        report = ImportReport(dry_run)
+        photos_dir = photos_dir or os.path.dirname(os.path.abspath(path))
+        conn = self.db.conn
+
+        rows = self.read_rows(path)
+        header = next(rows, None)
+        if header is None:
+            raise ValueError("The file is empty")
+        columns = self._columns(header)
+        width = max(columns.values()) + 1
+
+        # Existing keys, normalized the same way as EmployeeDirectory
+        emails = {str(r[0]).strip().lower() for r in conn.execute(
+            "SELECT email FROM employees WHERE email IS NOT NULL AND email != ''")}
+        fingerprints = {str(r[0]).strip() for r in conn.execute(
+            "SELECT fingerprint_id FROM employees WHERE fingerprint_id IS NOT NULL AND fingerprint_id != ''")}
+        photos: List[Tuple[int, int, str]] = []  # (insert position, row number, photo path)
+
+        if not dry_run:
+            if conn.in_transaction:
+                conn.commit()
+            conn.execute("BEGIN IMMEDIATE")
+        try:
+            if not dry_run:
+                last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM employees").fetchone()[0]
+            batch: List[Tuple[str, str, Optional[str]]] = []
+            for row_no, raw in enumerate(rows, start=2):
+                if len(raw) < width:
+                    raw = list(raw) + [None] * (width - len(raw))
+                values = {field: _cell(raw[index]) for field, index in columns.items()}
+                if not any(values.values()):
+                    continue  # blank line
+                report.total += 1
+
+                name, email = values["name"], values["email"]
+                fingerprint_id = values.get("fingerprint_id") or None
+                key = email.lower()
+                if not name:
+                    report.errors.append((row_no, "name is required"))
+                    continue
+                if not _EMAIL_RE.match(email):
+                    report.errors.append((row_no, f"invalid email '{email}'"))
+                    continue
+                if key in emails:
+                    report.errors.append((row_no, f"duplicate email '{email}'"))
+                    continue
+                if fingerprint_id and fingerprint_id in fingerprints:
+                    report.errors.append((row_no, f"fingerprint_id {fingerprint_id} already in use"))
+                    continue
+                photo = values.get("photo")
+                if photo:
+                    photo = os.path.join(photos_dir, photo)
+                    if not os.path.isfile(photo):
+                        report.errors.append((row_no, f"photo not found: {values['photo']}"))
+                        continue
+                    photos.append((report.inserted, row_no, photo))
+
+                emails.add(key)
+                if fingerprint_id:
+                    fingerprints.add(fingerprint_id)
+                batch.append((name, email, fingerprint_id))
+                report.inserted += 1
+                if len(batch) >= self.batch_size:
+                    if not dry_run:
+                        conn.executemany(INSERT_SQL, batch)
+                    batch = []
+                    if progress:
+                        progress(report.total)
+            if batch and not dry_run:
+                conn.executemany(INSERT_SQL, batch)
+            if not dry_run:
+                conn.commit()
+        except Exception:
+            if not dry_run:
+                conn.rollback()
+            raise
+        if progress:
+            progress(report.total)
+
+        if not dry_run and report.inserted:
+            # AUTOINCREMENT ids are handed out in insert order under the write lock
+            ids = [r[0] for r in conn.execute("SELECT id FROM employees WHERE id > ? ORDER BY id", (last_id,))]
+            report.first_id = ids[0]
+            self._after_import(report, ids, photos)
+        report.elapsed_s = time.perf_counter() - started
+        return report
+
+    def _after_import(self, report: ImportReport, ids: List[int], photos):
+        self.db.employee_directory.invalidate()
+        try:
+            self.db.schedule.materialize_new_employees(report.first_id)
+        except Exception as e:
+            print(f"⚠️ Failed to schedule imported employees: {e}")
+        if photos:
+            if self.face_mgr is None:
+                report.errors.append((0, f"{len(photos)} photos skipped: face enrollment is not available"))
+            else:
+                for position, row_no, photo in photos:
+                    try:
+                        ok, message = self.face_mgr.enroll_from_image(ids[position], photo)
+                    except Exception as e:
+                        ok, message = False, str(e)
+                    if ok:
+                        report.photos_enrolled += 1
+                    else:
+                        report.errors.append((row_no, f"photo not enrolled: {message}"))
+        self.db.event_bus.publish(EMPLOYEES_CHANGED, employee_id=None, count=report.inserted)
+
+
+def main(argv=None):
+    """Command line: python -m src.employee_import FILE [--dry-run] [--db attendance.db]"""
+    from .database import Database
+
+    argv = list(argv if argv is not None else sys.argv[1:])
+    dry_run = "--dry-run" in argv
+    if dry_run:
+        argv.remove("--dry-run")
+    db_name = "attendance.db"
+    if "--db" in argv:
+        i = argv.index("--db")
+        db_name = argv[i + 1]
+        del argv[i:i + 2]
+    if len(argv) != 1:
+        print(main.__doc__)
+        return 2
+
+    db = Database(db_name=db_name)
+    try:
+        report = EmployeeImporter(db).run(argv[0], dry_run=dry_run)
+    finally:
+        db.close()
+    for row_no, message in report.errors:
+        print(f"  row {row_no}: {message}" if row_no else f"  {message}")
+    print(f"📦 {report.summary()} in {report.elapsed_s:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
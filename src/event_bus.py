@@ -0,0 +1,46 @@
+import threading
+from typing import Any, Callable, Dict, List
+
+
+# Topics published by Database / PunchEngine
+PUNCH = "attendance.punch"            # payload: employee_id, action, date, time, id (+ event_id, source)
+EMPLOYEES_CHANGED = "employees.changed"  # payload: employee_id
+
+
+class EventBus:
+    """Small in-process publish/subscribe hub.
+
+    Callbacks run synchronously on the publishing thread (the punch queue
+    writer publishes from its own thread), so UI subscribers should only
+    record the event and apply it from the Tk loop. A failing subscriber is
+    logged and does not affect the publisher or other subscribers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+
+    def subscribe(self, topic: str, callback: Callable[[Dict[str, Any]], None]) -> Callable[[], None]:
+        """Register `callback(payload)` for `topic`. Returns a function that unsubscribes it."""
+        with self._lock:
+            # Copy-on-write so publish() can iterate without holding the lock
+            self._subscribers[topic] = self._subscribers.get(topic, []) + [callback]
+        return lambda: self.unsubscribe(topic, callback)
+
+    def unsubscribe(self, topic: str, callback):
+        with self._lock:
+            callbacks = [c for c in self._subscribers.get(topic, []) if c is not callback]
+            if callbacks:
+                self._subscribers[topic] = callbacks
+            else:
+                self._subscribers.pop(topic, None)
+
+    def publish(self, topic: str, **payload) -> int:
+        """Deliver `payload` to every subscriber of `topic`. Returns the number notified."""
+        callbacks = self._subscribers.get(topic, ())
+        for callback in callbacks:
+            try:
+                callback(payload)
+            except Exception as e:
+                print(f"⚠️ Event subscriber for {topic} failed: {e}")
+        return len(callbacks)
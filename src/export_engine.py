@@ -0,0 +1,218 @@
+import abc
+import csv
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+
+class ExportCancelled(Exception):
+    """Raised inside an export worker when cancel() was requested."""
+
+
+class ExportJob(abc.ABC):
+    """Streams the rows of one SQL query into a file on a background thread.
+
+    The worker opens its own read connection, executes `sql` and pulls
+    `chunk_size` rows at a time with `fetchmany`, so memory stays flat no
+    matter how many rows match. Output goes to a temporary file next to
+    `path` that is renamed into place only on success; a cancelled or
+    failed export leaves no partial file behind.
+
+    Progress is exposed as plain attributes (`rows_written`, `total`,
+    `done`, `error`, `cancelled`) for the UI to poll from its own loop.
+    `attach` ({alias: path}, see ArchiveManager.attach_map) lists archive
+    databases the SQL reads from. Subclasses implement `_write(cursor, tmp_path)`.
+    """
+
+    def __init__(self, db_name: str, sql: str, params: Sequence[Any], path: str,
+                 header: Optional[List[str]] = None, total: Optional[int] = None, chunk_size: int = 5000,
+                 attach: Optional[Dict[str, str]] = None):
+        self.db_name = db_name
+        self.attach = dict(attach or {})
+        self.sql = sql
+        self.params = list(params)
+        self.path = path
+        self.header = header
+        self.total = total
+        self.chunk_size = max(1, int(chunk_size))
+
+        self.rows_written = 0
+        self.done = False
+        self.cancelled = False
+        self.error: Optional[BaseException] = None
+        self.elapsed_s = 0.0
+        self._cancel = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.on_done: Optional[Callable[["ExportJob"], None]] = None
+
+    # --- control ---
+    def start(self) -> "ExportJob":
+        self._thread = threading.Thread(target=self._run, name="export", daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self) -> "ExportJob":
+        """Run the export on the calling thread (scripts and benchmarks)."""
+        self._run()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.done
+
+    @property
+    def progress(self) -> Optional[float]:
+        """Fraction completed in [0, 1], or None when the total is unknown."""
+        if not self.total:
+            return None
+        return min(1.0, self.rows_written / self.total)
+
+    # --- worker ---
+    def _chunks(self, cursor):
+        """Yield fetchmany() chunks, counting rows and honouring cancel()."""
+        while True:
+            if self._cancel.is_set():
+                raise ExportCancelled()
+            rows = cursor.fetchmany(self.chunk_size)
+            if not rows:
+                return
+            yield rows
+            self.rows_written += len(rows)
+
+    def _run(self):
+        started = time.perf_counter()
+        tmp_path = f"{self.path}.part"
+        conn = None
+        try:
+            conn = sqlite3.connect(self.db_name)
+            for alias, archive_path in self.attach.items():
+                conn.execute(f"ATTACH DATABASE ? AS {alias}", (archive_path,))
+            cursor = conn.execute(self.sql, self.params)
+            self._write(cursor, tmp_path)
+            os.replace(tmp_path, self.path)
+        except ExportCancelled:
+            self.cancelled = True
+        except Exception as e:
+            self.error = e
+            print(f"🔥 Export to {self.path} failed: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            self.elapsed_s = time.perf_counter() - started
+            self.done = True
+            if self.on_done is not None:
+                try:
+                    self.on_done(self)
+                except Exception:
+                    pass
+
+    @abc.abstractmethod
+    def _write(self, cursor, tmp_path: str):
+        """Write every row of `cursor` to `tmp_path` (use `_chunks` to report progress)."""
+
+
+class CsvExportJob(ExportJob):
+    """Export query rows as CSV (NULLs become empty cells)."""
+
+    def _write(self, cursor, tmp_path: str):
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if self.header:
+                writer.writerow(self.header)
+            for rows in self._chunks(cursor):
+                writer.writerows(rows)
+
+
+# Excel limits: 31-character sheet titles without []:*?/\ and 1,048,576 rows per sheet
+_SHEET_TITLE_MAX = 31
+_SHEET_ROW_MAX = 1048576
+_SHEET_BAD_CHARS = str.maketrans({c: "_" for c in "[]:*?/\\"})
+
+
+class XlsxExportJob(ExportJob):
+    """Export query rows to an .xlsx workbook with openpyxl's write-only mode.
+
+    The first column of each row is the sheet key (see
+    Database.attendance_workbook_sql); rows arrive ordered by it, and a new
+    sheet is started whenever the key changes. Write-only worksheets stream
+    rows to disk, so memory stays flat. An optional summary query (see
+    Database.daily_summary_export_sql) is keyed the same way by employee and
+    written first, one "<key> Summary" sheet per employee. Sheets that would
+    exceed Excel's row limit continue on "<key> (2)", "<key> (3)", ...
+    """
+
+    def __init__(self, db_name: str, sql: str, params: Sequence[Any], path: str,
+                 header: Optional[List[str]] = None, total: Optional[int] = None, chunk_size: int = 5000,
+                 summary_sql: Optional[str] = None, summary_params: Sequence[Any] = (),
+                 summary_header: Optional[List[str]] = None, attach: Optional[Dict[str, str]] = None):
+        super().__init__(db_name, sql, params, path, header=header, total=total, chunk_size=chunk_size,
+                         attach=attach)
+        self.summary_sql = summary_sql
+        self.summary_params = list(summary_params)
+        self.summary_header = summary_header
+        self._titles = set()
+
+    def _title(self, key, suffix: str = "") -> str:
+        base = str(key if key not in (None, "") else "Unknown").translate(_SHEET_BAD_CHARS)
+        base = base[:_SHEET_TITLE_MAX - len(suffix)] + suffix
+        title, n = base, 1
+        while title.lower() in self._titles:
+            n += 1
+            counter = f" ({n})"
+            title = base[:_SHEET_TITLE_MAX - len(counter)] + counter
+        self._titles.add(title.lower())
+        return title
+
+    def _write_sheets(self, wb, chunks, header: Optional[List[str]], suffix: str = "") -> bool:
+        """Append keyed rows (sheet key first) from `chunks`, starting a sheet whenever the key changes."""
+        ws, current_key, sheet_rows = None, object(), 0
+        for rows in chunks:
+            for row in rows:
+                key = row[0]
+                if key != current_key or sheet_rows >= _SHEET_ROW_MAX:
+                    ws = wb.create_sheet(title=self._title(key, suffix))
+                    if header:
+                        ws.append(header)
+                    current_key, sheet_rows = key, 1 if header else 0
+                ws.append(row[1:])
+                sheet_rows += 1
+        return ws is not None
+
+    def _summary_chunks(self, conn):
+        summary = conn.execute(self.summary_sql, self.summary_params)
+        while True:
+            if self._cancel.is_set():
+                raise ExportCancelled()
+            rows = summary.fetchmany(self.chunk_size)
+            if not rows:
+                return
+            yield rows
+
+    def _write(self, cursor, tmp_path: str):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            raise RuntimeError("Excel export requires openpyxl (pip install openpyxl)")
+
+        wb = Workbook(write_only=True)
+        wrote = False
+        if self.summary_sql:
+            wrote = self._write_sheets(wb, self._summary_chunks(cursor.connection), self.summary_header, " Summary")
+        wrote = self._write_sheets(wb, self._chunks(cursor), self.header) or wrote
+        if not wrote:
+            # Excel refuses workbooks without sheets
+            wb.create_sheet(title=self._title("Attendance"))
+        wb.save(tmp_path)
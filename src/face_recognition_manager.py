@@ -266,6 +266,31 @@ class FaceRecognitionManager:
         print(f'enroll_face: saved employee_{employee_id}')
         return True
 
+    def enroll_from_image(self, employee_id: int, image_path: str) -> Tuple[bool, str]:
+        """Enroll a face from an existing photo (bulk imports). Returns (ok, message)."""
+        frame = cv2.imread(image_path)
+        if frame is None:
+            return False, f"cannot read image {image_path}"
+        face_img = self._detect_face(frame)
+        if face_img is None or face_img.size == 0:
+            return False, f"no face found in {os.path.basename(image_path)}"
+        dup, matched = self.is_face_duplicate(face_img)
+        if dup:
+            return False, f"face already enrolled ({matched})"
+
+        path = os.path.join(self.faces_dir, f"employee_{employee_id}.jpg")
+        cv2.imwrite(path, face_img)
+        if self.use_dlib:
+            try:
+                rect = dlib.rectangle(0, 0, face_img.shape[1], face_img.shape[0])  # type: ignore
+                shape = self.shape_predictor(cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY), rect)
+                encoding = self.face_recognizer.compute_face_descriptor(face_img, shape)
+                with open(os.path.join(self.faces_dir, f"employee_{employee_id}.dat"), 'wb') as f:
+                    pickle.dump(encoding, f)
+            except Exception as e:
+                print('enroll_from_image: error saving dlib encoding:', e)
+        return True, path
+
     def enroll_face_live(self, employee_id: int, camera_index: int = 0, on_success=None, backend: Optional[int] = None):
         """Open a live camera window to enroll a face. Press 'C' to capture, 'Q' to quit."""
         cap = self._open_capture(camera_index, backend)
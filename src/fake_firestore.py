@@ -0,0 +1,207 @@
+import copy
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+# Stand-in for firestore.SERVER_TIMESTAMP; replaced by the commit time on write
+SERVER_TIMESTAMP = object()
+
+# Firestore rejects batches with more writes than this
+MAX_BATCH_WRITES = 500
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id: str, data: Optional[Dict[str, Any]]):
+        self.id = doc_id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data)
+
+    def get(self, field: str) -> Any:
+        return (self._data or {}).get(field)
+
+
+class FakeDocument:
+    def __init__(self, store: "FakeFirestore", collection: str, doc_id: str):
+        self._store = store
+        self.collection_name = collection
+        self.id = doc_id
+
+    def set(self, data: Dict[str, Any], merge: bool = False):
+        self._store._commit([(self, data, merge)])
+
+    def get(self) -> FakeSnapshot:
+        with self._store._lock:
+            data = self._store._data.get(self.collection_name, {}).get(self.id)
+            return FakeSnapshot(self.id, copy.deepcopy(data))
+
+
+# Field path that orders and filters by document id, as FieldPath.document_id()
+DOCUMENT_ID = "__name__"
+
+_OPS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+def _field(doc_id: str, data: Dict[str, Any], field: str) -> Any:
+    return doc_id if field == DOCUMENT_ID else data.get(field)
+
+
+class FakeQuery:
+    """Immutable query: where / order_by / start_after / limit, then stream()."""
+
+    ASCENDING = "ASCENDING"
+    DESCENDING = "DESCENDING"
+
+    def __init__(self, store: "FakeFirestore", collection: str, filters=(), orders=(), cursor=None, limit_to=None):
+        self._store = store
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._cursor = cursor
+        self._limit = limit_to
+
+    def _copy(self, **changes) -> "FakeQuery":
+        state = {"filters": self._filters, "orders": self._orders, "cursor": self._cursor, "limit_to": self._limit}
+        state.update(changes)
+        return FakeQuery(self._store, self._collection, **state)
+
+    def where(self, field: str, op: str, value: Any) -> "FakeQuery":
+        return self._copy(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field: str, direction: str = ASCENDING) -> "FakeQuery":
+        return self._copy(orders=self._orders + ((field, direction),))
+
+    def start_after(self, values: Dict[str, Any]) -> "FakeQuery":
+        return self._copy(cursor=dict(values))
+
+    def limit(self, count: int) -> "FakeQuery":
+        return self._copy(limit_to=int(count))
+
+    def stream(self) -> Iterator[FakeSnapshot]:
+        with self._store._lock:
+            docs = list(self._store._data.get(self._collection, {}).items())
+        # Like Firestore, documents missing an ordered or filtered field are left out
+        fields = {f for f, _, _ in self._filters} | {f for f, _ in self._orders}
+        docs = [(i, d) for i, d in docs if all(_field(i, d, f) is not None for f in fields)]
+        for field, op, value in self._filters:
+            docs = [(i, d) for i, d in docs if _OPS[op](_field(i, d, field), value)]
+        orders = self._orders or ((DOCUMENT_ID, self.ASCENDING),)
+        for field, direction in reversed(orders):
+            docs.sort(key=lambda item: _field(item[0], item[1], field), reverse=direction == self.DESCENDING)
+        if self._cursor is not None:
+            cursor = tuple(self._cursor.get(f) for f, _ in orders)
+            docs = [(i, d) for i, d in docs if self._after(tuple(_field(i, d, f) for f, _ in orders), cursor, orders)]
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        # Copy only what is returned (FakeSnapshot.to_dict copies again for the caller)
+        with self._store._lock:
+            docs = [(doc_id, copy.deepcopy(data)) for doc_id, data in docs]
+        for doc_id, data in docs:
+            yield FakeSnapshot(doc_id, data)
+
+    @staticmethod
+    def _after(values, cursor, orders) -> bool:
+        for value, bound, (_, direction) in zip(values, cursor, orders):
+            if value == bound:
+                continue
+            return value > bound if direction != FakeQuery.DESCENDING else value < bound
+        return False
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, store: "FakeFirestore", name: str):
+        super().__init__(store, name)
+        self.name = name
+
+    def document(self, doc_id: Optional[str] = None) -> FakeDocument:
+        return FakeDocument(self._store, self.name, doc_id or uuid.uuid4().hex[:20])
+
+    def add(self, data: Dict[str, Any]):
+        ref = self.document()
+        ref.set(data)
+        return datetime.now(timezone.utc), ref
+
+
+class FakeWriteBatch:
+    def __init__(self, store: "FakeFirestore"):
+        self._store = store
+        self._writes: List[Any] = []
+
+    def set(self, ref: FakeDocument, data: Dict[str, Any], merge: bool = False):
+        self._writes.append((ref, data, merge))
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+    def commit(self):
+        if len(self._writes) > MAX_BATCH_WRITES:
+            raise ValueError(f"Batch has {len(self._writes)} writes; maximum is {MAX_BATCH_WRITES}")
+        results = self._store._commit(self._writes)
+        self._writes = []
+        return results
+
+
+class FakeFirestore:
+    """In-memory Firestore client covering what the app uses.
+
+    Supports `collection().document().set/get`, `collection().add`,
+    queries (`where`, `order_by`, `start_after`, `limit`, `stream`, with
+    "__name__" for the document id) and `batch()` with the 500-write limit. Batches apply all-or-nothing,
+    and SERVER_TIMESTAMP values become the commit time. Set `fail_commits`
+    to make the next N commits raise ConnectionError, to simulate an outage.
+    `commits` and `writes` count what reached the store.
+    """
+
+    SERVER_TIMESTAMP = SERVER_TIMESTAMP
+
+    def __init__(self):
+        self._data: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self._last_commit_at: Optional[datetime] = None
+        self.fail_commits = 0
+        self.commits = 0
+        self.writes = 0
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self, name)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def _now(self) -> datetime:
+        # Strictly increasing, so commit times order writes like server timestamps
+        now = datetime.now(timezone.utc)
+        if self._last_commit_at is not None and now <= self._last_commit_at:
+            now = self._last_commit_at + timedelta(microseconds=1)
+        self._last_commit_at = now
+        return now
+
+    def _commit(self, writes):
+        with self._lock:
+            if self.fail_commits > 0:
+                self.fail_commits -= 1
+                raise ConnectionError("Simulated Firestore outage")
+            now = self._now()
+            for ref, data, merge in writes:
+                doc = {k: (now if v is SERVER_TIMESTAMP else copy.deepcopy(v)) for k, v in data.items()}
+                docs = self._data.setdefault(ref.collection_name, {})
+                if merge and ref.id in docs:
+                    docs[ref.id].update(doc)
+                else:
+                    docs[ref.id] = doc
+            self.commits += 1
+            self.writes += len(writes)
+            return [now] * len(writes)
@@ -0,0 +1,91 @@
+import os
+import sqlite3
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def fsync_dir(path: str):
+    """Flush a directory entry (after a rename) where the platform allows it."""
+    if os.name != "posix":
+        return
+    fd = os.open(path or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _copy_fd(src_fd: int, dst_fd: int, size: int, chunk_size: int) -> int:
+    """Copy `size` bytes between descriptors in bounded chunks, in the kernel when possible."""
+    copied = 0
+    # copy_file_range (Linux 4.5+) can reflink or copy in-kernel; sendfile
+    # to a regular file works on Linux; otherwise fall back to read/write
+    for name in ("copy_file_range", "sendfile"):
+        fn = getattr(os, name, None)
+        if fn is None:
+            continue
+        try:
+            while copied < size:
+                if name == "copy_file_range":
+                    n = fn(src_fd, dst_fd, min(chunk_size, size - copied))
+                else:
+                    n = fn(dst_fd, src_fd, copied, min(chunk_size, size - copied))
+                if n == 0:
+                    break
+                copied += n
+            return copied
+        except OSError:
+            if copied:
+                raise
+            # Not supported for these files (e.g. across filesystems on old kernels)
+            continue
+    while True:
+        data = os.read(src_fd, chunk_size)
+        if not data:
+            return copied
+        view = memoryview(data)
+        while view:
+            n = os.write(dst_fd, view)
+            view = view[n:]
+        copied += len(data)
+
+
+def copy_file(src: str, dest: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """Stream `src` to `dest` without loading it into memory.
+
+    Writes `<dest>.part`, fsyncs it, renames it over `dest` and fsyncs the
+    directory, so `dest` is either the old file or the complete new one.
+    Returns the number of bytes copied.
+    """
+    tmp_path = f"{dest}.part"
+    try:
+        with open(src, "rb") as sf, open(tmp_path, "wb") as df:
+            size = os.fstat(sf.fileno()).st_size
+            copied = _copy_fd(sf.fileno(), df.fileno(), size, max(1, int(chunk_size)))
+            if copied != size:
+                raise OSError(f"Short copy of {src}: {copied} of {size} bytes")
+            df.flush()
+            os.fsync(df.fileno())
+        os.replace(tmp_path, dest)
+        fsync_dir(os.path.dirname(os.path.abspath(dest)))
+        return copied
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def quick_check(path: str) -> Optional[str]:
+    """Run PRAGMA quick_check on a database file. Returns None if it is sound, else the problem."""
+    try:
+        conn = sqlite3.connect(Path(os.path.abspath(path)).as_uri() + "?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        return str(e)
+    try:
+        rows = [row[0] for row in conn.execute("PRAGMA quick_check")]
+    except sqlite3.Error as e:
+        return str(e)
+    finally:
+        conn.close()
+    return None if rows == ["ok"] else "; ".join(rows[:5])
@@ -1,61 +1,193 @@
 import os
 import datetime
-from typing import Dict, Any, List
+import json
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Dict, Any, List, Optional
 
-# try to import firebase admin SDK, but keep a simulation fallback
-try:
-    import firebase_admin
-    from firebase_admin import credentials, firestore, storage
-    FIREBASE_AVAILABLE = True
-except Exception:
-    firebase_admin = None
-    credentials = None
-    firestore = None
-    storage = None
-    FIREBASE_AVAILABLE = False
+from .attendance_sync import AttendancePuller
+from .backup_store import BackupStore
+from .fake_firestore import SERVER_TIMESTAMP as FAKE_SERVER_TIMESTAMP, FakeFirestore
+from .file_copy import copy_file
+from .sync_outbox import SyncWorker, record_doc_id
+
+# firebase-admin is slow to import, so it is loaded by the initializer
+# thread; without it (or a service account) we keep a simulation fallback
+firebase_admin = None
+credentials = None
+firestore = None
+storage = None
+
+
+def _import_firebase() -> bool:
+    """Import firebase-admin on first use. Returns False if it is not installed."""
+    global firebase_admin, credentials, firestore, storage
+    if firebase_admin is None:
+        try:
+            import firebase_admin as admin
+            from firebase_admin import credentials as creds, firestore as fs, storage as st
+        except Exception:
+            return False
+        firebase_admin, credentials, firestore, storage = admin, creds, fs, st
+    return True
 
 
 class FirebaseManager:
     """Manages Firebase interactions when a service account is present.
 
     If `serviceAccountKey.json` is not present or firebase-admin isn't installed,
-    this will run in simulation/local-backups mode.
+    this will run in simulation/local-backups mode, writing attendance to an
+    in-memory FakeFirestore. Pass `firestore_client` to substitute any client
+    with the same API (e.g. a FakeFirestore in tests).
+
+    Connecting (importing firebase-admin, loading credentials, creating the
+    clients) happens on a background thread, so construction returns at
+    once. `ready` is a Future resolving to True with Firebase or False in
+    simulation mode; `wait_ready()` blocks on it. Pass `background=False`
+    to connect in the constructor instead.
+
+    Attendance uploads go through the company database's sync outbox once
+    `attach_database()` has been called; a SyncWorker thread sends them.
+    Punches recorded by the attached database's PunchEngine (kiosk and API)
+    queue their own upload in the punch transaction.
+    Uploads made before the connection is ready are queued there too and
+    sent when it is. Reads pull only documents changed since the last pull
+    into the database's `cloud_attendance` mirror (see AttendancePuller).
     """
 
-    def __init__(self, service_account_path: str = "serviceAccountKey.json"):
+    def __init__(self, service_account_path: str = "serviceAccountKey.json", firestore_client=None,
+                 background: bool = True):
         self.service_account_path = service_account_path
-        self.simulated_data: Dict[str, Dict[str, Any]] = {}
         self.local_backups_dir = os.path.join(os.getcwd(), "backups")
         os.makedirs(self.local_backups_dir, exist_ok=True)
+        # Deduplicated snapshots; storage mirrors it under backups/chunks and backups/manifests
+        self.backup_store = BackupStore(os.path.join(self.local_backups_dir, "store"))
 
         self._use_firebase = False
         self._firestore_client = None
         self._storage_bucket = None
+        self._client = None
+        self._server_timestamp = None
+        self._db = None
+        self._worker_kwargs: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self.outbox = None
+        self.sync_worker = None
+        self.puller = None
 
-        if FIREBASE_AVAILABLE and os.path.exists(self.service_account_path):
-            try:
-                cred = credentials.Certificate(self.service_account_path)
-                # Allow specifying a default storage bucket via env var FIREBASE_STORAGE_BUCKET
-                bucket_name = os.environ.get("FIREBASE_STORAGE_BUCKET")
+        self.ready: Future = Future()
+        self.ready.add_done_callback(lambda _: self._start_sync())
+        if background:
+            threading.Thread(target=self._initialize, args=(firestore_client,),
+                             name="firebase-init", daemon=True).start()
+        else:
+            self._initialize(firestore_client)
 
-                if bucket_name:
-                    firebase_admin.initialize_app(cred, {"storageBucket": bucket_name})
-                else:
-                    firebase_admin.initialize_app(cred)
+    # --- Initialization ---
+    def _connect(self):
+        cred = credentials.Certificate(self.service_account_path)
+        # Allow specifying a default storage bucket via env var FIREBASE_STORAGE_BUCKET
+        bucket_name = os.environ.get("FIREBASE_STORAGE_BUCKET")
 
-                self._firestore_client = firestore.client()
+        if bucket_name:
+            firebase_admin.initialize_app(cred, {"storageBucket": bucket_name})
+        else:
+            firebase_admin.initialize_app(cred)
+
+        self._firestore_client = firestore.client()
+        try:
+            self._storage_bucket = storage.bucket() if bucket_name else None
+        except Exception:
+            self._storage_bucket = None
+
+        self._use_firebase = True
+        print("🔥 FirebaseManager initialized (firebase-admin)")
+
+    def _initialize(self, firestore_client=None):
+        # `ready` must resolve whatever happens here, or uploads wait forever
+        try:
+            if os.path.exists(self.service_account_path) and _import_firebase():
                 try:
-                    self._storage_bucket = storage.bucket() if bucket_name else None
-                except Exception:
-                    self._storage_bucket = None
+                    self._connect()
+                except Exception as e:
+                    print(f"⚠️ Firebase initialization failed, falling back to simulation: {e}")
+                    self._use_firebase = False
+            else:
+                print("🔥 FirebaseManager initialized (simulation/local-backups mode)")
 
-                self._use_firebase = True
-                print("🔥 FirebaseManager initialized (firebase-admin)")
-            except Exception as e:
-                print(f"⚠️ Firebase initialization failed, falling back to simulation: {e}")
-                self._use_firebase = False
-        else:
-            print("🔥 FirebaseManager initialized (simulation/local-backups mode)")
+            # Attendance writes go to Firestore, an injected client, or an in-memory fake
+            if firestore_client is not None:
+                self._client = firestore_client
+            elif self._use_firebase and self._firestore_client:
+                self._client = self._firestore_client
+            else:
+                self._client = FakeFirestore()
+            self._server_timestamp = (firestore.SERVER_TIMESTAMP if self._client is self._firestore_client
+                                      else FAKE_SERVER_TIMESTAMP)
+        except Exception as e:
+            print(f"⚠️ Firebase initialization failed, falling back to simulation: {e}")
+            self._use_firebase = False
+            self._client = firestore_client if firestore_client is not None else FakeFirestore()
+            self._server_timestamp = FAKE_SERVER_TIMESTAMP
+        self.ready.set_result(self._use_firebase)
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until initialization has finished. False if `timeout` ran out first."""
+        try:
+            self.ready.result(timeout)
+            return True
+        except FutureTimeout:
+            return False
+
+    # --- Sync outbox ---
+    def attach_database(self, db, **worker_kwargs):
+        """Send attendance through `db`'s outbox, replacing any previously attached database.
+
+        Returns the SyncWorker, or None if it will start once initialization finishes.
+        """
+        self.close()
+        with self._lock:
+            self._db = db
+            self._worker_kwargs = worker_kwargs
+            self.outbox = db.outbox
+            self.puller = AttendancePuller(db, self._client)
+            # Punches (kiosk and API) queue their upload in their own transaction
+            db.punch_engine.sync_origin = db.outbox.origin
+            db.punch_engine.on_sync = self._wake_sync
+            if self.ready.done():
+                self._start_sync()
+            return self.sync_worker
+
+    def _start_sync(self):
+        # Runs on attach (when ready) and once when initialization finishes
+        with self._lock:
+            if self._db is None or self.sync_worker is not None:
+                return
+            self.puller.client = self._client
+            self.sync_worker = SyncWorker(self._db.db_name, self._client, server_timestamp=self._server_timestamp,
+                                          **self._worker_kwargs).start()
+
+    def _wake_sync(self):
+        worker = self.sync_worker
+        if worker is not None:
+            worker.wake()
+
+    def close(self):
+        """Stop the sync worker. Unsent writes stay in the outbox for the next run."""
+        with self._lock:
+            if self._db is not None:
+                self._db.punch_engine.sync_origin = None
+                self._db.punch_engine.on_sync = None
+            if self.sync_worker is not None:
+                self.sync_worker.stop()
+                self.sync_worker = None
+            self._db = None
+            self.outbox = None
+            self.puller = None
+
+    def sync_stats(self) -> Dict[str, Any]:
+        """Outbox depth, lag and send counters (empty when no database is attached)."""
+        return self.sync_worker.stats() if self.sync_worker is not None else {}
 
     # --- Attendance ---
     def upload_attendance(self, *args, **kwargs):
@@ -64,6 +196,11 @@ class FirebaseManager:
         Supports two call styles:
         - upload_attendance(name, status)
         - upload_attendance({'name': name, 'status': status, ...})
+
+        With an attached database the record is queued in the outbox (one
+        local write) and sent in the background, even before initialization
+        has finished; otherwise it is written directly. Either way its document id is deterministic, so a retry
+        overwrites instead of adding a duplicate.
         """
         now = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
 
@@ -77,52 +214,118 @@ class FirebaseManager:
 
         record.setdefault("timestamp", now)
 
-        if self._use_firebase and self._firestore_client:
+        outbox, worker = self.outbox, self.sync_worker
+        if outbox is not None:
             try:
-                col = self._firestore_client.collection("attendance")
-                col.add(record)
-                print(f"📤 [FIRESTORE] Uploaded attendance: {record}")
+                outbox.enqueue("attendance", record_doc_id(record, outbox.origin), record)
+                if worker is not None:
+                    worker.wake()
                 return True
             except Exception as e:
-                print(f"⚠️ Failed to upload attendance to Firestore: {e}")
+                print(f"⚠️ Failed to queue attendance for sync: {e}")
 
-        # simulation fallback
-        self.simulated_data[record["timestamp"]] = record
-        print(f"📤 [SIMULATED UPLOAD] {record}")
-        return True
+        # No outbox to hold the write: wait for the connection
+        self.wait_ready()
+        try:
+            doc = dict(record, updated_at=self._server_timestamp)
+            self._client.collection("attendance").document(record_doc_id(record, "direct")).set(doc)
+            print(f"📤 Uploaded attendance: {record}")
+            return True
+        except Exception as e:
+            print(f"⚠️ Failed to upload attendance to Firestore: {e}")
+            return False
+
+    def pull_attendance(self, page_size: int = 500) -> int:
+        """Merge attendance changed in Firestore since the last pull. Returns documents merged.
+
+        Does nothing (returns 0) until initialization has finished.
+        """
+        if self.puller is None or not self.ready.done():
+            return 0
+        try:
+            return self.puller.pull(page_size)
+        except Exception as e:
+            print(f"⚠️ Failed to pull attendance from Firestore: {e}")
+            return 0
+
+    def resync_attendance(self, page_size: int = 500, max_pages=None, restart: bool = False) -> bool:
+        """Re-read the whole attendance collection into the local mirror.
+
+        Resumes an interrupted resync unless `restart` is set. Returns True
+        once it has finished, False if it stopped early or failed.
+        """
+        if self.puller is None:
+            return False
+        self.wait_ready()
+        try:
+            done = self.puller.resync(page_size, max_pages=max_pages, restart=restart)
+            if done:
+                print(f"⬇️ Resynced attendance: {self.puller.pulled} documents")
+            return done
+        except Exception as e:
+            print(f"⚠️ Attendance resync interrupted, will resume: {e}")
+            return False
 
     def get_all_attendance(self) -> Dict[str, Dict[str, Any]]:
-        """Return attendance records from Firestore if available, otherwise simulated data."""
-        if self._use_firebase and self._firestore_client:
+        """Return attendance records from Firestore (or the simulation fake).
+
+        With an attached database this pulls the changes since the last
+        call and answers from the local mirror (as last pulled, while
+        initialization is still running); otherwise it streams the whole
+        collection.
+        """
+        if self.puller is not None:
+            self.pull_attendance()
             try:
-                docs = list(self._firestore_client.collection("attendance").stream())
-                return {d.id: d.to_dict() for d in docs}
+                return self.puller.records()
             except Exception as e:
-                print(f"⚠️ Failed to read attendance from Firestore: {e}")
-
-        return self.simulated_data
+                print(f"⚠️ Failed to read mirrored attendance: {e}")
+                return {}
+        self.wait_ready()
+        try:
+            docs = list(self._client.collection("attendance").stream())
+            return {d.id: d.to_dict() for d in docs}
+        except Exception as e:
+            print(f"⚠️ Failed to read attendance from Firestore: {e}")
+            return {}
 
     # --- Backups (storage/local) ---
     def list_backups(self) -> List[Dict[str, Any]]:
-        """List available backups. Returns list of dicts with filename, timestamp, size_bytes."""
+        """List available backups. Returns list of dicts with filename, timestamp, size_bytes.
+
+        Snapshots in the chunk store are listed by name; legacy full-file
+        backups by file name.
+        """
         backups = []
-        if self._use_firebase and self._storage_bucket:
+        if self._bucket():
             try:
                 blobs = list(self._storage_bucket.list_blobs(prefix="backups/"))
                 for b in blobs:
-                    if b.name.endswith("/"):
+                    if b.name.endswith("/") or b.name.startswith("backups/chunks/"):
                         continue
+                    filename = os.path.basename(b.name)
+                    size = b.size or 0
+                    if b.name.startswith("backups/manifests/"):
+                        filename = os.path.splitext(filename)[0]
+                        size = self._remote_manifest(filename)["size"]
                     backups.append({
-                        "filename": os.path.basename(b.name),
+                        "filename": filename,
                         "timestamp": b.updated.strftime("%Y-%m-%d %H:%M:%S") if b.updated else "",
-                        "size_bytes": b.size or 0,
+                        "size_bytes": size,
                     })
                 return backups
             except Exception as e:
                 print(f"⚠️ Failed to list backups from storage: {e}")
 
-        # local backups
+        # local snapshots, then legacy full-file backups
         try:
+            for name in self.backup_store.manifests():
+                manifest = self.backup_store.load_manifest(name)
+                backups.append({
+                    "filename": name,
+                    "timestamp": manifest["created"],
+                    "size_bytes": manifest["size"],
+                })
             for fname in os.listdir(self.local_backups_dir):
                 path = os.path.join(self.local_backups_dir, fname)
                 if os.path.isfile(path):
@@ -137,60 +340,107 @@ class FirebaseManager:
 
         return backups
 
+    def _bucket(self):
+        """The storage bucket once initialization has finished, or None in local-backups mode."""
+        self.wait_ready()
+        return self._storage_bucket if self._use_firebase else None
+
+    def _remote_manifest(self, name: str) -> Dict[str, Any]:
+        blob = self._storage_bucket.blob(f"backups/manifests/{name}.json")
+        return json.loads(blob.download_as_bytes())
+
+    def _upload_snapshot(self, name: str) -> int:
+        """Upload the chunks storage lacks, then the manifest. Returns chunks uploaded."""
+        remote = {os.path.basename(b.name).split(".", 1)[0]
+                  for b in self._storage_bucket.list_blobs(prefix="backups/chunks/")}
+        uploaded = 0
+        for digest in sorted(set(self.backup_store.load_manifest(name)["chunks"]) - remote):
+            path = self.backup_store.find_chunk(digest)
+            self._storage_bucket.blob(f"backups/chunks/{os.path.basename(path)}").upload_from_filename(path)
+            uploaded += 1
+        # Manifest last, so a listed snapshot always has all its chunks
+        self._storage_bucket.blob(f"backups/manifests/{name}.json").upload_from_filename(
+            self.backup_store.manifest_path(name))
+        return uploaded
+
+    def upload_snapshot(self, name: str) -> bool:
+        """Upload a snapshot already in the local store. False in local-backups mode."""
+        if not self._bucket():
+            return False
+        try:
+            uploaded = self._upload_snapshot(name)
+            print(f"📦 Uploaded backup to storage: backups/manifests/{name}.json ({uploaded} new chunks)")
+            return True
+        except Exception as e:
+            print(f"⚠️ Failed to upload backup to storage: {e}")
+            return False
+
+    def _download_snapshot(self, name: str):
+        """Fetch a snapshot's manifest and any chunks missing from the local store."""
+        manifest_path = self.backup_store.manifest_path(name)
+        self._storage_bucket.blob(f"backups/manifests/{name}.json").download_to_filename(manifest_path)
+        for digest in self.backup_store.missing_chunks(name):
+            blobs = list(self._storage_bucket.list_blobs(prefix=f"backups/chunks/{digest}."))
+            if not blobs:
+                raise FileNotFoundError(f"Chunk {digest} is missing from storage")
+            path = self.backup_store.chunk_path(digest, blobs[0].name.rsplit(".", 1)[1])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            blobs[0].download_to_filename(path)
+
     def backup_database(self, db_path: str) -> bool:
-        """Upload or store a backup copy of the database file.
+        """Add a snapshot of the database to the backup store and upload it.
 
+        The copy is an online SQLite backup (BackupJob), so it is a
+        consistent snapshot even while punches are being written. Only
+        chunks that changed since earlier snapshots are stored or uploaded.
         Returns True on success.
         """
         if not os.path.exists(db_path):
             print(f"⚠️ Database path not found: {db_path}")
             return False
 
-        timestamp = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-        filename = f"backup_{timestamp}.db"
-
-        if self._use_firebase and self._storage_bucket:
-            try:
-                blob = self._storage_bucket.blob(f"backups/{filename}")
-                blob.upload_from_filename(db_path)
-                print(f"📦 Uploaded backup to storage: backups/{filename}")
-                return True
-            except Exception as e:
-                print(f"⚠️ Failed to upload backup to storage: {e}")
-
-        # fallback: copy file locally
         try:
-            dest = os.path.join(self.local_backups_dir, filename)
-            with open(db_path, "rb") as srcf, open(dest, "wb") as dstf:
-                dstf.write(srcf.read())
-            print(f"📦 Created local backup: {dest}")
-            return True
+            report = self.backup_store.snapshot(db_path)
         except Exception as e:
-            print(f"⚠️ Failed to create local backup: {e}")
+            print(f"⚠️ Failed to snapshot database for backup: {e}")
             return False
+        print(f"📦 Created local backup: {report.summary()}")
+
+        self.upload_snapshot(report.name)
+        return True
 
     def restore_database(self, backup_filename: str, local_temp_path: str) -> bool:
-        """Restore a backup to a local temp path. Returns True on success."""
-        if self._use_firebase and self._storage_bucket:
+        """Restore a backup to a local temp path. Returns True on success.
+
+        `backup_filename` is a snapshot name or a legacy full-file backup.
+        """
+        name = os.path.splitext(backup_filename)[0] if backup_filename.endswith(".json") else backup_filename
+        if self._bucket():
             try:
-                blob = self._storage_bucket.blob(f"backups/{backup_filename}")
-                blob.download_to_filename(local_temp_path)
+                if self._storage_bucket.blob(f"backups/manifests/{name}.json").exists():
+                    self._download_snapshot(name)
+                    self.backup_store.restore(name, local_temp_path)
+                else:
+                    blob = self._storage_bucket.blob(f"backups/{backup_filename}")
+                    blob.download_to_filename(local_temp_path)
                 print(f"⬇️ Downloaded backup from storage to {local_temp_path}")
                 return True
             except Exception as e:
                 print(f"⚠️ Failed to download backup from storage: {e}")
 
-        # fallback: copy from local backups dir
+        # fallback: local snapshot store, then legacy copies in the backups dir
         try:
+            if os.path.exists(self.backup_store.manifest_path(name)):
+                self.backup_store.restore(name, local_temp_path)
+                print(f"⬇️ Restored local backup to {local_temp_path}")
+                return True
             src = os.path.join(self.local_backups_dir, backup_filename)
             if not os.path.exists(src):
                 print(f"⚠️ Local backup not found: {src}")
                 return False
-            with open(src, "rb") as sf, open(local_temp_path, "wb") as df:
-                df.write(sf.read())
+            copy_file(src, local_temp_path)
             print(f"⬇️ Restored local backup to {local_temp_path}")
             return True
         except Exception as e:
             print(f"⚠️ Failed to restore local backup: {e}")
             return False
-
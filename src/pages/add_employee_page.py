@@ -2,10 +2,12 @@ import os
 import shutil
 import cv2
 import customtkinter as ctk
-from tkinter import messagebox
+from tkinter import filedialog, messagebox
 from PIL import Image, ImageTk
 import pickle
 
+from ..employee_import import EmployeeImporter
+
 
 class FaceEnrollmentWindow(ctk.CTkToplevel):
     """A Toplevel window that shows a live camera preview with capture/retake/save controls.
@@ -231,10 +233,10 @@ class FaceEnrollmentWindow(ctk.CTkToplevel):
             gray = None
         # Default thresholds
         try:
-            min_sharp = float(self.db.get_setting('enroll_min_sharpness', '100')) if self.db else 100.0
-            bmin = float(self.db.get_setting('enroll_brightness_min', '40')) if self.db else 40.0
-            bmax = float(self.db.get_setting('enroll_brightness_max', '220')) if self.db else 220.0
-            require_single = (self.db.get_setting('enroll_require_single_face', 'true') == 'true') if self.db else True
+            min_sharp = self.db.get_setting_float('enroll_min_sharpness', 100.0) if self.db else 100.0
+            bmin = self.db.get_setting_float('enroll_brightness_min', 40.0) if self.db else 40.0
+            bmax = self.db.get_setting_float('enroll_brightness_max', 220.0) if self.db else 220.0
+            require_single = self.db.get_setting_bool('enroll_require_single_face', True) if self.db else True
         except Exception:
             min_sharp, bmin, bmax, require_single = 100.0, 40.0, 220.0, True
 
@@ -485,6 +487,62 @@ class AddEmployeePage:
         )
         save_btn.pack(side="left")
 
+        import_btn = ctk.CTkButton(
+            fields_frame,
+            text="Import from CSV / Excel…",
+            command=self.import_employees,
+            fg_color="transparent",
+            text_color=self.colors['primary'],
+            border_width=1,
+            border_color=self.colors['primary'],
+            hover_color="#e8eaed",
+            width=220,
+            height=36,
+            corner_radius=5
+        )
+        import_btn.grid(row=7, column=0, sticky="w", pady=(20, 0))
+
+    def import_employees(self):
+        """Bulk import: validate the file with a dry run, confirm, then import."""
+        path = filedialog.askopenfilename(
+            title="Import employees",
+            filetypes=[("Spreadsheets", "*.csv *.xlsx"), ("CSV", "*.csv"), ("Excel", "*.xlsx")])
+        if not path:
+            return
+        importer = EmployeeImporter(self.db, face_mgr=self.face_mgr)
+        try:
+            preview = importer.run(path, dry_run=True)
+        except Exception as e:
+            messagebox.showerror("Import", f"Cannot read {os.path.basename(path)}: {e}")
+            return
+        message = preview.summary() + "." + self._format_import_errors(preview)
+        if not preview.inserted:
+            messagebox.showwarning("Import", message)
+            return
+        if not messagebox.askyesno("Import", message + "\n\nImport the valid rows now?"):
+            return
+        self.show_loading(f"Importing {preview.inserted} employees...")
+        self.parent.after(100, lambda: self._import_employees_action(importer, path))
+
+    def _import_employees_action(self, importer, path):
+        try:
+            report = importer.run(path)
+            self.hide_loading()
+            messagebox.showinfo("Import", report.summary() + "." + self._format_import_errors(report))
+            self.show_dashboard()
+        except Exception as e:
+            self.hide_loading()
+            messagebox.showerror("Import", f"Import failed, no employees were added: {e}")
+
+    @staticmethod
+    def _format_import_errors(report, limit=10):
+        if not report.errors:
+            return ""
+        lines = [f"Row {row}: {msg}" if row else msg for row, msg in report.errors[:limit]]
+        if len(report.errors) > limit:
+            lines.append(f"... and {len(report.errors) - limit} more")
+        return "\n\n" + "\n".join(lines)
+
     def save_employee(self):
         name = self.entry_name.get()
         email = self.entry_email.get()
@@ -517,8 +575,8 @@ class AddEmployeePage:
                             pass
                 else:
                     # If no temp image, and face is enabled, capture immediately
-                    if self.db.get_setting('face_enabled', 'false') == 'true':
-                        cam_idx = int(self.db.get_setting('camera_index', '0'))
+                    if self.db.get_setting_bool('face_enabled', False):
+                        cam_idx = self.db.get_setting_int('camera_index', 0)
                         self.face_mgr.enroll_face(employee_id=new_id, camera_index=cam_idx)
             except Exception:
                 pass
@@ -576,7 +634,7 @@ class AddEmployeePage:
     def enroll_face_for_new_employee(self):
         """Open the FaceEnrollmentWindow (Design 2) and cache the temp image + encoding for later save."""
         try:
-            cam_idx = int(self.db.get_setting('camera_index', '0'))
+            cam_idx = self.db.get_setting_int('camera_index', 0)
             win = FaceEnrollmentWindow(self.parent, self.face_mgr, camera_index=cam_idx, temp_dir=self.face_mgr.faces_dir, db=self.db)
             self.parent.wait_window(win)
             result = win.result
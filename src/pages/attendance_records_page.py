@@ -1,14 +1,24 @@
 import customtkinter as ctk
 from tkinter import messagebox, ttk, filedialog
 from datetime import datetime
-import csv
+
+from ..export_engine import CsvExportJob, XlsxExportJob
+from ..virtual_table import VirtualTable
 
 class AttendanceRecordsPage:
+    # Rows fetched per query block; more are loaded as the table scrolls
+    PAGE_SIZE = 200
+
     def __init__(self, parent, db, colors, fonts):
         self.parent = parent
         self.db = db
         self.colors = colors
         self.fonts = fonts
+        # Active query state: filters and initial sort column/direction
+        self._filters = {}
+        self._sort = "date"
+        self._descending = True
+        self._table = None
 
     def show(self):
         self.clear_parent()
@@ -137,9 +147,16 @@ class AttendanceRecordsPage:
         )
         emp_label.pack(side="left", padx=(0, 5))
 
-        # Get all employee names for the dropdown
-        all_employees = self.db.get_all_employees()
-        employee_names = ["All Employees"] + [emp[1] for emp in all_employees]
+        # Get all employee names for the dropdown; duplicate names get their id appended
+        all_employees = self.db.employee_directory.all()
+        name_counts = {}
+        for emp in all_employees:
+            name_counts[emp[1]] = name_counts.get(emp[1], 0) + 1
+        self._employee_ids = {}
+        for emp in all_employees:
+            label = emp[1] if name_counts[emp[1]] == 1 else f"{emp[1]} (#{emp[0]})"
+            self._employee_ids[label] = emp[0]
+        employee_names = ["All Employees"] + list(self._employee_ids.keys())
         employee_var = ctk.StringVar(value="All Employees")
 
         employee_dropdown = ctk.CTkOptionMenu(
@@ -200,52 +217,17 @@ class AttendanceRecordsPage:
                         messagebox.showerror("Invalid Date", "Please use YYYY-MM-DD format for end date")
                         return
 
-                # Clear current records
-                for item in tree.get_children():
-                    tree.delete(item)
-
-                # Get all records
-                records = self.db.get_attendance_records()
-
-                # Apply filters
-                filtered_records = []
-                for record in records:
-                    record_date = datetime.strptime(record[0], "%Y-%m-%d")
-
-                    # Date range filter
-                    if start_date and record_date < datetime.strptime(start_date, "%Y-%m-%d"):
-                        continue
-                    if end_date and record_date > datetime.strptime(end_date, "%Y-%m-%d"):
-                        continue
-
-                    # Employee filter
-                    if employee != "All Employees" and record[1] != employee:
-                        continue
-
-                    # Status filter
-                    if status != "All":
-                        arrival_time = record[2] if record[2] else ""
-                        if status == "Present" and not arrival_time:
-                            continue
-                        elif status == "Absent" and arrival_time:
-                            continue
-                        elif status == "Late" and arrival_time:
-                            # Consider "late" if arrival is after 9:00 AM
-                            try:
-                                arrival_dt = datetime.strptime(arrival_time, "%H:%M:%S")
-                                if arrival_dt.time() <= datetime.strptime("09:00:00", "%H:%M:%S").time():
-                                    continue
-                            except:
-                                continue
-
-                    filtered_records.append(record)
-
-                if not filtered_records:
-                    messagebox.showinfo("No Records", "No attendance records found matching the filters")
+                # Filtering, sorting and paging all happen in SQL (see Database.query_attendance)
+                self._filters = {
+                    'start_date': start_date or None,
+                    'end_date': end_date or None,
+                    'employee_id': self._employee_ids.get(employee),
+                    'status': None if status == "All" else status,
+                }
+                loaded = refresh_attendance_records()
 
-                # Display filtered records
-                for record in filtered_records:
-                    tree.insert("", "end", values=(record[0], record[1], record[2] or "", record[3] or ""))
+                if not loaded:
+                    messagebox.showinfo("No Records", "No attendance records found matching the filters")
 
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to apply filters: {str(e)}")
@@ -255,7 +237,8 @@ class AttendanceRecordsPage:
             to_date.delete(0, 'end')
             employee_var.set("All Employees")
             status_var.set("All")
-            refresh_attendance_records(tree)
+            self._filters = {}
+            refresh_attendance_records()
 
         # Filter and Clear buttons
         buttons_frame = ctk.CTkFrame(bottom_row, fg_color="transparent")
@@ -290,13 +273,8 @@ class AttendanceRecordsPage:
 
         def export_to_csv():
             try:
-                # Get currently displayed records (filtered or all)
-                records_to_export = []
-                for item in tree.get_children():
-                    values = tree.item(item)['values']
-                    records_to_export.append(values)
-
-                if not records_to_export:
+                # The table only holds the visible rows, so export from the query itself
+                if self._table is None or not self._table.total:
                     messagebox.showinfo("No Data", "No records to export")
                     return
 
@@ -312,13 +290,19 @@ class AttendanceRecordsPage:
                 if not file_path:  # User cancelled
                     return
 
-                # Write CSV file
-                with open(file_path, 'w', newline='') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(["Date", "Employee Name", "Arrival Time", "Departure Time"])
-                    writer.writerows(records_to_export)
-
-                messagebox.showinfo("Success", f"Records exported to {file_path}")
+                # Stream the filtered query to disk on a worker thread
+                sql, params = self.db.attendance_export_sql(
+                    sort=self._table.sort,
+                    descending=self._table.descending,
+                    **self._filters
+                )
+                job = CsvExportJob(
+                    self.db.db_name, sql, params, file_path,
+                    header=["Date", "Employee Name", "Arrival Time", "Departure Time"],
+                    total=self._table.total,
+                    attach=self.db.archives.attach_map(self._filters.get('start_date'), self._filters.get('end_date')),
+                )
+                self._show_export_progress(job.start())
 
             except Exception as e:
                 messagebox.showerror("Export Error", f"Failed to export records: {e}")
@@ -339,12 +323,74 @@ class AttendanceRecordsPage:
         )
         export_btn.pack(side="right", padx=20)
 
+        sheet_options = {"Sheet per month": "month", "Sheet per employee": "employee"}
+        sheet_var = ctk.StringVar(value="Sheet per month")
+
+        def export_to_excel():
+            try:
+                if self._table is None or not self._table.total:
+                    messagebox.showinfo("No Data", "No records to export")
+                    return
+
+                current_date = datetime.now().strftime("%Y%m%d")
+                file_path = filedialog.asksaveasfilename(
+                    defaultextension=".xlsx",
+                    initialfile=f"attendance_{current_date}.xlsx",
+                    filetypes=[("Excel workbook", "*.xlsx"), ("All files", "*.*")]
+                )
+                if not file_path:  # User cancelled
+                    return
+
+                # Per-employee monthly totals come from daily_summary; the status
+                # filter only applies to the detail sheets
+                summary_filters = {k: self._filters.get(k) for k in ('start_date', 'end_date', 'employee_id')}
+                summary_sql, summary_params = self.db.daily_summary_export_sql(**summary_filters)
+                sql, params = self.db.attendance_workbook_sql(group_by=sheet_options[sheet_var.get()], **self._filters)
+                job = XlsxExportJob(
+                    self.db.db_name, sql, params, file_path,
+                    header=["Date", "Employee Name", "Arrival Time", "Departure Time"],
+                    total=self._table.total,
+                    summary_sql=summary_sql,
+                    summary_params=summary_params,
+                    summary_header=["Employee Name", "Month", "Days Present", "Late Days", "Sessions", "Hours Worked"],
+                    attach=self.db.archives.attach_map(self._filters.get('start_date'), self._filters.get('end_date')),
+                )
+                self._show_export_progress(job.start())
+
+            except Exception as e:
+                messagebox.showerror("Export Error", f"Failed to export records: {e}")
+
+        excel_btn = ctk.CTkButton(
+            filter_frame,
+            text="Export Excel",
+            command=export_to_excel,
+            fg_color="transparent",
+            text_color=self.colors['primary'],
+            border_width=1,
+            border_color=self.colors['primary'],
+            hover_color="#e8eaed",
+            width=120,
+            height=36,
+            corner_radius=5
+        )
+        excel_btn.pack(side="right", padx=(20, 0))
+
+        sheet_menu = ctk.CTkOptionMenu(
+            filter_frame,
+            values=list(sheet_options.keys()),
+            variable=sheet_var,
+            width=170,
+            height=36
+        )
+        sheet_menu.pack(side="right", padx=(20, 0))
+
         # Records table
         records_frame = ctk.CTkFrame(self.current_frame, fg_color="white", corner_radius=10)
         records_frame.pack(fill="both", expand=True)
 
-        records = self.db.get_attendance_records()
-        if not records:
+        self._table = None
+        first_page, _ = self.db.query_attendance(limit=1)
+        if not first_page:
             empty_label = ctk.CTkLabel(
                 records_frame,
                 text="No attendance records yet.",
@@ -354,69 +400,83 @@ class AttendanceRecordsPage:
             empty_label.pack(pady=50)
             return
 
-        # Use ttk.Treeview for the table
-        columns = ("date", "name", "arrival", "departure")
-        tree = ttk.Treeview(records_frame, columns=columns, show="headings", style="Treeview")
+        # Virtualized table: only the visible rows live in the Treeview, the
+        # rest are fetched from SQL in blocks as the user scrolls
+        def fetch_rows(offset, limit, cursor, sort, descending):
+            return self.db.query_attendance(
+                sort=sort,
+                descending=descending,
+                cursor=cursor,
+                limit=limit,
+                offset=offset,
+                **self._filters
+            )
 
-        # Configure sorting
-        self.sort_states = {col: False for col in columns}  # False = ascending, True = descending
+        table = VirtualTable(
+            records_frame,
+            columns=[
+                ("date", "Date", 120),
+                ("name", "Employee Name", 220),
+                ("arrival", "Arrival", 120),
+                ("departure", "Departure", 120),
+            ],
+            fetch=fetch_rows,
+            count=lambda: self.db.count_attendance(**self._filters),
+            anchors=lambda every, sort, descending: self.db.attendance_anchors(
+                every, sort=sort, descending=descending, **self._filters),
+            row_values=lambda r: (r['date'], r['name'], r['arrival_time'] or "", r['departure_time'] or ""),
+            row_id=lambda r: r['id'],
+            sort=self._sort,
+            descending=self._descending,
+            block_size=self.PAGE_SIZE,
+        )
+        table.pack(expand=True, fill="both", padx=20, pady=20)
+        self._table = table
 
-        def sort_column(col):
-            # Get all items
-            items = [(tree.set(item, col), item) for item in tree.get_children("")]
+        def refresh_attendance_records():
+            return table.reload()
 
-            # Determine sort method based on column
-            if col == "date":
-                # Sort dates
-                items.sort(key=lambda x: (x[0] is None or x[0] == "", x[0]), reverse=self.sort_states[col])
-            elif col in ["arrival", "departure"]:
-                # Sort times, handling empty values
-                items.sort(key=lambda x: (x[0] is None or x[0] == "", x[0]), reverse=self.sort_states[col])
+        # Initial load
+        refresh_attendance_records()
+
+    def _show_export_progress(self, job):
+        """Show a progress dialog for a running ExportJob, with a Cancel button."""
+        top = ctk.CTkToplevel(self.parent)
+        top.title("Exporting")
+        top.geometry("360x150")
+        top.resizable(False, False)
+
+        status_label = ctk.CTkLabel(top, text="Starting export...", font=self.fonts['text'],
+                                    text_color=self.colors['text'])
+        status_label.pack(padx=20, pady=(20, 10))
+        progress = ctk.CTkProgressBar(top, width=300)
+        progress.set(0)
+        progress.pack(padx=20, pady=5)
+        cancel_btn = ctk.CTkButton(top, text="Cancel", command=job.cancel, width=100)
+        cancel_btn.pack(pady=10)
+        # Closing the window cancels the export as well
+        top.protocol("WM_DELETE_WINDOW", job.cancel)
+
+        def poll():
+            if not job.done:
+                if job.progress is not None:
+                    progress.set(job.progress)
+                status_label.configure(text=f"Exported {job.rows_written:,} of {job.total or 0:,} rows")
+                top.after(100, poll)
+                return
+            try:
+                top.destroy()
+            except Exception:
+                pass
+            if job.cancelled:
+                messagebox.showinfo("Export Cancelled", "The export was cancelled")
+            elif job.error is not None:
+                messagebox.showerror("Export Error", f"Failed to export records: {job.error}")
             else:
-                # Regular string sort
-                items.sort(key=lambda x: str(x[0] or '').lower(), reverse=self.sort_states[col])
-
-            # Rearrange items
-            for idx, (_, item) in enumerate(items):
-                tree.move(item, "", idx)
-
-            # Toggle sort state
-            self.sort_states[col] = not self.sort_states[col]
-
-            # Update column headers to show sort direction
-            for c in columns:
-                if c == col:
-                    direction = "↓" if self.sort_states[c] else "↑"
-                    tree.heading(c, text=f"{c.title()} {direction}", command=lambda _c=c: sort_column(_c))
-                else:
-                    tree.heading(c, text=c.title(), command=lambda _c=c: sort_column(_c))
-
-        # Set up column headings with sort functionality
-        tree.heading("date", text="Date", command=lambda: sort_column("date"))
-        tree.heading("name", text="Employee Name", command=lambda: sort_column("name"))
-        tree.heading("arrival", text="Arrival", command=lambda: sort_column("arrival"))
-        tree.heading("departure", text="Departure", command=lambda: sort_column("departure"))
-
-        tree.column("date", width=120, minwidth=100)
-        tree.column("name", width=220, minwidth=150)
-        tree.column("arrival", width=120, minwidth=100)
-        tree.column("departure", width=120, minwidth=100)
-
-        # Add a scrollbar
-        scrollbar = ttk.Scrollbar(records_frame, orient="vertical", command=tree.yview)
-        tree.configure(yscrollcommand=scrollbar.set)
-        scrollbar.pack(side="right", fill="y")
-        tree.pack(expand=True, fill="both", padx=20, pady=20)
-
-        def refresh_attendance_records(tree):
-            for item in tree.get_children():
-                tree.delete(item)
-            records = self.db.get_attendance_records()
-            for record in records:
-                tree.insert("", "end", values=(record[0], record[1], record[2] or "", record[3] or ""))
+                messagebox.showinfo("Success", f"{job.rows_written:,} records exported to {job.path}")
 
-        # Initial load
-        refresh_attendance_records(tree)
+        poll()
+        return top
 
     def create_page_header(self, title, subtitle=None):
         """Create a consistent page header with title and optional subtitle"""
@@ -1,19 +1,38 @@
 import customtkinter as ctk
 import tkinter.ttk as ttk
+import time
+from collections import OrderedDict, deque
 from datetime import datetime
 
+from ..event_bus import EMPLOYEES_CHANGED, PUNCH
+
 class DashboardPage:
+    # How many recent sessions the activity list shows
+    RECENT_LIMIT = 5
+
     def __init__(self, parent, db, colors, fonts):
         self.parent = parent
         self.db = db
         self.colors = colors
         self.fonts = fonts
+        # Events published from any thread; applied from the Tk loop in _tick
+        self._pending = deque()
+        self._unsubscribe = []
+        self._tick_id = None
+        self._stat_labels = {}
+        self._present_ids = set()
+        self._stats = {"total": 0, "present": 0, "absent": 0}
+        self._activity_rows = OrderedDict()  # attendance id -> (frame, name_label, time_label), newest first
+        self._day = None
+        self._last_reconcile = 0.0
 
     def show(self):
         self.clear_parent()
         # Make dashboard scrollable so sections remain reachable on small windows
         self.current_frame = ctk.CTkScrollableFrame(self.parent, fg_color="transparent")
         self.current_frame.pack(expand=True, fill="both", padx=20, pady=20)
+        # Stop the tick loop and drop subscriptions when another page clears us
+        self.current_frame.bind("<Destroy>", self._on_destroy, add="+")
 
         self.create_page_header("Dashboard", "Welcome to GDC Attendance System")
 
@@ -27,30 +46,15 @@ class DashboardPage:
             text_color="#757575"
         )
         self.dashboard_clock_label.pack(anchor="e")
-        try:
-            self._update_dashboard_clock()
-        except Exception:
-            pass
 
-        # Stats cards row
+        # Stats cards row; values are filled in by _reconcile and punch events
         stats_frame = ctk.CTkFrame(self.current_frame, fg_color="transparent")
         stats_frame.pack(fill="x", pady=20)
-
-        # Employee count card
-        count = len(self.db.get_all_employees())
-        self.create_stat_card(stats_frame, "Total Employees", count, "👥", self.colors['primary'], 0)
-
-        # Today's attendance card (filtered for today)
-        try:
-            today_count = int(self.db.get_today_attendance_count())
-        except Exception:
-            today_count = 0
-        self.create_stat_card(stats_frame, "Today's Attendance", today_count, "📊", self.colors['success'], 1)
-
-        # Absent employees card
-        # This is a placeholder - you would need to implement the actual count
-        absent_count = count - today_count if count > today_count else 0
-        self.create_stat_card(stats_frame, "Absent Today", absent_count, "❗", self.colors['error'], 2)
+        self._stat_labels = {
+            "total": self.create_stat_card(stats_frame, "Total Employees", 0, "👥", self.colors['primary'], 0),
+            "present": self.create_stat_card(stats_frame, "Today's Attendance", 0, "📊", self.colors['success'], 1),
+            "absent": self.create_stat_card(stats_frame, "Absent Today", 0, "❗", self.colors['error'], 2),
+        }
 
         # Recent activity section
         activity_frame = ctk.CTkFrame(self.current_frame, fg_color="white", corner_radius=10)
@@ -63,60 +67,161 @@ class DashboardPage:
             text_color=self.colors['text']
         )
         activity_header.pack(anchor="w", padx=20, pady=15)
+        self.activity_frame = activity_frame
 
-        # Recent attendance records
+        self.empty_label = ctk.CTkLabel(
+            activity_frame,
+            text="No recent activity to display",
+            font=self.fonts['text'],
+            text_color="#757575"
+        )
+
+        self._reconcile()
+        self._unsubscribe = [
+            self.db.event_bus.subscribe(PUNCH, self._pending.append),
+            self.db.event_bus.subscribe(EMPLOYEES_CHANGED, self._pending.append),
+        ]
+        self._tick()
+
+    # --- live updates ---
+    def _tick(self):
+        """Once a second: update the clock, apply queued events, reconcile when due."""
+        self._tick_id = None
+        try:
+            now = datetime.now()
+            self.dashboard_clock_label.configure(text=now.strftime('%Y-%m-%d  %H:%M:%S'))
+            interval = max(5, self.db.get_setting_int('dashboard_reconcile_secs', 60))
+            if now.strftime("%Y-%m-%d") != self._day or time.monotonic() - self._last_reconcile >= interval:
+                # Reconciling re-reads everything, so queued events are already included
+                self._pending.clear()
+                self._reconcile()
+            else:
+                while self._pending:
+                    self._apply_event(self._pending.popleft())
+        except Exception as e:
+            print(f"⚠️ Dashboard refresh failed: {e}")
         try:
-            records = self.db.get_today_attendance_records()
+            self._tick_id = self.parent.after(1000, self._tick)
+        except Exception:
+            pass
+
+    def _apply_event(self, event):
+        """Apply one punch or employee change with O(1) widget updates."""
+        if 'action' not in event:
+            # Employee added or edited: only the headcount can change
+            self._stats["total"] = self.db.employee_directory.count()
+        else:
+            if event.get('date') != self._day:
+                return
+            if event['action'] == "arrival" and event['employee_id'] not in self._present_ids:
+                self._present_ids.add(event['employee_id'])
+                self._stats["present"] += 1
+            record = self.db.get_attendance_entry(event['id'])
+            if record is not None:
+                self._show_activity(record, newest=True)
+        self._stats["absent"] = max(0, self._stats["total"] - self._stats["present"])
+        self._render_stats()
+
+    def _reconcile(self):
+        """Re-read today's numbers and activity from daily_summary / attendance."""
+        self._day = datetime.now().strftime("%Y-%m-%d")
+        self._last_reconcile = time.monotonic()
+        try:
+            self._stats = self.db.get_day_stats(self._day)
+            self._present_ids = self.db.get_present_employee_ids(self._day)
+        except Exception:
+            self._stats = {"total": self.db.employee_directory.count(), "present": 0, "absent": 0}
+            self._present_ids = set()
+        self._render_stats()
+
+        try:
+            records = self.db.get_recent_activity(self.RECENT_LIMIT, self._day)
         except Exception:
             records = []
-        if not records:
-            empty_label = ctk.CTkLabel(
-                activity_frame,
-                text="No recent activity to display",
-                font=self.fonts['text'],
+        ids = [r['id'] for r in records]
+        if ids != list(self._activity_rows.keys()):
+            for frame, *_ in self._activity_rows.values():
+                frame.destroy()
+            self._activity_rows.clear()
+            for record in records:
+                self._show_activity(record, newest=False)
+        else:
+            for record in records:
+                self._show_activity(record, newest=False)
+        if self._activity_rows:
+            self.empty_label.pack_forget()
+        else:
+            self.empty_label.pack(pady=30)
+
+    def _render_stats(self):
+        for key, label in self._stat_labels.items():
+            text = str(self._stats.get(key, 0))
+            if label.cget("text") != text:
+                label.configure(text=text)
+
+    def _show_activity(self, record, newest):
+        """Add or update the row for an attendance session; newest rows go on top."""
+        times = []
+        if record['arrival_time']:
+            times.append(f"Arrived {record['arrival_time']}")
+        if record['departure_time']:
+            times.append(f"Left {record['departure_time']}")
+        time_text = ",  ".join(times) if times else "No timestamps"
+        name_text = f"{record['name']} — {record['date']}"
+
+        row = self._activity_rows.get(record['id'])
+        if row is None:
+            record_frame = ctk.CTkFrame(self.activity_frame, fg_color="#f8f9fa", corner_radius=5)
+            name_label = ctk.CTkLabel(
+                record_frame,
+                text=name_text,
+                font=("Segoe UI", 14, "bold"),
+                text_color=self.colors['text']
+            )
+            name_label.pack(side="left", padx=15, pady=10)
+            time_label = ctk.CTkLabel(
+                record_frame,
+                text=time_text,
+                font=("Segoe UI", 12),
                 text_color="#757575"
             )
-            empty_label.pack(pady=30)
+            time_label.pack(side="right", padx=15, pady=10)
+            row = (record_frame, name_label, time_label)
+            self._activity_rows[record['id']] = row
         else:
-            # Show only the 5 most recent records
-            recent_records = records[-5:] if len(records) > 5 else records
+            record_frame, name_label, time_label = row
+            if time_label.cget("text") != time_text:
+                time_label.configure(text=time_text)
+            if name_label.cget("text") != name_text:
+                name_label.configure(text=name_text)
 
-            for record in recent_records:
-                record_frame = ctk.CTkFrame(activity_frame, fg_color="#f8f9fa", corner_radius=5)
+        if newest:
+            self._activity_rows.move_to_end(record['id'], last=False)
+            others = [f for f, *_ in self._activity_rows.values() if f is not record_frame and f.winfo_manager()]
+            if others:
+                record_frame.pack(fill="x", padx=20, pady=5, before=others[0])
+            else:
                 record_frame.pack(fill="x", padx=20, pady=5)
+            self.empty_label.pack_forget()
+            while len(self._activity_rows) > self.RECENT_LIMIT:
+                _, (old_frame, *_) = self._activity_rows.popitem(last=True)
+                old_frame.destroy()
+        elif not record_frame.winfo_manager():
+            record_frame.pack(fill="x", padx=20, pady=5)
 
-                name_label = ctk.CTkLabel(
-                    record_frame,
-                    text=f"{record['name']} — {record['date']}",
-                    font=("Segoe UI", 14, "bold"),
-                    text_color=self.colors['text']
-                )
-                name_label.pack(side="left", padx=15, pady=10)
-
-                times = []
-                if record['arrival_time']:
-                    times.append(f"Arrived {record['arrival_time']}")
-                if record['departure_time']:
-                    times.append(f"Left {record['departure_time']}")
-                time_text = ",  ".join(times) if times else "No timestamps"
-                time_label = ctk.CTkLabel(
-                    record_frame,
-                    text=time_text,
-                    font=("Segoe UI", 12),
-                    text_color="#757575"
-                )
-                time_label.pack(side="right", padx=15, pady=10)
-
-    def _update_dashboard_clock(self):
-        try:
-            now = datetime.now().strftime('%Y-%m-%d  %H:%M:%S')
-            if hasattr(self, 'dashboard_clock_label'):
-                self.dashboard_clock_label.configure(text=now)
-            # schedule next update
-            if hasattr(self, 'parent'):
-                self.parent.after(1000, self._update_dashboard_clock)
-        except Exception:
-            pass
+    def _on_destroy(self, event):
+        if str(event.widget) != str(self.current_frame):
+            return
+        for unsubscribe in self._unsubscribe:
+            unsubscribe()
+        self._unsubscribe = []
+        self._pending.clear()
+        if self._tick_id is not None:
+            try:
+                self.parent.after_cancel(self._tick_id)
+            except Exception:
+                pass
+            self._tick_id = None
 
     def create_stat_card(self, parent, title, value, icon, color, position):
         """Create a dashboard stat card"""
@@ -157,6 +262,7 @@ class DashboardPage:
             text_color="#757575"
         )
         title_label.place(x=20, y=80)
+        return value_label
 
     def create_page_header(self, title, subtitle=None):
         """Create a consistent page header with title and optional subtitle"""
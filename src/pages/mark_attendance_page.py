@@ -75,11 +75,8 @@ class MarkAttendancePage:
         self._pending_mark = False
         self._last_verify_ts = 0.0
         # Performance config from settings
-        try:
-            fps = int(self.db.get_setting('face_preview_fps', '15'))
-            rate_hz = int(self.db.get_setting('face_verify_rate_hz', '3'))
-        except Exception:
-            fps, rate_hz = 15, 3
+        fps = self.db.get_setting_int('face_preview_fps', 15)
+        rate_hz = self.db.get_setting_int('face_verify_rate_hz', 3)
         fps = max(5, min(60, fps))
         rate_hz = max(1, min(15, rate_hz))
         self._preview_interval_ms = int(1000 / fps)
@@ -156,10 +153,7 @@ class MarkAttendancePage:
                 # Prepare overlay text
                 emp_name = None
                 try:
-                    for emp in self.db.get_all_employees():
-                        if int(emp[0]) == int(emp_id):
-                            emp_name = emp[1]
-                            break
+                    emp_name = self.db.employee_directory.get_name(emp_id)
                 except Exception:
                     pass
 
@@ -212,13 +206,10 @@ class MarkAttendancePage:
 
     def _on_recognition_confirm(self, employee_id: int):
         # Optionally confirm before marking
-        confirm = self.db.get_setting('face_confirm_before_mark', 'false') == 'true'
+        confirm = self.db.get_setting_bool('face_confirm_before_mark', False)
         emp_name = None
         try:
-            for emp in self.db.get_all_employees():
-                if int(emp[0]) == int(employee_id):
-                    emp_name = emp[1]
-                    break
+            emp_name = self.db.employee_directory.get_name(employee_id)
         except Exception:
             pass
 
@@ -233,14 +224,11 @@ class MarkAttendancePage:
         except Exception:
             pass
         if proceed:
-            self._mark_by_employee_id(employee_id)
+            self._mark_by_employee_id(employee_id, source='face')
         else:
             # Reset and resume preview
             self._pending_mark = False
-            try:
-                cam_idx = int(self.db.get_setting('camera_index', '0'))
-            except Exception:
-                cam_idx = 0
+            cam_idx = self.db.get_setting_int('camera_index', 0)
             self._start_live_preview(cam_idx)
 
     # ------------------------------------------------------------
@@ -252,6 +240,7 @@ class MarkAttendancePage:
         employee_id = None
         fingerprint_id = None
         scanner_error = None
+        source = 'manual'
 
         # ------------------ Fingerprint Mode ------------------
         attendance_mode = self._get_auth_mode(raw=True)
@@ -267,21 +256,21 @@ class MarkAttendancePage:
                         scanner.disconnect()
                         if ok and position is not None:
                             fingerprint_id = str(position)
-                            for emp in self.db.get_all_employees():
-                                if emp[3] and str(emp[3]) == fingerprint_id:
-                                    employee_id = emp[0]
-                                    break
+                            emp = self.db.employee_directory.by_fingerprint(fingerprint_id)
+                            if emp:
+                                employee_id = emp['id']
+                                source = 'fingerprint'
                     else:
                         scanner_error = "Scanner not reachable on selected port"
         except Exception as e:
             scanner_error = str(e)
 
         # ------------------ Facial Recognition ------------------
-        face_enabled = self.db.get_setting('face_enabled', 'false') == 'true'
+        face_enabled = self.db.get_setting_bool('face_enabled', False)
         allow_face = (attendance_mode == 'face') and face_enabled
 
         if employee_id is None and (mode == "Face" or mode == 'face') and allow_face:
-            cam_idx = int(self.db.get_setting('camera_index', '0'))
+            cam_idx = self.db.get_setting_int('camera_index', 0)
             # Start embedded live preview; attendance marks when a face recognizes
             self._start_live_preview(cam_idx)
             return
@@ -290,10 +279,9 @@ class MarkAttendancePage:
         if employee_id is None and (mode == "Manual" or mode == 'manual'):
             manual = self.entry_fingerprint_scan.get().strip()
             if manual:
-                for emp in self.db.get_all_employees():
-                    if emp[3] and str(emp[3]) == manual:
-                        employee_id = emp[0]
-                        break
+                emp = self.db.employee_directory.by_fingerprint(manual)
+                if emp:
+                    employee_id = emp['id']
 
         # ------------------ No Match ------------------
         if employee_id is None:
@@ -308,7 +296,7 @@ class MarkAttendancePage:
         self.entry_fingerprint_scan.delete(0, 'end')
         self.show_loading("Marking attendance…")
 
-        self.parent.after(100, lambda: self._mark_by_employee_id(employee_id))
+        self.parent.after(100, lambda: self._mark_by_employee_id(employee_id, source=source))
 
     # ------------------------------------------------------------
     # RENDERERS FOR AUTH MODES
@@ -330,10 +318,7 @@ class MarkAttendancePage:
             self.preview_label.pack(pady=(10, 10))
 
         # Start camera automatically
-        try:
-            cam_idx = int(self.db.get_setting('camera_index', '0'))
-        except Exception:
-            cam_idx = 0
+        cam_idx = self.db.get_setting_int('camera_index', 0)
         self._start_live_preview(cam_idx)
 
         # Optional controls
@@ -384,26 +369,21 @@ class MarkAttendancePage:
     # ------------------------------------------------------------
     # SAVE ATTENDANCE
     # ------------------------------------------------------------
-    def _mark_by_employee_id(self, employee_id: int):
+    def _mark_by_employee_id(self, employee_id: int, source: str = 'manual'):
         try:
-            employees = self.db.get_all_employees()
-            match = next((emp for emp in employees if int(emp[0]) == int(employee_id)), None)
+            match = self.db.employee_directory.get(employee_id)
             if not match:
                 self.hide_loading()
                 messagebox.showerror("Error", "Employee not found")
                 return
 
             emp_id, name, email = match[0], match[1], match[2]
-            result = self.db.mark_arrival_or_departure(emp_id)
+            result = self.db.mark_arrival_or_departure(emp_id, source=source)
             date = result.get('date')
             time = result.get('time')
             action = result.get('action')
 
-            if self.firebase:
-                try:
-                    self.firebase.upload_attendance({"name": name, "status": action, "timestamp": f"{date} {time}"})
-                except:
-                    pass
+            # The punch queued its cloud upload in its own transaction (see FirebaseManager.attach_database)
 
             self.hide_loading()
             
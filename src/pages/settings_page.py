@@ -4,7 +4,9 @@ from typing import Optional, Any
 from datetime import datetime
 import os
 import importlib.util
+from ..backup_store import BackupStore
 from ..company_manager import CompanyManager
+from ..state_journal import StateJournal
 from .dashboard_page import DashboardPage
 
 class SettingsPage:
@@ -29,10 +31,10 @@ class SettingsPage:
         content.pack(fill="both", expand=True, padx=20, pady=20)
 
         # Read current settings from DB
-        auto_on_logout = int(self.db.get_setting('auto_save_on_logout', '1'))
+        auto_on_logout = self.db.get_setting_int('auto_save_on_logout', 1)
         # Use a more conservative default autosave interval to reduce churn
-        auto_interval = int(self.db.get_setting('auto_save_interval', '300'))
-        confirm_logout = int(self.db.get_setting('confirm_logout', '1'))
+        auto_interval = self.db.get_setting_int('auto_save_interval', 300)
+        confirm_logout = self.db.get_setting_int('confirm_logout', 1)
         logout_message = self.db.get_setting('logout_message', 'Are you sure you want to logout?')
 
         # Controls
@@ -54,7 +56,7 @@ class SettingsPage:
         interval_entry.grid(row=3, column=0, sticky="w", pady=4)
 
         # Autosave retention (number of files to keep)
-        retention = int(self.db.get_setting('autosave_retention', '50'))
+        retention = self.db.get_setting_int('autosave_retention', 50)
         retention_label = ctk.CTkLabel(controls, text="Auto-save retention (files):")
         retention_label.grid(row=4, column=0, sticky="w", pady=(12, 2))
         self.retention_var = ctk.StringVar(value=str(retention))
@@ -78,6 +80,13 @@ class SettingsPage:
         )
         theme_menu.pack(side="left")
 
+        # Attendance 'Late' cutoff used by the records filters
+        late_frame = ctk.CTkFrame(controls, fg_color="transparent")
+        late_frame.grid(row=7, column=0, sticky="w", pady=(20, 0))
+        ctk.CTkLabel(late_frame, text="Late after (HH:MM:SS):", anchor="w").pack(side="left", padx=(0, 10))
+        self.late_cutoff_var = ctk.StringVar(value=self.db.get_setting('late_cutoff', '09:00:00'))
+        ctk.CTkEntry(late_frame, textvariable=self.late_cutoff_var, width=120).pack(side="left")
+
         # Fingerprint Scanner Settings
         scanner_frame = ctk.CTkFrame(controls, fg_color="transparent")
         scanner_frame.grid(row=8, column=0, sticky="w", pady=(20, 0))
@@ -301,6 +310,28 @@ class SettingsPage:
         )
         restore_btn.pack(side="left")
 
+        archive_btn = ctk.CTkButton(
+            backup_frame,
+            text="Archive Old Years",
+            command=self._archive_old_years,
+            width=160
+        )
+        archive_btn.pack(side="left", padx=(10, 0))
+
+        # Scheduled snapshots into backups/store; unchanged databases are skipped
+        sched_frame = ctk.CTkFrame(controls, fg_color="transparent")
+        sched_frame.grid(row=14, column=1, sticky="w", pady=(20, 0), padx=(20, 0))
+        ctk.CTkLabel(sched_frame, text="Scheduled backup every (min, 0 = off):").pack(side="left", padx=(0, 10))
+        self.backup_interval_var = ctk.StringVar(value=str(self.db.get_setting_int('backup_interval', 3600) // 60))
+        ctk.CTkEntry(sched_frame, textvariable=self.backup_interval_var, width=80).pack(side="left")
+        scheduler = self.db.backup_scheduler
+        if scheduler is not None:
+            ctk.CTkLabel(
+                sched_frame,
+                text=f"{scheduler.taken} taken, {scheduler.skipped} skipped (unchanged)",
+                text_color=self.colors['text']
+            ).pack(side="left", padx=(10, 0))
+
         # Company Management section
         company_frame = ctk.CTkFrame(controls, fg_color="transparent")
         company_frame.grid(row=15, column=0, sticky="w", pady=(20, 0))
@@ -371,6 +402,13 @@ class SettingsPage:
             self.db.set_setting('auto_save_interval', int(self.interval_var.get()))
             self.db.set_setting('autosave_retention', int(self.retention_var.get()))
 
+            # Late cutoff (validated; keep previous value if malformed)
+            try:
+                late_cutoff = datetime.strptime(self.late_cutoff_var.get().strip(), "%H:%M:%S").strftime("%H:%M:%S")
+                self.db.set_setting('late_cutoff', late_cutoff)
+            except ValueError:
+                messagebox.showwarning("Settings", "Late cutoff must use HH:MM:SS; keeping the previous value")
+
             # Scanner and printer
             self.db.set_setting('fingerprint_port', self.scanner_var.get())
             self.db.set_setting('preferred_printer', self.printer_var.get())
@@ -420,6 +458,20 @@ class SettingsPage:
             if hasattr(self, 'email_var'):
                 self.db.set_setting('email_enabled', self.email_var.get())
 
+            # Scheduled backups (stored in seconds; 0 turns them off). A changed
+            # interval restarts the scheduler, which checks at once and then waits
+            # the new interval instead of finishing its current wait.
+            try:
+                backup_minutes = max(0, int(str(self.backup_interval_var.get()).strip()))
+            except ValueError:
+                backup_minutes = self.db.get_setting_int('backup_interval', 3600) // 60
+            previous = self.db.get_setting_int('backup_interval', 3600)
+            self.db.set_setting('backup_interval', backup_minutes * 60)
+            if backup_minutes * 60 != previous or (self.db.backup_scheduler is None) != (backup_minutes == 0):
+                self.db.stop_backup_scheduler()
+                if backup_minutes:
+                    self.db.start_backup_scheduler()
+
             # Apply autosave interval immediately
             try:
                 self.stop_autosave_timer()
@@ -463,25 +515,70 @@ class SettingsPage:
             )
             if not target:
                 return
-            ok = self.db.backup_to(target)
-            if ok:
-                messagebox.showinfo("Backup Complete", f"Database backed up to:\n{target}")
-            else:
-                messagebox.showerror("Backup Failed", "Could not create database backup.")
+            # Copy in small steps on a worker thread so punches keep flowing
+            self._show_backup_progress(self.db.backup_job(target).start())
         except Exception as e:
             messagebox.showerror("Backup Failed", str(e))
 
+    def _show_backup_progress(self, job):
+        """Show a progress dialog for a running BackupJob, with a Cancel button."""
+        top = ctk.CTkToplevel(self.parent)
+        top.title("Backing Up")
+        top.geometry("360x150")
+        top.resizable(False, False)
+
+        status_label = ctk.CTkLabel(top, text="Starting backup...")
+        status_label.pack(padx=20, pady=(20, 10))
+        progress = ctk.CTkProgressBar(top, width=300)
+        progress.set(0)
+        progress.pack(padx=20, pady=5)
+        cancel_btn = ctk.CTkButton(top, text="Cancel", command=job.cancel, width=100)
+        cancel_btn.pack(pady=10)
+        # Closing the window cancels the backup as well
+        top.protocol("WM_DELETE_WINDOW", job.cancel)
+
+        def poll():
+            if not job.done:
+                if job.progress is not None:
+                    progress.set(job.progress)
+                    copied = job.pages_total - job.pages_remaining
+                    status_label.configure(text=f"Copied {copied:,} of {job.pages_total:,} pages")
+                top.after(100, poll)
+                return
+            try:
+                top.destroy()
+            except Exception:
+                pass
+            if job.cancelled:
+                messagebox.showinfo("Backup Cancelled", "The backup was cancelled.")
+            elif job.error is not None:
+                messagebox.showerror("Backup Failed", f"Could not create database backup: {job.error}")
+            else:
+                messagebox.showinfo("Backup Complete", f"Database backed up to:\n{job.path}")
+
+        poll()
+        return top
+
     def _restore_database(self):
         """Restore database from a backup file selected by the user."""
         try:
             source = filedialog.askopenfilename(
                 title="Select Database Backup",
                 initialdir=os.path.join(os.getcwd(), 'backups'),
-                filetypes=[("SQLite DB", "*.db"), ("All Files", "*.*")]
+                filetypes=[("SQLite DB", "*.db"), ("Backup snapshot", "*.json"), ("All Files", "*.*")]
             )
             if not source:
                 return
-            ok = self.db.restore_from(source)
+            if source.endswith(".json"):
+                # Snapshot manifest from the chunk store: rebuild the file first
+                store, name = BackupStore.for_manifest(source)
+                rebuilt = store.restore(name, os.path.join(store.root, f"{name}.restore"))
+                try:
+                    ok = self.db.restore_from(rebuilt)
+                finally:
+                    os.remove(rebuilt)
+            else:
+                ok = self.db.restore_from(source)
             if ok:
                 messagebox.showinfo("Restore Complete", "Database restore finished. Please restart the app.")
             else:
@@ -489,6 +586,25 @@ class SettingsPage:
         except Exception as e:
             messagebox.showerror("Restore Failed", str(e))
 
+    def _archive_old_years(self):
+        """Move closed years of attendance into attendance_<year>.db archives."""
+        try:
+            years = self.db.archives.closed_years()
+            if not years:
+                messagebox.showinfo("Archive", "There are no closed years to archive.")
+                return
+            listed = ", ".join(str(y) for y in years)
+            if not messagebox.askyesno(
+                    "Archive",
+                    f"Move attendance for {listed} into yearly archive files?\n\n"
+                    "Reports still include archived years."):
+                return
+            moved = self.db.archives.archive_closed_years()
+            total = sum(moved.values())
+            messagebox.showinfo("Archive Complete", f"Archived {total} attendance records from {listed}.")
+        except Exception as e:
+            messagebox.showerror("Archive Failed", str(e))
+
     def change_theme_mode(self, mode):
         """Change the application theme mode."""
         ctk.set_appearance_mode(str(mode).lower())
@@ -517,7 +633,7 @@ class SettingsPage:
     def _open_camera_test(self):
         """Open a simple camera test window with live preview, FPS, and face count."""
         try:
-            cam_idx = int(self.cam_var.get()) if hasattr(self, 'cam_var') else int(self.db.get_setting('camera_index', '0'))
+            cam_idx = int(self.cam_var.get()) if hasattr(self, 'cam_var') else self.db.get_setting_int('camera_index', 0)
         except Exception:
             cam_idx = 0
 
@@ -688,39 +804,33 @@ class SettingsPage:
 
     def collect_state(self):
         """Collect a lightweight snapshot of current UI state (forms) to persist."""
+        # No timestamp here: the journal stamps entries and skips unchanged state
         state = {
-            'timestamp': datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"),
             'last_page': 'settings'
         }
         # Settings page has no form fields to collect
         return state
 
+    def _get_state_journal(self):
+        """Open the autosave journal, folding in legacy state_<ts>.json files once."""
+        retention = self.db.get_setting_int('autosave_retention', 50)
+        journal = getattr(self, '_state_journal', None)
+        if journal is None:
+            backups_dir = os.path.join(os.getcwd(), 'backups')
+            journal = StateJournal(os.path.join(backups_dir, 'autosave.jsonl'), retention)
+            migrated = journal.import_legacy(backups_dir)
+            if migrated:
+                print(f"📦 Moved {migrated} legacy autosave files into {journal.path}")
+            self._state_journal = journal
+        journal.retention = max(1, retention)
+        return journal
+
     def save_state(self):
-        """Persist the collected state to a local backup JSON file."""
+        """Append the collected state to the autosave journal if it changed."""
         try:
-            state = self.collect_state()
-            backups_dir = os.path.join(os.getcwd(), 'backups')
-            os.makedirs(backups_dir, exist_ok=True)
-            fname = f"state_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
-            path = os.path.join(backups_dir, fname)
-            import json
-            with open(path, 'w', encoding='utf-8') as f:
-                json.dump(state, f, indent=2)
-            print(f"📦 Auto-saved state to {path}")
-
-            # Retention: prune old autosave files beyond configured limit
-            try:
-                max_files = int(self.db.get_setting('autosave_retention', '50'))
-                entries = [fn for fn in os.listdir(backups_dir) if fn.startswith('state_') and fn.endswith('.json')]
-                entries.sort(reverse=True)  # newest first by name timestamp
-                if len(entries) > max_files:
-                    for old in entries[max_files:]:
-                        try:
-                            os.remove(os.path.join(backups_dir, old))
-                        except Exception:
-                            pass
-            except Exception:
-                pass
+            journal = self._get_state_journal()
+            if journal.append(self.collect_state()):
+                print(f"📦 Auto-saved state to {journal.path}")
             return True
         except Exception as e:
             print("⚠️ Failed to auto-save state:", e)
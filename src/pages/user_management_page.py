@@ -1,6 +1,8 @@
 import customtkinter as ctk
 from tkinter import messagebox, ttk
 
+from ..virtual_table import VirtualTable
+
 class UserManagementPage:
     def __init__(self, parent, db, colors, fonts):
         self.parent = parent
@@ -100,37 +102,30 @@ class UserManagementPage:
         )
         list_header.pack(anchor="w", padx=20, pady=15)
 
-        # Treeview for users
-        columns = ("username", "role", "employee", "status", "actions")
-        tree = ttk.Treeview(list_frame, columns=columns, show="headings", style="Treeview")
-
-        tree.heading("username", text="Username")
-        tree.heading("role", text="Role")
-        tree.heading("employee", text="Linked Employee")
-        tree.heading("status", text="Status")
-        tree.heading("actions", text="Actions")
+        # Virtualized table for users; the user id is the item iid so actions can reference it
+        def user_values(user):
+            status = "First Login" if user['first_login'] else "Active"
+            return (user['username'], user['role'], user['employee_name'] or "-", status, "Delete")
 
-        tree.column("username", width=150)
-        tree.column("role", width=100)
-        tree.column("employee", width=200)
-        tree.column("status", width=100)
-        tree.column("actions", width=100)
+        table = VirtualTable(
+            list_frame,
+            columns=[
+                ("username", "Username", 150),
+                ("role", "Role", 100),
+                ("employee", "Linked Employee", 200),
+                ("status", "Status", 100),
+                ("actions", "Actions", 100),
+            ],
+            fetch=lambda offset, limit, cursor, sort, descending: self.db.get_users_page(offset, limit, cursor),
+            count=self.db.count_users,
+            row_values=user_values,
+            row_id=lambda user: user['id'],
+            sortable=False,
+        )
+        tree = table.tree
 
         def refresh_user_list():
-            for item in tree.get_children():
-                tree.delete(item)
-
-            users = self.db.get_all_users()
-            for user in users:
-                status = "First Login" if user['first_login'] else "Active"
-                # Use the database user id as the tree item id (iid) so actions can reference it
-                tree.insert("", "end", iid=str(user['id']), values=(
-                    user['username'],
-                    user['role'],
-                    user['employee_name'] or "-",
-                    status,
-                    "Delete"
-                ))
+            table.reload()
 
         def on_tree_click(event):
             region = tree.identify("region", event.x, event.y)
@@ -150,7 +145,7 @@ class UserManagementPage:
                             messagebox.showerror("Error", "Failed to delete user")
 
         tree.bind('<Button-1>', on_tree_click)
-        tree.pack(fill="both", expand=True, padx=20, pady=(0, 20))
+        table.pack(fill="both", expand=True, padx=20, pady=(0, 20))
 
         # Store refresh function
         self.refresh_user_list = refresh_user_list
@@ -0,0 +1,291 @@
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from .event_bus import PUNCH
+from .punch_events import PUNCH_ACTIONS, PunchEventLog, SessionProjector, normalize_source
+from .sync_outbox import enqueue_punch
+
+
+# One open session (arrival without departure) per employee per day. The
+# punch upsert below targets this partial index to decide arrival vs departure.
+OPEN_SESSION_INDEX_SQL = """
+CREATE UNIQUE INDEX IF NOT EXISTS ux_attendance_open_session
+ON attendance (employee_id, date)
+WHERE arrival_time IS NOT NULL AND departure_time IS NULL
+"""
+
+# Insert an arrival, or close today's open session if there is one.
+# RETURNING tells us which branch ran: departure_time is only set on conflict.
+PUNCH_UPSERT_SQL = """
+INSERT INTO attendance (employee_id, date, arrival_time, departure_time)
+VALUES (?, ?, ?, NULL)
+ON CONFLICT (employee_id, date) WHERE arrival_time IS NOT NULL AND departure_time IS NULL
+DO UPDATE SET departure_time = excluded.arrival_time
+RETURNING id, arrival_time, departure_time
+"""
+
+
+# Append a punch event and, in the same statement, read what projecting it will
+# do: whether the employee has an open session that day, and how many of their
+# events that day are still unprojected (each one toggles the session).
+PUNCH_EVENT_SQL = """
+INSERT INTO punch_events (employee_id, ts, source) VALUES (?, ?, ?)
+RETURNING id,
+    EXISTS (SELECT 1 FROM attendance
+            WHERE attendance.employee_id = punch_events.employee_id AND attendance.date = ?
+              AND attendance.arrival_time IS NOT NULL AND attendance.departure_time IS NULL),
+    (SELECT COUNT(*) FROM punch_events AS pending
+     WHERE pending.id > COALESCE((SELECT last_event_id FROM projections WHERE name = ?), 0)
+       AND pending.id < punch_events.id AND pending.employee_id = punch_events.employee_id
+       AND pending.ts >= ? AND pending.ts < ?)
+"""
+
+
+class PunchEngine:
+    """Records punches in a single short write transaction.
+
+    The `BEGIN IMMEDIATE` transaction of a punch only appends the raw event to
+    `punch_events`: one row on the log's last page. Whether it is an arrival
+    or a departure is read, under the same lock, from the open session plus
+    the employee's unprojected events, so concurrent API and kiosk punches
+    still alternate correctly. Writing the `attendance` session and what
+    hangs off it (classification, daily_summary) is deferred to the
+    `SessionProjector`, which batches it off the punch's lock.
+
+    Sessions are written with one UPSERT/RETURNING statement against the
+    `ux_attendance_open_session` partial unique index. If the index cannot be
+    created (legacy rows with several open sessions on the same day, or
+    SQLite older than 3.35 without RETURNING), a lookup followed by UPDATE or
+    INSERT is used instead.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.events = PunchEventLog(db)
+        self.projector = SessionProjector(self)
+        self.use_upsert = self.ensure_schema(db.conn)
+        # Project events left unprojected by a crash or another process
+        self.projector.run(db.conn)
+        # Set by FirebaseManager.attach_database: punches then queue their cloud
+        # write in the outbox inside their own transaction, and on_sync wakes
+        # the sync worker after the commit
+        self.sync_origin: Optional[str] = None
+        self.on_sync = None
+        self.punches = 0
+        self.total_latency_s = 0.0
+        self.total_lock_hold_s = 0.0
+
+    @staticmethod
+    def ensure_schema(conn) -> bool:
+        """Create the event log and open-session index. Returns True if the upsert path is usable."""
+        PunchEventLog.ensure_schema(conn)
+        if sqlite3.sqlite_version_info < (3, 35, 0):
+            return False
+        try:
+            conn.execute(OPEN_SESSION_INDEX_SQL)
+            conn.commit()
+            return True
+        except sqlite3.IntegrityError:
+            print("⚠️ Attendance has duplicate open sessions; punches will use the two-statement path")
+            return False
+        except Exception:
+            return False
+
+    # --- statement-level API (caller owns the transaction) ---
+    def apply(self, conn, employee_id, when: datetime, source: str = "manual") -> Dict[str, Any]:
+        """Append a punch event on `conn` without committing; projection is deferred.
+
+        Returns the action it will project to (arrival/departure), time, date,
+        event_id and source.
+        """
+        source = normalize_source(source)
+        date_str, time_str = when.strftime("%Y-%m-%d"), when.strftime("%H:%M:%S")
+        day = datetime(when.year, when.month, when.day)
+        event_id, is_open, pending = conn.execute(PUNCH_EVENT_SQL, (
+            employee_id, int(when.timestamp()), source, date_str, SessionProjector.NAME,
+            int(day.timestamp()), int((day + timedelta(days=1)).timestamp()))).fetchone()
+        action = "departure" if bool(is_open) != bool(pending % 2) else "arrival"
+        result = {"action": action, "time": time_str, "date": date_str, "event_id": event_id, "source": source}
+        if self.sync_origin:
+            enqueue_punch(conn, self.sync_origin, employee_id, result)
+        return result
+
+    def apply_session(self, conn, employee_id, date_str: str, time_str: str) -> Dict[str, Any]:
+        """Close today's open session or open a new one on `conn`. Returns action/time/date/id."""
+        if self.use_upsert:
+            row = conn.execute(PUNCH_UPSERT_SQL, (employee_id, date_str, time_str)).fetchone()
+            action = "departure" if row[2] is not None else "arrival"
+            return {"action": action, "time": time_str, "date": date_str, "id": row[0]}
+
+        # The write lock is already held, so the lookup and the write cannot race
+        row = conn.execute(
+            """SELECT id FROM attendance
+               WHERE employee_id = ? AND date = ? AND arrival_time IS NOT NULL AND departure_time IS NULL
+               ORDER BY id DESC LIMIT 1""",
+            (employee_id, date_str)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE attendance SET departure_time = ? WHERE id = ?", (time_str, row[0]))
+            return {"action": "departure", "time": time_str, "date": date_str, "id": row[0]}
+        cursor = conn.execute(
+            "INSERT INTO attendance (employee_id, date, arrival_time, departure_time) VALUES (?, ?, ?, NULL)",
+            (employee_id, date_str, time_str))
+        return {"action": "arrival", "time": time_str, "date": date_str, "id": cursor.lastrowid}
+
+    def apply_arrival(self, conn, employee_id, date_str: str, time_str: str) -> Dict[str, Any]:
+        """Record an explicit arrival on `conn`: a no-op (id None) if a session is open,
+        else fill today's departure-only row or open a new session."""
+        result = {"action": "arrival", "time": time_str, "date": date_str, "id": None}
+        if conn.execute(
+                """SELECT 1 FROM attendance WHERE employee_id = ? AND date = ?
+                   AND arrival_time IS NOT NULL AND departure_time IS NULL""",
+                (employee_id, date_str)).fetchone() is not None:
+            return result
+        row = conn.execute(
+            "SELECT id FROM attendance WHERE employee_id = ? AND date = ? AND arrival_time IS NULL ORDER BY id LIMIT 1",
+            (employee_id, date_str)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE attendance SET arrival_time = ? WHERE id = ?", (time_str, row[0]))
+            result["id"] = row[0]
+        else:
+            result["id"] = conn.execute(
+                "INSERT INTO attendance (employee_id, date, arrival_time, departure_time) VALUES (?, ?, ?, NULL)",
+                (employee_id, date_str, time_str)).lastrowid
+        return result
+
+    def apply_departure(self, conn, employee_id, date_str: str, time_str: str) -> Dict[str, Any]:
+        """Record an explicit departure on `conn`: close today's latest open session,
+        or store a departure-only row."""
+        row = conn.execute(
+            """SELECT id FROM attendance
+               WHERE employee_id = ? AND date = ? AND arrival_time IS NOT NULL AND departure_time IS NULL
+               ORDER BY id DESC LIMIT 1""",
+            (employee_id, date_str)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE attendance SET departure_time = ? WHERE id = ?", (time_str, row[0]))
+            record_id = row[0]
+        else:
+            record_id = conn.execute(
+                "INSERT INTO attendance (employee_id, date, arrival_time, departure_time) VALUES (?, ?, NULL, ?)",
+                (employee_id, date_str, time_str)).lastrowid
+        return {"action": "departure", "time": time_str, "date": date_str, "id": record_id}
+
+    def apply_action(self, conn, employee_id, date_str: str, time_str: str,
+                     action: Optional[str] = None) -> Dict[str, Any]:
+        """Project one event: toggle the session (action None) or apply an explicit direction."""
+        if action == "arrival":
+            return self.apply_arrival(conn, employee_id, date_str, time_str)
+        if action == "departure":
+            return self.apply_departure(conn, employee_id, date_str, time_str)
+        return self.apply_session(conn, employee_id, date_str, time_str)
+
+    # --- transactional API ---
+    def record(self, employee_id, action: str, when: Optional[datetime] = None,
+               source: str = "legacy") -> Dict[str, Any]:
+        """Write an explicit arrival or departure now, and log it as an already-projected event.
+
+        Pending events are projected first in the same transaction, so the
+        session write lands in event order and the watermark can move past it.
+        """
+        if action not in PUNCH_ACTIONS:
+            raise ValueError(f"Unknown punch action: {action}")
+        conn = self.db.conn
+        when = (when or datetime.now()).replace(microsecond=0)
+        date_str, time_str = when.strftime("%Y-%m-%d"), when.strftime("%H:%M:%S")
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            projected = self.projector.project_pending(conn)
+            result = self.apply_action(conn, employee_id, date_str, time_str, action)
+            if result["id"] is not None:
+                source = normalize_source(source)
+                event_id = self.events.append(conn, employee_id, int(when.timestamp()), source, action)
+                self.projector.advance(conn, event_id)
+                result.update({"employee_id": employee_id, "event_id": event_id, "source": source})
+                if self.sync_origin:
+                    enqueue_punch(conn, self.sync_origin, employee_id, result)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        self.publish(projected.values())
+        if result["id"] is not None:
+            self.publish([result])
+            self.notify_sync()
+        return result
+
+    def punch(self, employee_id, when: Optional[datetime] = None, source: str = "manual") -> Dict[str, Any]:
+        """Record a punch for `employee_id` in one transaction. Its session is projected shortly after."""
+        conn = self.db.conn
+        when = (when or datetime.now()).replace(microsecond=0)
+        try:
+            # First punch after midnight materializes the next day of schedule
+            self.db.schedule.extend_on_rollover()
+        except Exception as e:
+            print(f"⚠️ Failed to extend the schedule: {e}")
+
+        started = time.perf_counter()
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        locked = time.perf_counter()
+        try:
+            result = self.apply(conn, employee_id, when, source)
+            # No second connection to an in-memory database: project inline
+            projected = None if self.projector.background else self.projector.project_pending(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finished = time.perf_counter()
+
+        self.punches += 1
+        self.total_latency_s += finished - started
+        self.total_lock_hold_s += finished - locked
+        if projected:
+            self.publish(projected.values())
+        else:
+            self.projector.schedule()
+        self.notify_sync()
+        return result
+
+    def flush(self) -> int:
+        """Project committed punches now, so reads on the main connection include them."""
+        try:
+            return self.projector.flush()
+        except sqlite3.Error as e:
+            # Readers still work; the background projector retries
+            print(f"⚠️ Punch projection failed: {e}")
+            return 0
+
+    def close(self):
+        self.projector.close()
+
+    def notify_sync(self):
+        """Tell the sync worker that committed punches are waiting in the outbox."""
+        callback = self.on_sync
+        if self.sync_origin and callback is not None:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Failed to wake Firestore sync: {e}")
+
+    def publish(self, results):
+        """Announce projected punches (employee_id, action, date, time, id, event_id, source) on the event bus."""
+        bus = getattr(self.db, "event_bus", None)
+        if bus is not None:
+            for result in results:
+                bus.publish(PUNCH, **result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return punch counters with average latency and lock hold time in milliseconds."""
+        n = self.punches or 1
+        return {
+            "punches": self.punches,
+            "upsert": self.use_upsert,
+            "avg_latency_ms": self.total_latency_s * 1000.0 / n,
+            "avg_lock_hold_ms": self.total_lock_hold_s * 1000.0 / n,
+            "projection": self.projector.stats(),
+        }
@@ -0,0 +1,251 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# Valid punch sources recorded with each raw event. 'legacy' and 'import'
+# events are written by Database.mark_arrival/mark_departure and
+# AttendanceImporter, which write the session themselves.
+PUNCH_SOURCES = ("face", "fingerprint", "manual", "api", "import", "legacy")
+
+# Insert-only log of raw scans. INTEGER PRIMARY KEY (rowid) keeps inserts at
+# append speed; the projector reads it in id order. action is NULL for scans
+# (each one toggles the employee's session) and 'arrival'/'departure' for
+# events that record an explicit direction.
+PUNCH_EVENTS_SQL = """
+CREATE TABLE IF NOT EXISTS punch_events (
+    id INTEGER PRIMARY KEY,
+    employee_id INTEGER NOT NULL,
+    ts INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    action TEXT,
+    FOREIGN KEY (employee_id) REFERENCES employees (id)
+);
+"""
+
+PUNCH_ACTIONS = ("arrival", "departure")
+
+# Watermark per projection: the last punch_events.id already applied
+PROJECTIONS_SQL = """
+CREATE TABLE IF NOT EXISTS projections (
+    name TEXT PRIMARY KEY,
+    last_event_id INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+def normalize_source(source: Optional[str]) -> str:
+    src = (source or "manual").strip().lower()
+    return src if src in PUNCH_SOURCES else "manual"
+
+
+class PunchEventLog:
+    """Append-only store of raw punch events (employee, epoch ts, source).
+
+    Methods that take a `conn` never commit; the caller owns the transaction.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    @staticmethod
+    def ensure_schema(conn):
+        conn.execute(PUNCH_EVENTS_SQL)
+        if "action" not in [r[1] for r in conn.execute("PRAGMA table_info(punch_events)")]:
+            conn.execute("ALTER TABLE punch_events ADD COLUMN action TEXT")
+        conn.execute(PROJECTIONS_SQL)
+        conn.commit()
+
+    def append(self, conn, employee_id, ts: int, source: str = "manual", action: Optional[str] = None) -> int:
+        """Append one event (action None = toggle) and return its id."""
+        if action is not None and action not in PUNCH_ACTIONS:
+            raise ValueError(f"Unknown punch action: {action}")
+        cursor = conn.execute(
+            "INSERT INTO punch_events (employee_id, ts, source, action) VALUES (?, ?, ?, ?)",
+            (employee_id, int(ts), normalize_source(source), action))
+        return cursor.lastrowid
+
+    def append_many(self, conn, events: Iterable[Tuple[Any, int, str]]) -> int:
+        """Append (employee_id, ts, source) tuples with executemany. Returns the number of rows."""
+        rows = [(e, int(ts), normalize_source(src)) for e, ts, src in events]
+        conn.executemany("INSERT INTO punch_events (employee_id, ts, source) VALUES (?, ?, ?)", rows)
+        return len(rows)
+
+    def history(self, employee_id, start_ts: Optional[int] = None, end_ts: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return raw events for one employee, oldest first."""
+        sql = "SELECT id, employee_id, ts, source, action FROM punch_events WHERE employee_id = ?"
+        params: List[Any] = [employee_id]
+        if start_ts is not None:
+            sql += " AND ts >= ?"
+            params.append(int(start_ts))
+        if end_ts is not None:
+            sql += " AND ts < ?"
+            params.append(int(end_ts))
+        sql += " ORDER BY ts, id"
+        cursor = self.db.conn.execute(sql, params)
+        return [dict(zip(("id", "employee_id", "ts", "source", "action"), r)) for r in cursor.fetchall()]
+
+
+class SessionProjector:
+    """Derives arrival/departure sessions in `attendance` from `punch_events`.
+
+    Events past the stored watermark are applied in id order through
+    `PunchEngine.apply_action`: a scan closes today's open session or opens
+    a new one, an event with an explicit action applies that direction. The
+    watermark advances in the same transaction, so projection is incremental
+    and exactly-once. Legacy punches and imports write their sessions
+    themselves and `advance()` past their events.
+
+    A punch only appends its event; the session write and everything derived
+    from it (classification, daily_summary) happen here, off the punch's write
+    lock. `schedule()` wakes a background thread with its own connection,
+    which waits `delay_s` so a burst of punches shares one transaction, then
+    projects and publishes the punches on the event bus. `flush()` projects
+    on the caller's connection at once; attendance readers call it so they
+    never see a committed punch missing. In-memory databases (no second
+    connection) project inline.
+    """
+
+    NAME = "attendance_sessions"
+
+    def __init__(self, engine, delay_s: float = 0.05):
+        self.engine = engine
+        self.delay_s = max(0.0, float(delay_s))
+        self.batches = 0
+        self.projected = 0
+        self._scheduled = 0
+        self._done = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def background(self) -> bool:
+        return self.engine.db.db_name != ":memory:"
+
+    def watermark(self, conn) -> int:
+        row = conn.execute("SELECT last_event_id FROM projections WHERE name = ?", (self.NAME,)).fetchone()
+        return int(row[0]) if row else 0
+
+    def advance(self, conn, event_id: int):
+        """Move the watermark to `event_id` without committing.
+
+        For writers that apply events themselves (legacy punches, imports):
+        they project pending events first in the same transaction, then
+        append theirs and advance past them.
+        """
+        conn.execute(
+            "INSERT INTO projections (name, last_event_id) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET last_event_id = excluded.last_event_id",
+            (self.NAME, int(event_id)))
+
+    def pending(self, conn) -> int:
+        row = conn.execute("SELECT COUNT(*) FROM punch_events WHERE id > ?", (self.watermark(conn),)).fetchone()
+        return int(row[0]) if row else 0
+
+    def project_pending(self, conn, batch_size: int = 5000) -> Dict[int, Dict[str, Any]]:
+        """Apply all unprojected events on `conn` without committing.
+
+        Returns {event_id: session result plus employee_id, event_id and source}
+        for the events that wrote a session (an explicit arrival while one is
+        open writes nothing).
+        """
+        results: Dict[int, Dict[str, Any]] = {}
+        start = last = self.watermark(conn)
+        while True:
+            rows = conn.execute(
+                "SELECT id, employee_id, ts, source, action FROM punch_events WHERE id > ? ORDER BY id LIMIT ?",
+                (last, batch_size)).fetchall()
+            if not rows:
+                break
+            for event_id, employee_id, ts, source, action in rows:
+                when = datetime.fromtimestamp(ts)
+                result = self.engine.apply_action(
+                    conn, employee_id, when.strftime("%Y-%m-%d"), when.strftime("%H:%M:%S"), action)
+                last = event_id
+                if result["id"] is None:
+                    continue
+                result.update({"employee_id": employee_id, "event_id": event_id, "source": source})
+                results[event_id] = result
+            if len(rows) < batch_size:
+                break
+        if last > start:
+            self.advance(conn, last)
+        return results
+
+    def _project(self, conn) -> Dict[int, Dict[str, Any]]:
+        """Catch up in one write transaction, then publish the projected punches."""
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            results = self.project_pending(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if results:
+            self.batches += 1
+            self.projected += len(results)
+            self.engine.publish(results.values())
+        return results
+
+    def run(self, conn) -> int:
+        """Catch up the projection in its own write transaction. Returns events applied."""
+        with self._lock:
+            scheduled = self._scheduled
+        applied = self._project(conn)
+        with self._lock:
+            self._done = max(self._done, scheduled)
+        return len(applied)
+
+    # --- deferred projection ---
+    def schedule(self):
+        """Note newly committed events and wake the background projector."""
+        with self._lock:
+            self._scheduled += 1
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="punch-projector", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def flush(self, conn=None) -> int:
+        """Project any scheduled events now on `conn` (default: the main connection)."""
+        with self._lock:
+            if self._done >= self._scheduled:
+                return 0
+        return self.run(conn if conn is not None else self.engine.db.conn)
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Project what is left and stop the background thread (restarted by the next schedule())."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            self._wake.set()
+            thread.join(timeout)
+
+    def _run(self):
+        conn = sqlite3.connect(self.engine.db.db_name, timeout=30)
+        try:
+            while True:
+                self._wake.wait()
+                stopping = self._stop.wait(self.delay_s)
+                self._wake.clear()
+                try:
+                    self.run(conn)
+                except Exception as e:
+                    # The events are durable; the next punch or flush() retries
+                    print(f"⚠️ Punch projection failed: {e}")
+                if stopping:
+                    break
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        n = self.batches or 1
+        return {"batches": self.batches, "projected": self.projected, "avg_batch_size": self.projected / n}
@@ -0,0 +1,178 @@
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+
+_STOP = object()
+
+
+class PunchQueue:
+    """Group-commit write queue for punches.
+
+    Producers call `submit()` from any thread and get a Future. A single writer
+    thread (with its own SQLite connection) collects punches that arrive within
+    `max_wait_ms` of the first one, up to `max_batch`, and records them in one
+    `BEGIN IMMEDIATE` transaction via `PunchEngine.apply`. Futures resolve only
+    after COMMIT returns, so an acknowledged punch is durable.
+
+    Worst-case latency per punch is roughly `max_wait_ms` plus one commit.
+    `close()` flushes everything still queued before stopping the writer.
+    """
+
+    def __init__(self, db_name: str, engine, max_batch: int = 256, max_wait_ms: float = 5.0):
+        self.db_name = db_name
+        self.engine = engine
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+        # Counters (written by the writer thread only)
+        self.batches = 0
+        self.punches = 0
+        self.failed = 0
+        self.max_batch_seen = 0
+        self.total_commit_s = 0.0
+        self.max_commit_s = 0.0
+
+    # --- producer API ---
+    def submit(self, employee_id, when: Optional[datetime] = None, source: str = "api") -> Future:
+        """Queue a punch stamped with `when` (default: now). Returns a Future of the punch result."""
+        fut: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("PunchQueue is closed")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="punch-queue", daemon=True)
+                self._thread.start()
+            self._queue.put((employee_id, (when or datetime.now()).replace(microsecond=0), source, fut))
+        return fut
+
+    def punch(self, employee_id, when: Optional[datetime] = None, source: str = "api",
+              timeout: Optional[float] = 30.0) -> Dict[str, Any]:
+        """Submit a punch and wait for its durable acknowledgement."""
+        return self.submit(employee_id, when, source).result(timeout=timeout)
+
+    def close(self, timeout: Optional[float] = 10.0):
+        """Flush queued punches and stop the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put(_STOP)
+        if thread is not None:
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        batches = self.batches or 1
+        return {
+            "batches": self.batches,
+            "punches": self.punches,
+            "failed": self.failed,
+            "queue_depth": self._queue.qsize(),
+            "avg_batch_size": self.punches / batches,
+            "max_batch_size": self.max_batch_seen,
+            "avg_commit_ms": self.total_commit_s * 1000.0 / batches,
+            "max_commit_ms": self.max_commit_s * 1000.0,
+        }
+
+    # --- writer thread ---
+    def _run(self):
+        conn = sqlite3.connect(self.db_name, timeout=30)
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.max_wait_s
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._commit_batch(conn, batch)
+
+            # Shutdown: drain anything that raced with close()
+            leftover = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    leftover.append(item)
+            for start in range(0, len(leftover), self.max_batch):
+                self._commit_batch(conn, leftover[start:start + self.max_batch])
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _resolve(fut: Future, result=None, error: Optional[BaseException] = None):
+        # A resolved Future must not take the writer thread down with it
+        try:
+            if error is not None:
+                fut.set_exception(error)
+            else:
+                fut.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def _commit_batch(self, conn, batch):
+        # Drop punches whose caller cancelled them; the rest can no longer be cancelled
+        batch = [item for item in batch if item[3].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for employee_id, when, source, fut in batch:
+                # A savepoint per punch keeps one bad punch from failing the whole batch
+                conn.execute("SAVEPOINT punch")
+                try:
+                    res = self.engine.apply(conn, employee_id, when, source)
+                    conn.execute("RELEASE SAVEPOINT punch")
+                    results.append((fut, res, None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO SAVEPOINT punch")
+                    conn.execute("RELEASE SAVEPOINT punch")
+                    results.append((fut, None, e))
+            started = time.perf_counter()
+            conn.commit()
+            elapsed = time.perf_counter() - started
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            self.failed += len(batch)
+            for *_, fut in batch:
+                self._resolve(fut, error=e)
+            return
+
+        self.batches += 1
+        self.punches += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        self.total_commit_s += elapsed
+        self.max_commit_s = max(self.max_commit_s, elapsed)
+        # Sessions are projected (and published) later, in the projector's transaction
+        self.engine.projector.schedule()
+        self.engine.notify_sync()
+        for fut, res, err in results:
+            if err is not None:
+                self.failed += 1
+            self._resolve(fut, res, err)
@@ -0,0 +1,400 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from .daily_summary import WATCHED_COLUMNS
+
+
+# Shift definitions. Times are seconds since midnight within one work day
+# (punches are split by calendar date, so shifts cannot cross midnight).
+SHIFTS_SQL = """
+CREATE TABLE IF NOT EXISTS shifts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    start_secs INTEGER NOT NULL,
+    end_secs INTEGER NOT NULL,
+    grace_minutes INTEGER NOT NULL DEFAULT 0,
+    overtime_after_minutes INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+# Recurring weekly roster. employee_id NULL is the company default; a row for
+# a specific employee replaces the default for that weekday (shift_id NULL = off).
+ROSTER_PATTERNS_SQL = """
+CREATE TABLE IF NOT EXISTS roster_patterns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    employee_id INTEGER,
+    weekday INTEGER NOT NULL,
+    shift_id INTEGER,
+    valid_from INTEGER,
+    valid_to INTEGER,
+    FOREIGN KEY (employee_id) REFERENCES employees (id),
+    FOREIGN KEY (shift_id) REFERENCES shifts (id)
+)
+"""
+
+# One-off changes for a single employee-day (shift_id NULL = day off)
+ROSTER_OVERRIDES_SQL = """
+CREATE TABLE IF NOT EXISTS roster_overrides (
+    employee_id INTEGER NOT NULL,
+    work_day INTEGER NOT NULL,
+    shift_id INTEGER,
+    PRIMARY KEY (employee_id, work_day)
+) WITHOUT ROWID
+"""
+
+HOLIDAYS_SQL = """
+CREATE TABLE IF NOT EXISTS holidays (
+    work_day INTEGER PRIMARY KEY,
+    name TEXT
+)
+"""
+
+# Materialized schedule: the expected interval per employee per day. Punch
+# classification and lateness are a primary-key lookup here.
+EXPECTED_INTERVALS_SQL = """
+CREATE TABLE IF NOT EXISTS expected_intervals (
+    employee_id INTEGER NOT NULL,
+    work_day INTEGER NOT NULL,
+    shift_id INTEGER NOT NULL,
+    start_secs INTEGER NOT NULL,
+    end_secs INTEGER NOT NULL,
+    grace_secs INTEGER NOT NULL,
+    overtime_secs INTEGER NOT NULL,
+    PRIMARY KEY (employee_id, work_day)
+) WITHOUT ROWID
+"""
+
+PUNCH_STATUSES = ("on_time", "late", "early_leave", "overtime", "unscheduled")
+
+
+def classify_sql(row: str) -> str:
+    """SET clause classifying attendance row `row` ('NEW' or 'attendance') against expected_intervals."""
+    interval = (f"FROM expected_intervals WHERE expected_intervals.employee_id = {row}.employee_id "
+                f"AND expected_intervals.work_day = {row}.work_day")
+    return f"""
+        arrival_status = CASE WHEN {row}.arrival_secs IS NULL THEN NULL ELSE COALESCE(
+            (SELECT CASE WHEN {row}.arrival_secs > start_secs + grace_secs THEN 'late' ELSE 'on_time' END {interval}),
+            'unscheduled') END,
+        departure_status = CASE WHEN {row}.departure_secs IS NULL THEN NULL ELSE COALESCE(
+            (SELECT CASE WHEN {row}.departure_secs < end_secs THEN 'early_leave'
+                         WHEN {row}.departure_secs > end_secs + overtime_secs THEN 'overtime'
+                         ELSE 'on_time' END {interval}),
+            'unscheduled') END
+    """
+
+
+# Classify on insert and whenever the punch times change (see WATCHED_COLUMNS).
+# They only write the status columns, which no trigger watches.
+CLASSIFY_TRIGGERS_SQL = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_attendance_classify_insert
+    AFTER INSERT ON attendance
+    BEGIN
+        UPDATE attendance SET {classify_sql('NEW')} WHERE id = NEW.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_attendance_classify
+    AFTER UPDATE OF {WATCHED_COLUMNS} ON attendance
+    BEGIN
+        UPDATE attendance SET {classify_sql('NEW')} WHERE id = NEW.id;
+    END
+    """,
+)
+
+# Expected shift for every employee-day in [?, ?]: override, else holiday (off),
+# else the employee's own pattern for the weekday, else the company default.
+MATERIALIZE_SQL = """
+WITH RECURSIVE all_days(d) AS (
+    SELECT ? UNION ALL SELECT d + 1 FROM all_days WHERE d < ?
+),
+days AS (
+    SELECT d FROM all_days {weekday_filter}
+),
+resolved AS (
+    SELECT e.id AS employee_id, days.d AS work_day,
+           CASE
+               WHEN o.employee_id IS NOT NULL THEN o.shift_id
+               WHEN h.work_day IS NOT NULL THEN NULL
+               WHEN EXISTS (SELECT 1 FROM roster_patterns p
+                            WHERE p.employee_id = e.id AND p.weekday = (days.d + 3) % 7
+                              AND (p.valid_from IS NULL OR p.valid_from <= days.d)
+                              AND (p.valid_to IS NULL OR p.valid_to >= days.d))
+               THEN (SELECT p.shift_id FROM roster_patterns p
+                     WHERE p.employee_id = e.id AND p.weekday = (days.d + 3) % 7
+                       AND (p.valid_from IS NULL OR p.valid_from <= days.d)
+                       AND (p.valid_to IS NULL OR p.valid_to >= days.d)
+                     ORDER BY p.id DESC LIMIT 1)
+               ELSE (SELECT p.shift_id FROM roster_patterns p
+                     WHERE p.employee_id IS NULL AND p.weekday = (days.d + 3) % 7
+                       AND (p.valid_from IS NULL OR p.valid_from <= days.d)
+                       AND (p.valid_to IS NULL OR p.valid_to >= days.d)
+                     ORDER BY p.id DESC LIMIT 1)
+           END AS shift_id
+    FROM employees e
+    CROSS JOIN days
+    LEFT JOIN roster_overrides o ON o.employee_id = e.id AND o.work_day = days.d
+    LEFT JOIN holidays h ON h.work_day = days.d
+    {employee_filter}
+)
+INSERT INTO expected_intervals (employee_id, work_day, shift_id, start_secs, end_secs, grace_secs, overtime_secs)
+SELECT resolved.employee_id, resolved.work_day, shifts.id, shifts.start_secs, shifts.end_secs,
+       shifts.grace_minutes * 60, shifts.overtime_after_minutes * 60
+FROM resolved JOIN shifts ON shifts.id = resolved.shift_id
+"""
+
+
+class ScheduleEngine:
+    """Shifts, weekly rosters, per-employee overrides and holidays.
+
+    Rules are expanded ahead of time into `expected_intervals` (one row per
+    scheduled employee-day). A trigger on `attendance` then classifies each
+    arrival as on_time/late and each departure as on_time/early_leave/overtime
+    with a single primary-key lookup when the punch is written ('unscheduled'
+    when no shift applies). Roster changes re-materialize the affected days
+    and re-classify their punches.
+
+    The schedule is kept materialized through `horizon_days` past today.
+    """
+
+    def __init__(self, db, horizon_days: int = 60):
+        self.db = db
+        self.horizon_days = horizon_days
+        # Day the horizon was last extended for; see extend_on_rollover()
+        self._horizon_day: Optional[int] = None
+
+    @staticmethod
+    def ensure_schema(conn) -> bool:
+        """Create schedule tables, status columns and the classify trigger.
+
+        Returns True if the status columns were just added (rows need classifying).
+        """
+        for sql in (SHIFTS_SQL, ROSTER_PATTERNS_SQL, ROSTER_OVERRIDES_SQL, HOLIDAYS_SQL, EXPECTED_INTERVALS_SQL):
+            conn.execute(sql)
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_roster_patterns_employee ON roster_patterns (employee_id, weekday)")
+        cols = [r[1] for r in conn.execute("PRAGMA table_info(attendance)").fetchall()]
+        added = False
+        for col in ('arrival_status', 'departure_status'):
+            if col not in cols:
+                conn.execute(f"ALTER TABLE attendance ADD COLUMN {col} TEXT")
+                added = True
+        # Recreate the triggers so their SQL follows code changes
+        for name in ("trg_attendance_classify_insert", "trg_attendance_classify"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        for sql in CLASSIFY_TRIGGERS_SQL:
+            conn.execute(sql)
+        conn.commit()
+        return added
+
+    # --- helpers ---
+    def _day(self, date_str) -> int:
+        return self.db.date_to_day(date_str)
+
+    def _today(self) -> int:
+        return self._day(datetime.now().strftime("%Y-%m-%d"))
+
+    def horizon_end(self) -> int:
+        return self._today() + self.horizon_days
+
+    def _refresh_from(self, start_day: int, employee_id=None, end_day: Optional[int] = None,
+                      weekdays: Optional[Iterable[int]] = None) -> int:
+        """Re-materialize the days a roster change can affect.
+
+        The range runs from start_day to end_day (both capped at the horizon),
+        but never starts before the first punch in scope or today, whichever
+        is earlier: days before that have nothing to re-classify. Only the
+        given weekdays and employee (None = everyone) are rebuilt.
+        """
+        first = self.db.conn.execute(
+            "SELECT MIN(work_day) FROM attendance" + (" WHERE employee_id = ?" if employee_id is not None else ""),
+            [int(employee_id)] if employee_id is not None else []).fetchone()[0]
+        floor = self._today() if first is None else min(first, self._today())
+        start = max(start_day, floor)
+        end = self.horizon_end() if end_day is None else min(end_day, self.horizon_end())
+        if start > end:
+            return 0
+        return self.materialize_days(start, end, employee_id=employee_id, weekdays=weekdays)
+
+    # --- roster editing ---
+    def add_shift(self, name, start_time, end_time, grace_minutes=0, overtime_after_minutes=0) -> int:
+        start = self.db.time_to_secs(start_time)
+        end = self.db.time_to_secs(end_time)
+        if end <= start:
+            raise ValueError(f"Shift '{name}' must end after it starts on the same day; overnight shifts are not supported")
+        cursor = self.db.conn.execute(
+            "INSERT INTO shifts (name, start_secs, end_secs, grace_minutes, overtime_after_minutes) VALUES (?, ?, ?, ?, ?)",
+            (name, start, end, int(grace_minutes), int(overtime_after_minutes)))
+        self.db.conn.commit()
+        return cursor.lastrowid
+
+    def get_shifts(self):
+        return self.db.conn.execute("SELECT * FROM shifts ORDER BY start_secs, name").fetchall()
+
+    def assign_pattern(self, weekdays: Iterable[int], shift_id, employee_id=None,
+                       valid_from: Optional[str] = None, valid_to: Optional[str] = None):
+        """Roster `shift_id` (None = day off) on the given weekdays (Monday=0).
+
+        employee_id None sets the company default. Later assignments win over
+        earlier overlapping ones.
+        """
+        weekdays = sorted({int(w) % 7 for w in weekdays})
+        start = self._day(valid_from) if valid_from else None
+        end = self._day(valid_to) if valid_to else None
+        self.db.conn.executemany(
+            "INSERT INTO roster_patterns (employee_id, weekday, shift_id, valid_from, valid_to) VALUES (?, ?, ?, ?, ?)",
+            [(employee_id, w, shift_id, start, end) for w in weekdays])
+        self.db.conn.commit()
+        self._refresh_from(start if start is not None else self._today(), employee_id, end, weekdays)
+
+    def set_override(self, employee_id, date_str, shift_id=None):
+        """Give one employee a different shift (or None = day off) on one date."""
+        day = self._day(date_str)
+        self.db.conn.execute(
+            "INSERT INTO roster_overrides (employee_id, work_day, shift_id) VALUES (?, ?, ?) "
+            "ON CONFLICT(employee_id, work_day) DO UPDATE SET shift_id = excluded.shift_id",
+            (employee_id, day, shift_id))
+        self.db.conn.commit()
+        self.materialize_days(day, day, employee_id=employee_id)
+
+    def clear_override(self, employee_id, date_str):
+        day = self._day(date_str)
+        self.db.conn.execute("DELETE FROM roster_overrides WHERE employee_id = ? AND work_day = ?", (employee_id, day))
+        self.db.conn.commit()
+        self.materialize_days(day, day, employee_id=employee_id)
+
+    def add_holiday(self, date_str, name=None):
+        day = self._day(date_str)
+        self.db.conn.execute(
+            "INSERT INTO holidays (work_day, name) VALUES (?, ?) ON CONFLICT(work_day) DO UPDATE SET name = excluded.name",
+            (day, name))
+        self.db.conn.commit()
+        self.materialize_days(day, day)
+
+    def remove_holiday(self, date_str):
+        day = self._day(date_str)
+        self.db.conn.execute("DELETE FROM holidays WHERE work_day = ?", (day,))
+        self.db.conn.commit()
+        self.materialize_days(day, day)
+
+    # --- materialization ---
+    def materialize(self, start_date: str, end_date: str, employee_id=None) -> int:
+        return self.materialize_days(self._day(start_date), self._day(end_date), employee_id)
+
+    def materialize_days(self, start_day: int, end_day: int, employee_id=None, min_employee_id=None,
+                         weekdays: Optional[Iterable[int]] = None) -> int:
+        """Rebuild expected intervals for a day range in one transaction.
+
+        Punches in the range are re-classified and their daily_summary rows
+        rebuilt, since both depend on the schedule. `min_employee_id` limits
+        the work to employees with id >= it (bulk imports), `weekdays`
+        (Monday=0) to those days of the week. Returns intervals written.
+        """
+        conn = self.db.conn
+        employee_filter, emp_params = "", []
+        scope, scope_params = "work_day BETWEEN ? AND ?", [int(start_day), int(end_day)]
+        if employee_id is not None:
+            employee_filter = "WHERE e.id = ?"
+            emp_params = [int(employee_id)]
+            scope += " AND employee_id = ?"
+            scope_params.append(int(employee_id))
+        elif min_employee_id is not None:
+            employee_filter = "WHERE e.id >= ?"
+            emp_params = [int(min_employee_id)]
+            scope += " AND employee_id >= ?"
+            scope_params.append(int(min_employee_id))
+        weekday_filter, weekday_params = "", []
+        if weekdays is not None:
+            weekday_params = sorted({int(w) % 7 for w in weekdays})
+            marks = ", ".join("?" * len(weekday_params))
+            weekday_filter = f"WHERE (d + 3) % 7 IN ({marks})"
+            scope += f" AND (work_day + 3) % 7 IN ({marks})"
+            scope_params.extend(weekday_params)
+
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM expected_intervals WHERE " + scope, scope_params)
+            cursor = conn.execute(MATERIALIZE_SQL.format(employee_filter=employee_filter, weekday_filter=weekday_filter),
+                                  [int(start_day), int(end_day)] + weekday_params + emp_params)
+            written = cursor.rowcount
+            conn.execute(f"UPDATE attendance SET {classify_sql('attendance')} WHERE " + scope, scope_params)
+            if employee_id is None and min_employee_id is None:
+                # Days of the week outside `weekdays` were already current (a roster
+                # edit only touches its own weekdays), so the range counts as done
+                self._set_materialized_through(conn, start_day, end_day)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        self.db.daily_summary.rebuild(start_day, end_day, employee_id=employee_id, weekdays=weekdays)
+        return written
+
+    def _set_materialized_through(self, conn, start_day: int, end_day: int):
+        """Advance the watermark to end_day if [start_day, end_day] joins up with it."""
+        row = conn.execute("SELECT value FROM settings WHERE key = 'schedule_materialized_through'").fetchone()
+        through = int(row[0] or 0) if row else 0
+        # A range past the watermark would leave a gap of unmaterialized days
+        contiguous = start_day <= through + 1 if through else start_day <= self._today() <= end_day
+        if contiguous and through < end_day:
+            conn.execute(
+                "INSERT INTO settings (key, value) VALUES ('schedule_materialized_through', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (str(end_day),))
+            self.db.invalidate_settings_cache()
+
+    def materialize_employee(self, employee_id) -> int:
+        """Schedule a new employee from today through the materialized horizon."""
+        through = self.db.get_setting_int('schedule_materialized_through', 0)
+        if through < self._today():
+            return 0
+        return self.materialize_days(self._today(), through, employee_id=employee_id)
+
+    def materialize_new_employees(self, first_id) -> int:
+        """Schedule every employee with id >= first_id (a bulk import) through the horizon."""
+        through = self.db.get_setting_int('schedule_materialized_through', 0)
+        if through < self._today():
+            return 0
+        return self.materialize_days(self._today(), through, min_employee_id=first_id)
+
+    def ensure_horizon(self) -> int:
+        """Extend the materialized schedule to today + horizon_days. Returns intervals written."""
+        self._horizon_day = self._today()
+        if self.db.conn.execute("SELECT 1 FROM roster_patterns LIMIT 1").fetchone() is None:
+            return 0
+        through = self.db.get_setting_int('schedule_materialized_through', 0)
+        end = self.horizon_end()
+        if through >= end:
+            return 0
+        start = through + 1 if through else self._today()
+        return self.materialize_days(start, end)
+
+    def extend_on_rollover(self) -> int:
+        """Run ensure_horizon() once per calendar day; a date compare otherwise.
+
+        Called from the punch path so a long-running app keeps the schedule
+        horizon_days ahead past midnight, not only from startup.
+        """
+        if self._horizon_day == self._today():
+            return 0
+        return self.ensure_horizon()
+
+    # --- lookups ---
+    def expected_interval(self, employee_id, date_str) -> Optional[Dict[str, Any]]:
+        row = self.db.conn.execute(
+            "SELECT * FROM expected_intervals WHERE employee_id = ? AND work_day = ?",
+            (employee_id, self._day(date_str))).fetchone()
+        return dict(row) if row else None
+
+    def classify(self, employee_id, date_str, time_str, action) -> str:
+        """Classify a punch time against the expected interval (same rules as the trigger)."""
+        interval = self.expected_interval(employee_id, date_str)
+        if interval is None:
+            return "unscheduled"
+        secs = self.db.time_to_secs(time_str)
+        if action == "arrival":
+            return "late" if secs > interval['start_secs'] + interval['grace_secs'] else "on_time"
+        if secs < interval['end_secs']:
+            return "early_leave"
+        if secs > interval['end_secs'] + interval['overtime_secs']:
+            return "overtime"
+        return "on_time"
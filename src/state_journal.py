@@ -0,0 +1,119 @@
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+LEGACY_PREFIX = "state_"
+
+
+class StateJournal:
+    """Append-only JSON Lines journal of autosaved UI state.
+
+    `append()` adds one line (`{"saved_at": ..., "state": {...}}`) only when
+    the state differs from the newest entry, then flushes and fsyncs it. A
+    torn last line from a crash mid-append is cut off on load. Once the file
+    holds twice `retention` entries it is compacted: the newest `retention`
+    entries are written to a temporary file that replaces the journal with
+    an atomic rename, so the journal stays bounded without ever listing or
+    pruning a directory.
+    """
+
+    def __init__(self, path: str, retention: int = 50):
+        self.path = path
+        self.retention = max(1, int(retention))
+        self.appends = 0
+        self.skipped = 0
+        self.compactions = 0
+        self._entries = self._load()
+
+    def _load(self) -> List[Dict[str, Any]]:
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        if data and not data.endswith(b"\n"):
+            # Torn append from a crash: cut it off so the next entry starts on its own line
+            data = data[:data.rfind(b"\n") + 1]
+            with open(self.path, "r+b") as f:
+                f.truncate(len(data))
+        entries = []
+        for line in data.decode("utf-8", errors="replace").splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(entry, dict) and "state" in entry:
+                entries.append(entry)
+        return entries
+
+    # --- reading ---
+    def entries(self) -> List[Dict[str, Any]]:
+        return list(self._entries)
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """The most recently saved state, or None if the journal is empty."""
+        return self._entries[-1]["state"] if self._entries else None
+
+    # --- writing ---
+    def append(self, state: Dict[str, Any], saved_at: Optional[str] = None) -> bool:
+        """Record `state` if it differs from the latest entry. Returns True if written."""
+        if self._entries and self._entries[-1]["state"] == state:
+            self.skipped += 1
+            return False
+        entry = {"saved_at": saved_at or datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"), "state": state}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, sort_keys=True) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._entries.append(entry)
+        self.appends += 1
+        if len(self._entries) >= 2 * self.retention:
+            self.compact()
+        return True
+
+    def compact(self):
+        """Rewrite the journal with only the newest `retention` entries (atomic rename)."""
+        keep = self._entries[-self.retention:]
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in keep:
+                f.write(json.dumps(entry, sort_keys=True) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._entries = keep
+        self.compactions += 1
+
+    def import_legacy(self, directory: str) -> int:
+        """Fold old one-file-per-tick `state_<ts>.json` autosaves into the journal and delete them."""
+        try:
+            names = sorted(n for n in os.listdir(directory) if n.startswith(LEGACY_PREFIX) and n.endswith(".json"))
+        except OSError:
+            return 0
+        folded = []
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not isinstance(state, dict):
+                continue
+            saved_at = state.pop("timestamp", None)
+            if not self._entries or self._entries[-1]["state"] != state:
+                self._entries.append({"saved_at": saved_at, "state": state})
+            folded.append(path)
+        if folded:
+            # One rewrite for the whole batch, then drop the files it replaced
+            self.compact()
+            for path in folded:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        return len(folded)
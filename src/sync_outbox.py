@@ -0,0 +1,355 @@
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+# Documents waiting to be written to Firestore. One row per (collection,
+# doc_id): re-enqueueing a document replaces its payload and bumps `version`,
+# so an ack for an older payload does not drop the newer one.
+OUTBOX_SQL = """
+CREATE TABLE IF NOT EXISTS sync_outbox (
+    id INTEGER PRIMARY KEY,
+    collection TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    enqueued_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    UNIQUE (collection, doc_id)
+)
+"""
+
+ENQUEUE_SQL = """
+INSERT INTO sync_outbox (collection, doc_id, payload, enqueued_at)
+VALUES (?, ?, ?, ?)
+ON CONFLICT (collection, doc_id) DO UPDATE SET
+    payload = excluded.payload,
+    version = sync_outbox.version + 1,
+    attempts = 0,
+    last_error = NULL
+"""
+
+# Queue a punch's attendance document from inside the punch transaction
+# (see enqueue_punch); the employee's name is read in the same statement
+PUNCH_ENQUEUE_SQL = """
+INSERT INTO sync_outbox (collection, doc_id, payload, enqueued_at)
+SELECT 'attendance', :doc_id,
+       json_object('name', name, 'status', :status, 'timestamp', :timestamp, 'employee_id', id,
+                   'event_id', :event_id, 'source', :source),
+       :now
+FROM employees WHERE id = :employee_id
+ON CONFLICT (collection, doc_id) DO UPDATE SET
+    payload = excluded.payload,
+    version = sync_outbox.version + 1,
+    attempts = 0,
+    last_error = NULL
+"""
+
+# Writes Firestore kept rejecting, parked so they stop blocking the queue.
+# `SyncOutbox.retry_dead_letters()` moves them back.
+DEAD_LETTER_SQL = """
+CREATE TABLE IF NOT EXISTS sync_dead_letter (
+    id INTEGER PRIMARY KEY,
+    collection TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    failed_at REAL NOT NULL
+)
+"""
+
+# Firestore's limit on writes per batch
+MAX_BATCH = 500
+
+# Rejections of a document sent on its own before it is dead-lettered
+MAX_ATTEMPTS = 8
+
+# Errors that mean "Firestore unreachable", not "this document is bad"
+# (google.api_core exception names, matched by name to avoid the import)
+TRANSIENT_ERRORS = {"ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "TooManyRequests",
+                    "ResourceExhausted", "Aborted", "GatewayTimeout", "RetryError", "TransportError"}
+
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__)
+
+
+def record_doc_id(record: Dict[str, Any], origin: str) -> str:
+    """Deterministic document id, so a retried write overwrites instead of duplicating.
+
+    Punches carry their local punch_events id, which is unique per database;
+    the per-database `origin` keeps ids from different company databases apart.
+    Other records fall back to a hash of their content.
+    """
+    if record.get("event_id") is not None:
+        return f"{origin}-{record['event_id']}"
+    digest = hashlib.sha1(json.dumps(record, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f"{origin}-{digest[:20]}"
+
+
+def enqueue_punch(conn, origin: str, employee_id, result: Dict[str, Any]):
+    """Queue the attendance document for a punch on `conn` without committing.
+
+    Called inside the punch's own transaction, so a committed punch always
+    has its cloud write queued. `result` is a PunchEngine result (action,
+    date, time, event_id, source); the document matches what
+    FirebaseManager.upload_attendance queues for a punch.
+    """
+    conn.execute(PUNCH_ENQUEUE_SQL, {
+        "doc_id": record_doc_id(result, origin), "status": result["action"],
+        "timestamp": f"{result['date']} {result['time']}", "event_id": result["event_id"],
+        "source": result["source"], "now": time.time(), "employee_id": int(employee_id)})
+
+
+class SyncOutbox:
+    """Durable queue of Firestore writes in the company database.
+
+    `enqueue()` is one short local transaction, so callers on the UI thread
+    never wait for the network; `SyncWorker` drains the table.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    @staticmethod
+    def ensure_schema(conn):
+        conn.execute(OUTBOX_SQL)
+        conn.execute(DEAD_LETTER_SQL)
+        conn.commit()
+
+    @property
+    def origin(self) -> str:
+        """Random id of this database, generated once, used to namespace document ids."""
+        origin = self.db.get_setting('sync_origin', None)
+        if not origin:
+            origin = uuid.uuid4().hex[:12]
+            self.db.set_setting('sync_origin', origin)
+        return origin
+
+    def enqueue(self, collection: str, doc_id: str, payload: Dict[str, Any]):
+        self.enqueue_many([(collection, doc_id, payload)])
+
+    def enqueue_many(self, docs: List[Tuple[str, str, Dict[str, Any]]]) -> int:
+        """Queue (collection, doc_id, payload) writes in one transaction."""
+        conn = self.db.conn
+        now = time.time()
+        rows = [(c, d, json.dumps(p, sort_keys=True, default=str), now) for c, d, p in docs]
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(ENQUEUE_SQL, rows)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return len(rows)
+
+    def depth(self) -> int:
+        return self.db.conn.execute("SELECT COUNT(*) FROM sync_outbox").fetchone()[0]
+
+    def dead_letters(self) -> int:
+        return self.db.conn.execute("SELECT COUNT(*) FROM sync_dead_letter").fetchone()[0]
+
+    def retry_dead_letters(self) -> int:
+        """Queue dead-lettered writes again (e.g. after fixing security rules). Returns how many."""
+        conn = self.db.conn
+        rows = conn.execute("SELECT id, collection, doc_id, payload FROM sync_dead_letter ORDER BY id").fetchall()
+        if not rows:
+            return 0
+        now = time.time()
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(ENQUEUE_SQL, [(c, d, p, now) for _, c, d, p in rows])
+            conn.executemany("DELETE FROM sync_dead_letter WHERE id = ?", [(r[0],) for r in rows])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return len(rows)
+
+
+class SyncWorker:
+    """Background thread that drains `sync_outbox` into Firestore.
+
+    Pending rows are sent oldest first in WriteBatches of up to `batch_size`
+    (at most 500) and deleted in the same order once the batch commits.
+    Each write uses the row's deterministic doc id and stamps `updated_at`
+    with `server_timestamp`, so replays after a crash are harmless.
+
+    On failure the worker backs off exponentially (with jitter) from
+    `base_backoff_s` up to `max_backoff_s`, and halves the batch each time.
+    Rows are picked fewest attempts first, so rows in a failed batch go
+    behind the rest of the queue. A document rejected (for a reason other
+    than an outage) `max_attempts` times when sent alone is moved to
+    `sync_dead_letter`, so it cannot hold back the rest. A success resets
+    the backoff and batch size. `wake()` flushes at once instead of
+    waiting `poll_s`.
+    """
+
+    def __init__(self, db_name: str, client, batch_size: int = MAX_BATCH, server_timestamp: Any = None,
+                 poll_s: float = 5.0, base_backoff_s: float = 1.0, max_backoff_s: float = 300.0,
+                 max_attempts: int = MAX_ATTEMPTS):
+        self.db_name = db_name
+        self.client = client
+        self.batch_size = max(1, min(MAX_BATCH, int(batch_size)))
+        self.server_timestamp = server_timestamp
+        self.poll_s = max(0.01, float(poll_s))
+        self.base_backoff_s = max(0.0, float(base_backoff_s))
+        self.max_backoff_s = max(self.base_backoff_s, float(max_backoff_s))
+        self.max_attempts = max(1, int(max_attempts))
+
+        self.sent = 0
+        self.batches = 0
+        self.failures = 0
+        self.dead_lettered = 0
+        self.consecutive_failures = 0
+        self.backoff_s = 0.0
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[float] = None
+        self._limit = self.batch_size
+        self._conn: Optional[sqlite3.Connection] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    # --- control ---
+    def start(self) -> "SyncWorker":
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sync-worker", daemon=True)
+            self._thread.start()
+        return self
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout: Optional[float] = 10.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # --- draining ---
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_name, timeout=30, check_same_thread=False)
+            SyncOutbox.ensure_schema(self._conn)
+        return self._conn
+
+    def flush_once(self) -> int:
+        """Send one batch. Returns the number of documents written (0 if the outbox is empty)."""
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute(
+                "SELECT id, version, collection, doc_id, payload, attempts FROM sync_outbox "
+                "ORDER BY attempts, id LIMIT ?",
+                (self._limit,)).fetchall()
+            if not rows:
+                return 0
+            try:
+                batch = self.client.batch()
+                for _, _, collection, doc_id, payload, _ in rows:
+                    data = json.loads(payload)
+                    if self.server_timestamp is not None:
+                        data["updated_at"] = self.server_timestamp
+                    batch.set(self.client.collection(collection).document(doc_id), data)
+                batch.commit()
+            except Exception as e:
+                self._failed(conn, rows, e)
+                raise
+            # Only remove the payload versions that were sent
+            conn.executemany("DELETE FROM sync_outbox WHERE id = ? AND version = ?", [(r[0], r[1]) for r in rows])
+            conn.commit()
+            self.sent += len(rows)
+            self.batches += 1
+            self.consecutive_failures = 0
+            self.backoff_s = 0.0
+            self._limit = self.batch_size
+            self.last_error = None
+            self.last_success_at = time.time()
+            return len(rows)
+
+    def _failed(self, conn, rows, error: Exception):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = str(error)
+        self._limit = max(1, len(rows) // 2)
+        backoff = min(self.max_backoff_s, self.base_backoff_s * (2 ** (self.consecutive_failures - 1)))
+        self.backoff_s = backoff * random.uniform(0.5, 1.0)
+        conn.executemany("UPDATE sync_outbox SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+                         [(self.last_error, r[0]) for r in rows])
+        # Rejected on its own, repeatedly, while Firestore is reachable: park it
+        if len(rows) == 1 and rows[0][5] + 1 >= self.max_attempts and not is_transient(error):
+            conn.execute(
+                "INSERT INTO sync_dead_letter (collection, doc_id, payload, attempts, last_error, failed_at) "
+                "SELECT collection, doc_id, payload, attempts, last_error, ? FROM sync_outbox WHERE id = ?",
+                (time.time(), rows[0][0]))
+            conn.execute("DELETE FROM sync_outbox WHERE id = ?", (rows[0][0],))
+            self.dead_lettered += 1
+            # The rest of the queue is not at fault: retry it without waiting
+            self.consecutive_failures = 0
+            self.backoff_s = 0.0
+            self._limit = self.batch_size
+            print(f"⚠️ Firestore rejected {rows[0][3]} {self.max_attempts}x, moved to sync_dead_letter: {error}")
+        conn.commit()
+
+    def drain(self) -> int:
+        """Send batches until the outbox is empty. Returns documents written; raises on failure."""
+        total = 0
+        while True:
+            sent = self.flush_once()
+            if not sent:
+                return total
+            total += sent
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.drain()
+            except Exception as e:
+                print(f"⚠️ Firestore sync failed ({self.consecutive_failures}x), "
+                      f"retrying in {self.backoff_s:.1f}s: {e}")
+                # Backing off: only stop() ends the wait early, not wake()
+                self._stop.wait(self.backoff_s)
+                continue
+            self._wake.wait(self.poll_s)
+            self._wake.clear()
+
+    # --- metrics ---
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, lag (age of the oldest unsent write) and send counters."""
+        with self._lock:
+            conn = self._connection()
+            depth, oldest, max_attempts = conn.execute(
+                "SELECT COUNT(*), MIN(enqueued_at), MAX(attempts) FROM sync_outbox").fetchone()
+            dead = conn.execute("SELECT COUNT(*) FROM sync_dead_letter").fetchone()[0]
+        return {
+            "queue_depth": depth,
+            "lag_s": max(0.0, time.time() - oldest) if oldest is not None else 0.0,
+            "max_attempts": max_attempts or 0,
+            "dead_letters": dead,
+            "sent": self.sent,
+            "batches": self.batches,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "backoff_s": self.backoff_s,
+            "last_error": self.last_error,
+            "last_success_at": self.last_success_at,
+        }
@@ -0,0 +1,214 @@
+from collections import OrderedDict
+from tkinter import ttk
+
+
+class VirtualTable:
+    """Lazily-paged ttk.Treeview that only holds the rows currently on screen.
+
+    Rows come from a paged query instead of being inserted up front:
+
+    - `count()` returns the total number of rows for the current query.
+    - `fetch(offset, limit, cursor, sort, descending)` returns `(rows, next_cursor)`.
+      When `cursor` is given (the cursor returned for the previous block) the
+      source should continue from it with a keyset query; otherwise it should
+      jump to `offset`.
+    - `anchors(block_size, sort, descending)` (optional) returns a list whose
+      item i is the cursor that starts block i (None for block 0). It is
+      loaded once per reload, on the first jump to a block whose predecessor
+      is not cached, so scrollbar drags seek by keyset instead of `offset`.
+
+    Rows are cached in fixed-size blocks (LRU), with a prefetch margin around
+    the visible window. The external scrollbar maps to the full row count, and
+    heading clicks change the sort passed back to `fetch` rather than
+    reordering rows in Tk. Call `reload()` after changing the source's filters.
+
+    columns: list of (key, heading, width) tuples.
+    row_values(row) -> tuple of display values; row_id(row) -> optional item iid.
+    """
+
+    def __init__(self, parent, columns, fetch, count, row_values, row_id=None, anchors=None,
+                 sort=None, descending=False, sortable=True, height=20,
+                 block_size=100, prefetch=50, max_blocks=40):
+        self.parent = parent
+        self.columns = [c[0] for c in columns]
+        self._headings = {c[0]: c[1] for c in columns}
+        self._fetch = fetch
+        self._count = count
+        self._row_values = row_values
+        self._row_id = row_id
+        self._anchors_source = anchors
+        self._anchors = None
+        self.sort = sort
+        self.descending = descending
+        self.sortable = sortable
+        self.block_size = max(10, int(block_size))
+        self.prefetch = max(0, int(prefetch))
+        self.max_blocks = max(4, int(max_blocks))
+
+        self.total = 0
+        self.first = 0
+        self.visible = max(1, int(height))
+        self._blocks: "OrderedDict[int, tuple]" = OrderedDict()
+        self._prefetch_id = None
+
+        self.tree = ttk.Treeview(parent, columns=self.columns, show="headings", height=self.visible, style="Treeview")
+        for key, heading, width in columns:
+            self.tree.heading(key, text=heading, command=lambda k=key: self.toggle_sort(k))
+            self.tree.column(key, width=width, minwidth=min(width, 100))
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self._on_scrollbar)
+
+        self.tree.bind("<MouseWheel>", self._on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self._scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_by(3))
+        self.tree.bind("<Configure>", self._on_configure)
+        self.tree.bind("<Prior>", lambda e: self._scroll_by(-self.visible))
+        self.tree.bind("<Next>", lambda e: self._scroll_by(self.visible))
+        self._update_headings()
+
+    # --- layout helpers ---
+    def pack(self, **kwargs):
+        self.scrollbar.pack(side="right", fill="y")
+        self.tree.pack(**kwargs)
+
+    def bind(self, sequence, func):
+        return self.tree.bind(sequence, func)
+
+    # --- data ---
+    def reload(self):
+        """Drop cached rows, re-count and render from the top."""
+        self._blocks.clear()
+        self._anchors = None
+        try:
+            self.total = int(self._count())
+        except Exception:
+            self.total = 0
+        self.first = 0
+        self._render()
+        return self.total
+
+    def _get_block(self, index):
+        if index in self._blocks:
+            self._blocks.move_to_end(index)
+            return self._blocks[index][0]
+        prev = self._blocks.get(index - 1)
+        cursor = prev[1] if prev is not None else None
+        if prev is None and index > 0 and self._anchors_source is not None:
+            if self._anchors is None:
+                try:
+                    self._anchors = list(self._anchors_source(self.block_size, self.sort, self.descending))
+                except Exception:
+                    self._anchors = []
+            if index < len(self._anchors):
+                cursor = self._anchors[index]
+        offset = index * self.block_size
+        rows, next_cursor = self._fetch(offset, self.block_size, cursor, self.sort, self.descending)
+        self._blocks[index] = (list(rows), next_cursor)
+        while len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+        return self._blocks[index][0]
+
+    def _rows(self, start, end):
+        """Return rows [start, end) from the block cache, fetching missing blocks."""
+        rows = []
+        for index in range(start // self.block_size, (max(start, end - 1)) // self.block_size + 1):
+            block = self._get_block(index)
+            base = index * self.block_size
+            rows.extend(block[max(0, start - base):max(0, end - base)])
+        return rows
+
+    def _schedule_prefetch(self):
+        if self._prefetch_id is not None:
+            try:
+                self.tree.after_cancel(self._prefetch_id)
+            except Exception:
+                pass
+
+        def run():
+            self._prefetch_id = None
+            lo = max(0, self.first - self.prefetch)
+            hi = min(self.total, self.first + self.visible + self.prefetch)
+            if hi > lo:
+                try:
+                    self._rows(lo, hi)
+                except Exception:
+                    pass
+
+        self._prefetch_id = self.tree.after_idle(run)
+
+    # --- rendering ---
+    def _render(self):
+        self.tree.delete(*self.tree.get_children())
+        self.first = max(0, min(self.first, max(0, self.total - self.visible)))
+        end = min(self.total, self.first + self.visible)
+        if end > self.first:
+            for row in self._rows(self.first, end):
+                iid = self._row_id(row) if self._row_id else None
+                values = self._row_values(row)
+                if iid is not None and not self.tree.exists(str(iid)):
+                    self.tree.insert("", "end", iid=str(iid), values=values)
+                else:
+                    self.tree.insert("", "end", values=values)
+        if self.total:
+            self.scrollbar.set(self.first / self.total, end / self.total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self._schedule_prefetch()
+
+    def scroll_to(self, first):
+        first = max(0, min(int(first), max(0, self.total - self.visible)))
+        if first != self.first:
+            self.first = first
+            self._render()
+
+    def _scroll_by(self, rows):
+        self.scroll_to(self.first + rows)
+        return "break"
+
+    def _on_scrollbar(self, *args):
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * self.total)
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if len(args) > 2 and args[2] == "pages":
+                step *= self.visible
+            self._scroll_by(step)
+
+    def _on_mousewheel(self, event):
+        delta = event.delta
+        # Windows reports multiples of 120, macOS small integers
+        steps = -int(delta / 120) if abs(delta) >= 120 else -int(delta)
+        return self._scroll_by(steps * 3 or (-1 if delta > 0 else 1))
+
+    def _on_configure(self, event):
+        try:
+            row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        except Exception:
+            row_height = 20
+        # Leave room for the heading row
+        visible = max(1, (event.height - row_height) // row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.tree.configure(height=visible)
+            self._render()
+
+    # --- sorting ---
+    def toggle_sort(self, key):
+        """Sort by `key` (re-clicking flips direction) and re-query from the top."""
+        if not self.sortable:
+            return
+        if self.sort == key:
+            self.descending = not self.descending
+        else:
+            self.sort = key
+            self.descending = False
+        self._update_headings()
+        self.reload()
+
+    def _update_headings(self):
+        for key in self.columns:
+            text = self._headings[key]
+            if self.sortable and key == self.sort:
+                text = f"{text} {'↓' if self.descending else '↑'}"
+            self.tree.heading(key, text=text)